@@ -1,5 +1,16 @@
 
+import bisect
+import contextlib
+import io
+import json
+import mmap
+import os
 import re
+import struct
+import sys
+import zlib
+from array import array
+from collections import namedtuple
 
 # Opcode map for instruction encoding
 opcode_map = {
@@ -8,9 +19,23 @@ opcode_map = {
     'xor': '000000', 'nor': '000000', 'move': '000000', 'nop': '000000', 'break': '000000',
     'syscall': '000000', 'lw': '100011', 'sw': '101011', 'beq': '000100', 'bne': '000101',
     'addi': '001000', 'slti': '001010', 'andi': '001100', 'ori': '001101', 'xori': '001110',
-    'j': '000010', 'jal': '000011'
+    'j': '000010', 'jal': '000011', 'lui': '001111', 'lb': '100000', 'lh': '100001',
+    'lbu': '100100', 'lhu': '100101', 'sb': '101000', 'sh': '101001'
 }
 
+# Load/store instructions, all written as 'op $rt, offset($rs)' or 'op $rt, label'
+memory_access_ops = ['lw', 'sw', 'lb', 'lbu', 'lh', 'lhu', 'sb', 'sh']
+
+# Integer opcode of each load/store -> (access size in bytes, is_write)
+memory_access_sizes = {
+    0b100011: (4, False), 0b101011: (4, True), 0b100000: (1, False), 0b100100: (1, False),
+    0b100001: (2, False), 0b100101: (2, False), 0b101000: (1, True), 0b101001: (2, True),
+}
+
+# Binary opcodes of every I-type instruction the processor executes
+i_type_opcodes = ['100011', '101011', '001000', '000100', '000101', '001010', '001100', '001101', '001110',
+                  '001111', '100000', '100100', '100001', '100101', '101000', '101001']
+
 # Function code map for R-type instructions
 funct_map = {
     'add': '100000',      # Addition
@@ -49,294 +74,1429 @@ register_map = {
     '$gp': '11100', '$sp': '11101', '$fp': '11110', '$ra': '11111'
 }
 
-# Memory map to store data section label addresses
-memory_map = {}
-memory = {}  # Stores actual memory values
-
-# Label map to store addresses of labels in the text section
-label_map = {}
-
-# To keep track of the next available memory address
-current_data_address = 0x10010000  # Typical start of the data segment
-current_instruction_address = 0x00400000  # Typical start of the text segment
-
-def parse_data_section(line):
-    """Parse .data section to map variables and strings to addresses."""
-    global current_data_address
-    if ':' in line:
-        label, declaration = line.split(':', 1)
-        label = label.strip()
-        declaration = declaration.strip()
-
-        if '.word' in declaration:
-            # Extract integer values after .word and store them in memory
-            values = declaration.replace('.word', '').strip().split(',')
-            word_values = [int(value.strip()) for value in values]  # Convert each value to an integer
-            memory_map[label] = current_data_address  # Store the starting address of the label
-
-            # Store each word value in memory at consecutive addresses (4 bytes per word)
-            for value in word_values:
-                memory[current_data_address] = value
-                current_data_address += 4  # Move to the next word (4 bytes)
-
-        elif '.asciiz' in declaration:
-            # Extract the string from the .asciiz declaration
-            string = re.search(r'"(.*?)"', declaration).group(1)
-            memory_map[label] = current_data_address  # Store the starting address of the label
-
-            # Store each character of the string in memory (1 byte per character)
-            for char in string:
-                memory[current_data_address] = ord(char)  # Store ASCII value of the character
-                current_data_address += 1
-
-            # Add null terminator for the string (0x00)
-            memory[current_data_address] = 0
-            current_data_address += 1
-
-def parse_r_type(instruction):
-    """Parse R-type instructions, including special case for 'jr'."""
-    opcode = '000000'  # R-type instructions always have an opcode of 0
-    parts = instruction.replace(',', '').split()
-    operation = parts[0]
-
-    if operation == 'jr':
-        # For 'jr', only rs is used, and rd and rt are set to 00000
-        rs = parts[1]
-        rd = '00000'  # Not used in 'jr'
-        rt = '00000'  # Not used in 'jr'
-        shamt = '00000'  # Shift amount is 0 for 'jr'
-        funct = '001000'  # Function code for 'jr'
-        return opcode + register_map[rs] + rt + rd + shamt + funct
-    elif operation == 'nop':
-        # For 'nop', it is represented as sll $0, $0, 0
-        rd = '00000'  # Not used
-        rs = '00000'  # Not used
-        rt = '00000'  # Not used
-        shamt = '00000'
-        funct = '000000'  # Function code for nop (sll $0, $0, 0)
-        return opcode + rs + rt + rd + shamt + funct
-    
-    elif operation == 'move':
-        rd = parts[1]  # Destination register
-        rs = parts[2]  # Source register
-        rt = '$zero'   # Use $zero as the third operand
-        shamt = '00000'  # Shift amount is 0
-        funct = '100000'  # Function code for 'add'
-        
-        # Construct the binary representation
-        return opcode + register_map[rs] + register_map[rt] + register_map[rd] + shamt + funct
-
-
-    elif operation == 'break':
-        # For 'break', we may not need to do anything special
-        rd = '00000'  # Not used
-        rs = '00000'  # Not used
-        rt = '00000'  # Not used
-        shamt = '00000'
-        funct = '001101'  # Function code for break
-        return opcode + rs + rt + rd + shamt + funct
-
-    elif operation == 'syscall':
-        # For 'syscall', we may not need to do anything special
-        rd = '00000'  # Not used
-        rs = '00000'  # Not used
-        rt = '00000'  # Not used
-        shamt = '00000'
-        funct = '001100'  # Function code for syscall
-        return opcode + rs + rt + rd + shamt + funct
-    else:
-        # For other R-type instructions
-        rd, rs, rt = parts[1], parts[2], parts[3]
-        shamt = '00000'  # Shift amount is 0 for most R-type instructions
-        funct = funct_map[operation]
-        if rt.isdigit():  # If rt is a digit (number)
-            rt = format(int(rt), '05b')  # Convert to 5-bit binary
-        else:
-            rt = register_map[rt]
-
-    return opcode + register_map[rs] + rt + register_map[rd] + shamt + funct
-
-def parse_i_type(instruction, current_address):
-    """Parse I-type instructions (e.g., lw, sw, addi, beq)."""
-    parts = instruction.replace(',', '').split()
-    operation = parts[0]
-    opcode = opcode_map[operation]
-
-    if operation in ['lw', 'sw']:
-        rt = register_map[parts[1]]  # Get the register for rt
-
-        # Check if the third part contains a base register with an offset (like num($t0))
-        if '(' in parts[2]:
-            offset, rs = parts[2].split('(')  # Split into offset and base register
-            rs = rs.replace(')', '').strip()  # Remove the closing parenthesis and trim spaces
-            offset = offset.strip()  # Remove any leading/trailing whitespace
-            if not offset:  # If offset is empty
-                offset = '0'
-            offset_bin = format(int(offset), '016b')  # Convert offset to a 16-bit binary
-            return opcode + register_map[rs] + rt + offset_bin
+# Reverse lookups built once: 5-bit code -> name, and register index -> name
+register_names = {v: k for k, v in register_map.items()}
+register_names_by_index = [register_names[format(i, '05b')] for i in range(32)]
+
+# Integer encodings for the assembler: register numbers, opcodes and funct codes
+register_numbers = {name: int(code, 2) for name, code in register_map.items()}
+opcodes = {name: int(code, 2) for name, code in opcode_map.items()}
+funct_codes = {name: int(code, 2) for name, code in funct_map.items()}
+
+# Backslash escapes recognised in .asciiz strings, as in SPIM
+asciiz_escapes = {'n': '\n', 't': '\t', '0': '\0', '\\': '\\'}
+
+# Mnemonics by integer funct code (R-type) and opcode (I-type), for disassembly
+funct_names = {int(code, 2): name for name, code in funct_map.items()}
+i_type_names = {int(code, 2): name for name, code in opcode_map.items() if code in i_type_opcodes}
+
+# Compact integer form of an instruction, produced once per text address by
+# MIPSProcessor.decode_at and dispatched directly by MIPSProcessor.run
+DecodedInstruction = namedtuple(
+    'DecodedInstruction', ['opcode', 'rs', 'rt', 'rd', 'shamt', 'funct', 'imm', 'handler']
+)
+
+def instruction_name(decoded):
+    """Mnemonic of a DecodedInstruction, taken from its handler ('nop' for unimplemented encodings)."""
+    return decoded.handler.__name__[len('_exec_'):]
+
+
+class LabelIndex:
+    """Address -> label lookups over a label_map or memory_map, built once."""
+
+    def __init__(self, labels):
+        entries = sorted((address, name) for name, address in dict(labels).items())
+        self.addresses = [address for address, _ in entries]
+        self.names = [name for _, name in entries]
+        self.exact = {}  # Address -> first label defined there
+        for address, name in entries:
+            self.exact.setdefault(address, name)
+
+    def label_at(self, address):
+        """The label defined exactly at an address, or None."""
+        return self.exact.get(address)
+
+    def enclosing(self, address):
+        """The nearest label at or below an address, or None if the address precedes every label."""
+        position = bisect.bisect_right(self.addresses, address) - 1
+        return self.names[position] if position >= 0 else None
+
+    def describe(self, address):
+        """An address as 'label', 'label+offset', or hex when no label precedes it."""
+        position = bisect.bisect_right(self.addresses, address) - 1
+        if position < 0:
+            return f"0x{address:08x}"
+        offset = address - self.addresses[position]
+        return f"{self.names[position]}+{offset}" if offset else self.names[position]
+
+
+def format_instruction(word, address, labels):
+    """Assembly text for a 32-bit instruction word stored at address.
+
+    labels maps addresses to label names and is used for branch and jump
+    targets; unlabelled targets are shown in hex.
+    """
+    opcode = word >> 26
+    rs = register_names_by_index[(word >> 21) & 0x1F]
+    rt = register_names_by_index[(word >> 16) & 0x1F]
+
+    if opcode == 0:  # R-type instruction
+        if word == 0:
+            return "nop"
+        rd = register_names_by_index[(word >> 11) & 0x1F]
+        operation = funct_names.get(word & 0x3F, 'unknown')
+        if operation == 'sll' or operation == 'srl':
+            return f"{operation} {rd}, {rt}, {(word >> 6) & 0x1F}"
+        elif operation == 'jr':
+            return f"{operation} {rs}"
+        elif operation == 'syscall' or operation == 'break':
+            return operation
+        return f"{operation} {rd}, {rs}, {rt}"
+
+    operation = i_type_names.get(opcode)
+    if operation is not None:
+        immediate = (word & 0xFFFF) - ((word & 0x8000) << 1)
+        if operation in memory_access_ops:
+            return f"{operation} {rt}, {immediate}({rs})"
+        elif operation == 'lui':
+            return f"{operation} {rt}, {immediate & 0xFFFF}"
+        elif operation == 'beq' or operation == 'bne':
+            target = address + 4 + immediate * 4
+            return f"{operation} {rs}, {rt}, {labels.get(target, hex(target))}"
+        return f"{operation} {rt}, {rs}, {immediate}"
+
+    if opcode == 0b000010 or opcode == 0b000011:  # J-type instructions: j, jal
+        target = ((address + 4) & 0xF0000000) | ((word & 0x3FFFFFF) << 2)
+        return f"{'j' if opcode == 0b000010 else 'jal'} {labels.get(target, hex(target))}"
+
+    return "unknown instruction"
+
+
+# A straight-line run of instructions compiled into one Python function by
+# MIPSProcessor.translate_block; function(processor, registers, memory) executes
+# the block and returns (next PC, instructions executed). That count is below
+# length when a store into the text segment ends the block early.
+TranslatedBlock = namedtuple('TranslatedBlock', ['start', 'end', 'length', 'function'])
+
+# Saved processor state from MIPSProcessor.snapshot. pages is the memory page
+# table at snapshot time; its bytearrays are shared copy-on-write with every
+# memory restored from the snapshot and must not be modified directly.
+# heap_break is the sbrk state of the processor's SystemCalls.
+ProcessorSnapshot = namedtuple('ProcessorSnapshot', ['pc', 'registers', 'pages', 'byteorder', 'text_start',
+                                                     'text_end', 'current_data_address', 'instruction_count',
+                                                     'memory_map', 'label_map', 'exit_code', 'stop_reason',
+                                                     'heap_break'],
+                               defaults=(None, None, None))
+
+# Packed object format: a fixed header, the text words, the raw data-segment
+# image from memory, then the memory_map and label_map symbols.
+# The first five bytes are always b'MIPS' followed by b'B' or b'L', which gives
+# the byte order used for every other field in the file.
+OBJECT_MAGIC = b'MIPS'
+OBJECT_VERSION = 2
+OBJECT_BYTEORDER_TAGS = {'big': b'B', 'little': b'L'}
+OBJECT_HEADER = 'xxxBIIIIII'  # pad, pad, pad, version, text start/count, data size/end, symbol counts
+OBJECT_STRUCT_PREFIX = {'big': '>', 'little': '<'}
+OBJECT_WRITE_BATCH = 4096  # Instruction words per write when streaming an object file
+
+# A packed object parsed in place over a buffer (see unpack_packed_object): words
+# yields the text words straight from the buffer, through a memoryview cast
+# when the file's byte order is the host's; data is a memoryview slice
+PackedObject = namedtuple('PackedObject', ['byteorder', 'text_start', 'text_count', 'words', 'data_start', 'data',
+                                           'data_end', 'memory_map', 'label_map'])
+
+# Processor snapshot files (see write_snapshot); every field is little-endian
+SNAPSHOT_MAGIC = b'MIPSSNAP'
+SNAPSHOT_VERSION = 2
+# version, little-endian flag, SNAPSHOT_HAS_* flags, pc, text bounds, data end, count, table sizes,
+# exit code, heap break
+SNAPSHOT_HEADER = '<BBBxIIIIQIIIqI'
+SNAPSHOT_HAS_EXIT_CODE = 1
+SNAPSHOT_HAS_HEAP_BREAK = 2
+
+# Segment layout (SPIM defaults)
+TEXT_SEGMENT_START = 0x00400000
+DATA_SEGMENT_START = 0x10010000
+GLOBAL_POINTER_START = 0x10008000
+STACK_POINTER_START = 0x7fffeffc
+
+# Paged memory geometry
+PAGE_SHIFT = 12
+PAGE_SIZE = 1 << PAGE_SHIFT  # 4 KiB
+PAGE_MASK = PAGE_SIZE - 1
+ZERO_PAGE = memoryview(bytes(PAGE_SIZE))  # What reads of an unallocated page see
+
+
+class MemoryAlignmentError(ValueError):
+    """Raised for a word or halfword access at an address that is not naturally aligned."""
+
+
+class PagedMemory:
+    """Byte-addressable 32-bit memory built from lazily allocated 4 KiB pages.
+
+    The page table maps page numbers to bytearrays. Pages are allocated on first
+    write; reading an unallocated page returns zero without allocating it, so
+    sparse addresses such as the stack near 0x7fffeffc cost a single page.
+    Pages also held by a snapshot are shared copy-on-write: the first write
+    to one gives this memory its own copy.
+    """
+
+    def __init__(self, byteorder='big'):
+        self.byteorder = byteorder
+        self.pages = {}  # Page number -> bytearray(PAGE_SIZE)
+        self.shared = set()  # Page numbers whose bytearray is shared with a snapshot
+        prefix = OBJECT_STRUCT_PREFIX[byteorder]
+        self.word_format = struct.Struct(prefix + 'i')
+        self.uword_format = struct.Struct(prefix + 'I')
+        self.half_format = struct.Struct(prefix + 'h')
+        self.uhalf_format = struct.Struct(prefix + 'H')
+
+    def __repr__(self):
+        pages = ', '.join(hex(number << PAGE_SHIFT) for number in sorted(self.pages))
+        return f"PagedMemory(byteorder='{self.byteorder}', pages=[{pages}])"
+
+    def page(self, address):
+        """Return the writable page holding an address, allocating or unsharing it first."""
+        number = (address & 0xFFFFFFFF) >> PAGE_SHIFT
+        page = self.pages.get(number)
+        if page is None:
+            page = self.pages[number] = bytearray(PAGE_SIZE)
+        elif number in self.shared:
+            page = self.pages[number] = bytearray(page)  # Copy on first write
+            self.shared.discard(number)
+        return page
+
+    def snapshot(self):
+        """Return the current page table, sharing every page copy-on-write from now on."""
+        self.shared = set(self.pages)
+        return dict(self.pages)
+
+    def restore(self, pages):
+        """Replace memory contents with a page table returned by snapshot."""
+        self.pages = dict(pages)
+        self.shared = set(pages)
+
+    def read_word(self, address, signed=True):
+        """Read a 4-byte word from a word-aligned address."""
+        if address & 3:
+            raise MemoryAlignmentError(f"Unaligned word access at {hex(address)}.")
+        page = self.pages.get((address & 0xFFFFFFFF) >> PAGE_SHIFT)
+        if page is None:
+            return 0
+        return (self.word_format if signed else self.uword_format).unpack_from(page, address & PAGE_MASK)[0]
+
+    def write_word(self, address, value):
+        """Write the low 32 bits of a value to a word-aligned address."""
+        if address & 3:
+            raise MemoryAlignmentError(f"Unaligned word access at {hex(address)}.")
+        self.uword_format.pack_into(self.page(address), address & PAGE_MASK, value & 0xFFFFFFFF)
+
+    def read_half(self, address, signed=True):
+        """Read a 2-byte halfword from a halfword-aligned address."""
+        if address & 1:
+            raise MemoryAlignmentError(f"Unaligned halfword access at {hex(address)}.")
+        page = self.pages.get((address & 0xFFFFFFFF) >> PAGE_SHIFT)
+        if page is None:
+            return 0
+        return (self.half_format if signed else self.uhalf_format).unpack_from(page, address & PAGE_MASK)[0]
+
+    def write_half(self, address, value):
+        """Write the low 16 bits of a value to a halfword-aligned address."""
+        if address & 1:
+            raise MemoryAlignmentError(f"Unaligned halfword access at {hex(address)}.")
+        self.uhalf_format.pack_into(self.page(address), address & PAGE_MASK, value & 0xFFFF)
+
+    def read_byte(self, address, signed=True):
+        """Read a single byte."""
+        page = self.pages.get((address & 0xFFFFFFFF) >> PAGE_SHIFT)
+        if page is None:
+            return 0
+        value = page[address & PAGE_MASK]
+        return value - 0x100 if signed and value & 0x80 else value
+
+    def write_byte(self, address, value):
+        """Write the low 8 bits of a value."""
+        self.page(address)[address & PAGE_MASK] = value & 0xFF
+
+    def view(self, address, length):
+        """Return a read-only zero-copy memoryview of length bytes, which must lie within one page.
+
+        Like the other reads, this neither allocates nor unshares a page; an
+        unallocated page is viewed as zeros.
+        """
+        offset = address & PAGE_MASK
+        if offset + length > PAGE_SIZE:
+            raise ValueError(f"View of {length} bytes at {hex(address)} crosses a page boundary.")
+        page = self.pages.get((address & 0xFFFFFFFF) >> PAGE_SHIFT)
+        if page is None:
+            return ZERO_PAGE[offset:offset + length]
+        return memoryview(page).toreadonly()[offset:offset + length]
+
+    def writable_view(self, address, length):
+        """Return a writable memoryview of length bytes within one page, allocating or unsharing it."""
+        offset = address & PAGE_MASK
+        if offset + length > PAGE_SIZE:
+            raise ValueError(f"View of {length} bytes at {hex(address)} crosses a page boundary.")
+        return memoryview(self.page(address))[offset:offset + length]
+
+    def iter_views(self, address, length, writable=False):
+        """Yield zero-copy memoryviews covering length bytes, one per page touched."""
+        view = self.writable_view if writable else self.view
+        while length > 0:
+            chunk = min(length, PAGE_SIZE - (address & PAGE_MASK))
+            yield view(address, chunk)
+            address += chunk
+            length -= chunk
+
+    def read_bytes(self, address, length):
+        """Copy length bytes starting at an address into a bytes object."""
+        return b''.join(self.iter_views(address, length))
+
+    def read_string(self, address, limit=1 << 20):
+        """Bytes of the NUL-terminated string at an address (NUL excluded), searched a page at a time."""
+        chunks = []
+        while limit > 0:
+            page = self.pages.get((address & 0xFFFFFFFF) >> PAGE_SHIFT)
+            if page is None:
+                break  # Unallocated pages read as zero
+            offset = address & PAGE_MASK
+            chunk = min(PAGE_SIZE - offset, limit)
+            end = page.find(0, offset, offset + chunk)
+            if end >= 0:
+                chunks.append(page[offset:end])
+                break
+            chunks.append(page[offset:offset + chunk])
+            address += chunk
+            limit -= chunk
+        return b''.join(chunks)
+
+    def write_bytes(self, address, data):
+        """Copy a bytes-like object into memory starting at an address."""
+        data = memoryview(data).cast('B')
+        position = 0
+        for view in self.iter_views(address, len(data), writable=True):
+            view[:] = data[position:position + len(view)]
+            position += len(view)
+
+    def nonzero_words(self):
+        """Yield (address, value) for every nonzero aligned word in allocated pages."""
+        for number in sorted(self.pages):
+            page = self.pages[number]
+            base = number << PAGE_SHIFT
+            for offset, (value,) in enumerate(self.word_format.iter_unpack(page)):
+                if value:
+                    yield base + 4 * offset, value
+
+class AssemblyError(ValueError):
+    """An error in MIPS source, tagged with the file and line it came from."""
+
+    def __init__(self, message, filename=None, line_number=None):
+        location = ':'.join(str(part) for part in (filename, line_number) if part is not None)
+        super().__init__(f"{location}: {message}" if location else message)
+        self.message = message
+        self.filename = filename
+        self.line_number = line_number
+
+
+class ProgramImage(namedtuple('ProgramImage', ['text_start', 'text', 'data_start', 'data', 'data_end',
+                                               'memory_map', 'label_map', 'byteorder'])):
+    """Immutable result of assembling one program.
+
+    text is a tuple of 32-bit instruction words, data the raw data-segment bytes
+    from data_start to data_end, and memory_map / label_map tuples of
+    (label, address) pairs. Images are plain tuples, so they pickle cheaply
+    between processes.
+    """
+    __slots__ = ()
+
+    def binary_instructions(self):
+        """The text segment as 32-character '0'/'1' strings."""
+        return [format(word, '032b') for word in self.text]
+
+
+# Bump whenever an Assembler change alters the ProgramImage it produces for the
+# same source; cached images (see mips_asm_cache) are keyed by it
+ASSEMBLER_VERSION = 1
+
+
+class Assembler:
+    """Single-pass MIPS assembler that owns all of the state for one program.
+
+    Each Assembler has its own memory_map, data memory, label_map and address
+    counters, so any number of programs can be assembled in one process.
+    Instructions are encoded straight to integer words; references to labels
+    that are not yet known are recorded as fixups and backpatched at the end.
+    """
+
+    def __init__(self, byteorder='big'):
+        self.byteorder = byteorder
+        # Memory map to store data section label addresses
+        self.memory_map = {}
+        self.memory = PagedMemory(byteorder)  # Stores actual memory values
+        # Label map to store addresses of labels in the text section
+        self.label_map = {}
+        # To keep track of the next available memory address
+        self.current_data_address = DATA_SEGMENT_START  # Typical start of the data segment
+        self.current_instruction_address = TEXT_SEGMENT_START  # Typical start of the text segment
+        # (text index, word, kind, label, address, line number) for each word awaiting a label
+        self.fixups = []
+
+    def parse_data_section(self, line):
+        """Parse .data section to map variables and strings to addresses."""
+        if ':' in line:
+            label, declaration = line.split(':', 1)
+            label = label.strip()
+            declaration = declaration.strip()
+
+            if '.word' in declaration:
+                # Extract integer values after .word and store them in memory
+                values = declaration.replace('.word', '').strip().split(',')
+                word_values = [int(value.strip()) for value in values]  # Convert each value to an integer
+                self.current_data_address = (self.current_data_address + 3) & ~3  # Words are word-aligned
+                self.memory_map[label] = self.current_data_address  # Store the starting address of the label
+
+                # Store each word value in memory at consecutive addresses (4 bytes per word)
+                for value in word_values:
+                    self.memory.write_word(self.current_data_address, value)
+                    self.current_data_address += 4  # Move to the next word (4 bytes)
+
+            elif '.asciiz' in declaration:
+                # Extract the string from the .asciiz declaration
+                string = re.search(r'"(.*?)"', declaration).group(1)
+                string = re.sub(r'\\(.)', lambda match: asciiz_escapes.get(match.group(1), match.group(0)), string)
+                self.memory_map[label] = self.current_data_address  # Store the starting address of the label
+
+                # Store the string (1 byte per character) and its null terminator in one copy
+                data = bytes(ord(char) & 0xFF for char in string) + b'\0'
+                self.memory.write_bytes(self.current_data_address, data)
+                self.current_data_address += len(data)
+
+    def register(self, name):
+        """Register number for a name such as '$t0'."""
+        number = register_numbers.get(name)
+        if number is None:
+            raise ValueError(f"Unknown register '{name}'")
+        return number
+
+    def label_field(self, kind, label, address):
+        """The encoded label field of a reference (see reference), or None while the label is undefined."""
+        if kind == 'branch' or kind == 'jump':
+            target = self.label_map.get(label)
+            if target is None:
+                return None
+            if kind == 'branch':
+                return ((target - (address + 4)) // 4) & 0xFFFF
+            return (target // 4) & 0x3FFFFFF
+        target = self.memory_map.get(label)
+        if target is None:
+            return None
+        if kind == 'data':
+            return (self.current_data_address - target) & 0xFFFF
+        return target >> 16 if kind == 'high' else target & 0xFFFF
+
+    def reference(self, word, kind, label, line_number, slot=0):
+        """Complete a word whose low field refers to a label, or record a fixup to backpatch it later.
+
+        kind is 'branch' (pc-relative offset), 'jump' (26-bit word index),
+        'data' (label-form load/store offset from the end of the data section),
+        'high' or 'low' (halves of a data address, for la). slot is the word's
+        position within the current instruction's expansion. Data offsets
+        always wait for the end of the source, because later .data lines
+        still move the end of the data section.
+        """
+        address = self.current_instruction_address + 4 * slot
+        field = None if kind == 'data' else self.label_field(kind, label, address)
+        if field is None:
+            self.fixups.append(((address - TEXT_SEGMENT_START) >> 2, word, kind, label, address, line_number))
+            return word
+        return word | field
+
+    def patches(self, filename=None):
+        """Yield (text index, word) for every recorded fixup, once the whole source has been read."""
+        for index, word, kind, label, address, line_number in self.fixups:
+            field = self.label_field(kind, label, address)
+            if field is None:
+                section = '.text' if kind in ('branch', 'jump') else '.data'
+                raise AssemblyError(f"Undefined label '{label}' in the {section} section.", filename, line_number)
+            yield index, word | field
+
+    def encode_r_type(self, instruction):
+        """Encode R-type instructions, including the special cases 'jr', 'nop', 'move', 'break' and 'syscall'."""
+        parts = instruction.replace(',', '').split()
+        operation = parts[0]
+
+        if operation == 'jr':
+            return self.register(parts[1]) << 21 | funct_codes['jr']
+        elif operation == 'nop':
+            return 0  # sll $0, $0, 0
+        elif operation == 'move':
+            # add rd, rs, $zero
+            return self.register(parts[2]) << 21 | self.register(parts[1]) << 11 | funct_codes['add']
+        elif operation in ('break', 'syscall'):
+            return funct_codes[operation]
 
-        else:
-            # Handle the case where the instruction uses a label directly (like sw $v0, num)
-            label = parts[2].strip()  # The label should be the last part of the instruction
-            if label in memory_map:  # Check if the label is defined in memory_map
-                address = memory_map[label]  # Get the address associated with the label
-                offset =current_data_address - address   # Calculate the offset relative to data start
-                offset_bin = format(offset, '016b')  # Convert offset to a 16-bit binary
-                return opcode + '00000' + rt + offset_bin
-            else:
-                raise ValueError(f"Undefined label '{label}' in the .data section.")
-
-    elif operation in ['beq', 'bne']:
-        rs = register_map[parts[1]]
-        rt = register_map[parts[2]]
-        label = parts[3]
-        if label in label_map:
-            # Calculate the branch offset as the difference between target and current instruction address
-            offset = (label_map[label] - (current_address + 4)) // 4
-            offset_bin = format(offset & 0xFFFF, '016b')  # Ensure a 16-bit binary representation
-            return opcode + rs + rt + offset_bin
-        else:
-            raise ValueError(f"Undefined label '{label}' in the .text section.")
-
-    elif operation in ['addi', 'slti', 'andi', 'ori', 'xori']:
-        rt = register_map[parts[1]]
-        rs = register_map[parts[2]]
-        immediate = format(int(parts[3]), '016b')
-        return opcode + rs + rt + immediate
-
-def parse_j_type(instruction):
-    """Parse J-type instructions (j, jal)."""
-    parts = instruction.split()
-    opcode = opcode_map[parts[0]]
-    label = parts[1]
-    if label in label_map:
-        address = label_map[label] // 4
-        return opcode + format(address, '026b')
+        rd, rs, rt = parts[1], parts[2], parts[3]
+        # A numeric third operand is encoded in the rt field
+        rt = int(rt) & 0x1F if rt.isdigit() else self.register(rt)
+        return self.register(rs) << 21 | rt << 16 | self.register(rd) << 11 | funct_codes[operation]
+
+    def encode_i_type(self, instruction, line_number=None):
+        """Encode I-type instructions (e.g., lw, sw, addi, beq)."""
+        parts = instruction.replace(',', '').split()
+        operation = parts[0]
+        opcode = opcodes[operation] << 26
+
+        if operation in memory_access_ops:
+            rt = self.register(parts[1])
+            if '(' in parts[2]:
+                # Base register with an offset, like num($t0)
+                offset, rs = parts[2].split('(')
+                offset = offset.strip() or '0'
+                return opcode | self.register(rs.replace(')', '').strip()) << 21 | rt << 16 | int(offset) & 0xFFFF
+            # A label used directly (like sw $v0, num), addressed relative to the end of the data section
+            return self.reference(opcode | rt << 16, 'data', parts[2].strip(), line_number)
+
+        elif operation in ['beq', 'bne']:
+            word = opcode | self.register(parts[1]) << 21 | self.register(parts[2]) << 16
+            return self.reference(word, 'branch', parts[3], line_number)
+
+        elif operation in ['addi', 'slti', 'andi', 'ori', 'xori']:
+            return opcode | self.register(parts[2]) << 21 | self.register(parts[1]) << 16 | int(parts[3]) & 0xFFFF
+
+        elif operation == 'lui':
+            return opcode | self.register(parts[1]) << 16 | int(parts[2]) & 0xFFFF
+
+    def encode_j_type(self, instruction, line_number=None):
+        """Encode J-type instructions (j, jal)."""
+        parts = instruction.split()
+        return self.reference(opcodes[parts[0]] << 26, 'jump', parts[1], line_number)
+
+    def encode_la_instruction(self, instruction, line_number=None):
+        """Encode 'la' as the lui/ori pair that loads a label's full address."""
+        parts = instruction.replace(',', '').split()
+        rt = self.register(parts[1])
+        label = parts[2]
+        return [self.reference(opcodes['lui'] << 26 | rt << 16, 'high', label, line_number),
+                self.reference(opcodes['ori'] << 26 | rt << 21 | rt << 16, 'low', label, line_number, 1)]
+
+    def encode_li_instruction(self, instruction):
+        """Encode the li (load immediate) instruction as addi rt, $zero, immediate."""
+        parts = instruction.replace(',', '').split()
+        rt = self.register(parts[1])
+        immediate_value = parts[2]
+
+        if not (immediate_value.isdigit() or (immediate_value.startswith('-') and immediate_value[1:].isdigit())):
+            raise ValueError(f"Invalid immediate value '{immediate_value}'.")
+        return opcodes['addi'] << 26 | rt << 16 | int(immediate_value) & 0xFFFF
+
+    def encode_instruction(self, line, line_number=None):
+        """Encode one text-section line, returning a list of 32-bit instruction words."""
+        operation = line.split()[0]
+        if operation in funct_map or operation in ['move', 'nop']:
+            return [self.encode_r_type(line)]
+        elif operation in memory_access_ops or operation in ['beq', 'bne', 'addi', 'slti', 'andi', 'ori',
+                                                            'xori', 'lui']:
+            return [self.encode_i_type(line, line_number)]
+        elif operation in ['j', 'jal']:
+            return [self.encode_j_type(line, line_number)]
+        elif operation == 'la':
+            return self.encode_la_instruction(line, line_number)
+        elif operation == 'li':
+            return [self.encode_li_instruction(line)]
+        raise ValueError(f"Unknown instruction '{operation}'.")
+
+    def iter_words(self, lines, filename=None):
+        """Assemble MIPS source lines in a single pass, yielding each instruction word as it is encoded.
+
+        lines may be any iterable, such as an open file, and is read once. Words
+        that refer to a label defined further on, and every label-form
+        load/store, are yielded with their label field zeroed and recorded in
+        fixups; once the generator is exhausted, patches() gives their final
+        values.
+        """
+        in_text_section = False
+        for line_number, line in enumerate(lines, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+
+            if line.startswith('.data'):
+                in_text_section = False
+                continue
+            elif line.startswith('.text'):
+                in_text_section = True
+                continue
+
+            if in_text_section and line.startswith('.'):  # Other directives (.globl, ...) emit nothing
+                continue
+
+            try:
+                if not in_text_section:
+                    self.parse_data_section(line)
+                    continue
+
+                if ':' in line:
+                    self.label_map[line.split(':')[0].strip()] = self.current_instruction_address
+                    continue
+
+                encoded = self.encode_instruction(line, line_number)
+            except KeyError as error:
+                raise AssemblyError(f"Unknown register or operation {error} in '{line}'",
+                                    filename, line_number) from error
+            except (ValueError, IndexError, AttributeError) as error:
+                raise AssemblyError(f"{error} in '{line}'", filename, line_number) from error
+            yield from encoded
+            self.current_instruction_address += 4 * len(encoded)
+
+    def assemble(self, lines, filename=None):
+        """Assemble MIPS source lines, handling .data and .text sections, into a ProgramImage."""
+        words = array('I', self.iter_words(lines, filename))
+        for index, word in self.patches(filename):
+            words[index] = word
+        return self.image(words)
+
+    def assemble_file(self, input_file):
+        """Assemble a MIPS source file into a ProgramImage."""
+        with open(input_file, 'r') as file:
+            return self.assemble(file, input_file)
+
+    def assemble_to_file(self, input_file, output_file, output_format='text', return_image=False):
+        """Assemble a source file straight into an object file, streaming both.
+
+        The source is read once, and words are written in batches as they are
+        encoded; fixups are then backpatched in place, so memory use does not
+        grow with the size of the text segment. output_format is 'text' or
+        'packed', as in translate_mips_to_binary. Returns the ProgramImage if
+        return_image is set (which keeps the text words), else the number of
+        instructions written.
+        """
+        words = array('I') if return_image else None
+        try:
+            count = self._stream_object(input_file, output_file, output_format == 'packed', words)
+        except BaseException:
+            if os.path.exists(output_file):
+                os.remove(output_file)  # Do not leave a truncated object behind
+            raise
+        return self.image(words) if return_image else count
+
+    def _stream_object(self, input_file, output_file, packed, words):
+        """Body of assemble_to_file; appends to words unless it is None and returns the instruction count."""
+        prefix = OBJECT_STRUCT_PREFIX[self.byteorder]
+        header_size = len(OBJECT_MAGIC) + 1 + struct.calcsize(prefix + OBJECT_HEADER) if packed else 0
+        count = 0
+        with open(input_file, 'r') as source, open(output_file, 'wb') as output:
+            if packed:
+                output.write(bytes(header_size))  # Rewritten once the counts are known
+
+            def write_batch(batch):
+                if packed:
+                    output.write(struct.pack(f'{prefix}{len(batch)}I', *batch))
+                else:
+                    output.write(''.join(f"{word:032b}\n" for word in batch).encode('ascii'))
+                if words is not None:
+                    words.extend(batch)
+
+            batch = []
+            for word in self.iter_words(source, input_file):
+                batch.append(word)
+                if len(batch) == OBJECT_WRITE_BATCH:
+                    write_batch(batch)
+                    count += len(batch)
+                    batch.clear()
+            write_batch(batch)
+            count += len(batch)
+
+            if packed:
+                data = self.memory.read_bytes(DATA_SEGMENT_START, self.current_data_address - DATA_SEGMENT_START)
+                output.write(data)
+                for name, address in list(self.memory_map.items()) + list(self.label_map.items()):
+                    encoded = name.encode('utf-8')
+                    output.write(struct.pack(prefix + 'HI', len(encoded), address) + encoded)
+
+            for index, word in self.patches(input_file):
+                if packed:
+                    output.seek(header_size + 4 * index)
+                    output.write(struct.pack(prefix + 'I', word))
+                else:
+                    output.seek(33 * index)  # 32 digits and a newline per word
+                    output.write(f"{word:032b}".encode('ascii'))
+                if words is not None:
+                    words[index] = word
+
+            if packed:
+                output.seek(0)
+                output.write(OBJECT_MAGIC + OBJECT_BYTEORDER_TAGS[self.byteorder])
+                output.write(struct.pack(prefix + OBJECT_HEADER, OBJECT_VERSION, TEXT_SEGMENT_START, count,
+                                         len(data), self.current_data_address,
+                                         len(self.memory_map), len(self.label_map)))
+        return count
+
+    def image(self, words):
+        """Freeze the assembler's current state and the given text words into a ProgramImage."""
+        return ProgramImage(
+            text_start=TEXT_SEGMENT_START,
+            text=tuple(words),
+            data_start=DATA_SEGMENT_START,
+            data=self.memory.read_bytes(DATA_SEGMENT_START, self.current_data_address - DATA_SEGMENT_START),
+            data_end=self.current_data_address,
+            memory_map=tuple(self.memory_map.items()),
+            label_map=tuple(self.label_map.items()),
+            byteorder=self.byteorder,
+        )
+
+
+def write_packed_object(output_file, image):
+    """Write a ProgramImage's text words, data image and symbol tables as a packed object file.
+
+    Every multi-byte field uses the image's byte order; the data image is the
+    raw bytes from data_start up to data_end.
+    """
+    prefix = OBJECT_STRUCT_PREFIX[image.byteorder]
+    symbols = image.memory_map + image.label_map
+
+    with open(output_file, 'wb') as file:
+        file.write(OBJECT_MAGIC + OBJECT_BYTEORDER_TAGS[image.byteorder])
+        file.write(struct.pack(prefix + OBJECT_HEADER, OBJECT_VERSION,
+                               image.text_start, len(image.text),
+                               len(image.data), image.data_end,
+                               len(image.memory_map), len(image.label_map)))
+        file.write(struct.pack(f'{prefix}{len(image.text)}I', *image.text))
+        file.write(image.data)
+        for name, address in symbols:
+            encoded = name.encode('utf-8')
+            file.write(struct.pack(prefix + 'HI', len(encoded), address) + encoded)
+
+def _iter_words(text, prefix):
+    """Text words of a foreign-byte-order object, unpacked one at a time."""
+    for (word,) in struct.iter_unpack(prefix + 'I', text):
+        yield word
+
+def unpack_packed_object(view, name='<bytes>'):
+    """Parse a packed object file's header and symbols in place over a memoryview; returns a PackedObject.
+
+    Nothing is copied: words and data still refer to view, so release them
+    (see release_packed_object) before releasing view.
+    """
+    if view[:4] != OBJECT_MAGIC:
+        raise ValueError(f"'{name}' is not a packed MIPS object file.")
+    byteorder = 'big' if view[4:5] == OBJECT_BYTEORDER_TAGS['big'] else 'little'
+    prefix = OBJECT_STRUCT_PREFIX[byteorder]
+    offset = 5
+    if len(view) < offset + struct.calcsize(prefix + OBJECT_HEADER):
+        raise ValueError(f"'{name}' is a truncated packed MIPS object file.")
+    (version, text_start, text_count, data_size, data_end,
+     memory_map_count, label_map_count) = struct.unpack_from(prefix + OBJECT_HEADER, view, offset)
+    if version != OBJECT_VERSION:
+        raise ValueError(f"Unsupported packed object version {version}.")
+    offset += struct.calcsize(prefix + OBJECT_HEADER)
+    text_offset = offset
+    offset += 4 * text_count
+    data_offset = offset
+    offset += data_size
+
+    symbols = []
+    for _ in range(memory_map_count + label_map_count):
+        if offset + 6 > len(view):
+            break
+        length, address = struct.unpack_from(prefix + 'HI', view, offset)
+        offset += 6
+        symbols.append((bytes(view[offset:offset + length]).decode('utf-8'), address))
+        offset += length
+    if offset > len(view) or len(symbols) < memory_map_count + label_map_count:
+        raise ValueError(f"'{name}' is a truncated packed MIPS object file.")
+
+    text = view[text_offset:data_offset]
+    if byteorder == sys.byteorder:
+        words = text.cast('I')  # Zero-copy: file and host byte order agree
     else:
-        raise ValueError(f"Undefined label '{label}' in the .text section.")
-
-def parse_la_instruction(instruction):
-    """Parse 'la' instruction to load address into a register."""
-    parts = instruction.replace(',', '').split()
-    rt = register_map[parts[1]]
-    label = parts[2]
-
-    if label in memory_map:
-        address = memory_map[label]  # Get the address associated with the label
-        offset = current_data_address - address  # Calculate the offset relative to data start
-        offset_bin = format(offset, '016b')
-        return '001000' + '00000' + rt + offset_bin
+        words = _iter_words(text, prefix)
+    return PackedObject(byteorder, text_start, text_count, words, data_end - data_size,
+                        view[data_offset:data_offset + data_size], data_end,
+                        tuple(symbols[:memory_map_count]), tuple(symbols[memory_map_count:]))
+
+def release_packed_object(packed):
+    """Drop a PackedObject's references into its buffer so the buffer can be released or unmapped."""
+    if isinstance(packed.words, memoryview):
+        packed.words.release()
     else:
-        raise ValueError(f"Undefined label '{label}' in the .data section.")
-
-def parse_li_instruction(instruction):
-    """Parse the li (load immediate) instruction."""
-    parts = instruction.replace(',', '').split()
-    rt = register_map[parts[1]]
-    immediate_value = parts[2]
+        packed.words.close()
+    packed.data.release()
+
+@contextlib.contextmanager
+def map_packed_object(input_file):
+    """Memory-map a packed object file and yield it as a PackedObject, valid until the block exits."""
+    with open(input_file, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        with memoryview(mapped) as view:
+            packed = unpack_packed_object(view, input_file)
+            try:
+                yield packed
+            finally:
+                release_packed_object(packed)
+
+def packed_object_image(packed):
+    """Copy a PackedObject out of its buffer into a ProgramImage."""
+    return ProgramImage(packed.text_start, tuple(packed.words), packed.data_start, bytes(packed.data),
+                        packed.data_end, packed.memory_map, packed.label_map, packed.byteorder)
+
+def read_packed_object(input_file):
+    """Read a packed object file written by write_packed_object back into a ProgramImage."""
+    with map_packed_object(input_file) as packed:
+        return packed_object_image(packed)
+
+def parse_packed_object(data, name='<bytes>'):
+    """Turn the bytes of a packed object file into a ProgramImage; name is used in error messages."""
+    with memoryview(data) as view:
+        packed = unpack_packed_object(view, name)
+        try:
+            return packed_object_image(packed)
+        finally:
+            release_packed_object(packed)
+
+def write_text_object(output_file, image):
+    """Write a ProgramImage's text segment as one line of 32 '0'/'1' characters per instruction."""
+    with open(output_file, 'w') as file:
+        for binary_instruction in image.binary_instructions():
+            file.write(binary_instruction + '\n')
 
-    if immediate_value.isdigit() or (immediate_value.startswith('-') and immediate_value[1:].isdigit()):
-        immediate = format(int(immediate_value), '016b')
+def _int64(value):
+    """Wrap an unbounded register value to a signed 64-bit integer for packing."""
+    return ((value + (1 << 63)) % (1 << 64)) - (1 << 63)
+
+def write_snapshot(output_file, snapshot):
+    """Write a ProcessorSnapshot to a compact file.
+
+    The file is SNAPSHOT_MAGIC, a little-endian SNAPSHOT_HEADER, the 32
+    registers as signed 64-bit values, then each nonzero page as
+    (page number, compressed size, zlib data), then the symbol tables.
+    stop_reason is not saved: a run resumed from the file starts afresh.
+    """
+    pages = [(number, zlib.compress(page)) for number, page in sorted(snapshot.pages.items())
+             if page.count(0) != PAGE_SIZE]
+    symbols = snapshot.memory_map + snapshot.label_map
+
+    with open(output_file, 'wb') as file:
+        file.write(SNAPSHOT_MAGIC)
+        flags = ((SNAPSHOT_HAS_EXIT_CODE if snapshot.exit_code is not None else 0)
+                 | (SNAPSHOT_HAS_HEAP_BREAK if snapshot.heap_break is not None else 0))
+        file.write(struct.pack(SNAPSHOT_HEADER, SNAPSHOT_VERSION, snapshot.byteorder == 'little', flags,
+                               snapshot.pc & 0xFFFFFFFF, snapshot.text_start, snapshot.text_end,
+                               snapshot.current_data_address, snapshot.instruction_count, len(pages),
+                               len(snapshot.memory_map), len(snapshot.label_map),
+                               _int64(snapshot.exit_code or 0), (snapshot.heap_break or 0) & 0xFFFFFFFF))
+        file.write(struct.pack('<32q', *(_int64(value) for value in snapshot.registers)))
+        for number, data in pages:
+            file.write(struct.pack('<II', number, len(data)) + data)
+        for name, address in symbols:
+            encoded = name.encode('utf-8')
+            file.write(struct.pack('<HI', len(encoded), address) + encoded)
+
+def read_snapshot(input_file):
+    """Read a ProcessorSnapshot written by write_snapshot."""
+    with open(input_file, 'rb') as file:
+        data = file.read()
+    if data[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+        raise ValueError(f"'{input_file}' is not a MIPS processor snapshot.")
+    offset = len(SNAPSHOT_MAGIC)
+    (version, little_endian, flags, pc, text_start, text_end, current_data_address, instruction_count,
+     page_count, memory_map_count, label_map_count, exit_code, heap_break) = struct.unpack_from(SNAPSHOT_HEADER,
+                                                                                               data, offset)
+    if version != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version {version}.")
+    offset += struct.calcsize(SNAPSHOT_HEADER)
+    registers = struct.unpack_from('<32q', data, offset)
+    offset += 32 * 8
+
+    pages = {}
+    for _ in range(page_count):
+        number, size = struct.unpack_from('<II', data, offset)
+        offset += 8
+        pages[number] = bytearray(zlib.decompress(data[offset:offset + size]))
+        offset += size
+
+    symbols = []
+    for _ in range(memory_map_count + label_map_count):
+        length, address = struct.unpack_from('<HI', data, offset)
+        offset += 6
+        symbols.append((data[offset:offset + length].decode('utf-8'), address))
+        offset += length
+
+    return ProcessorSnapshot(pc, registers, pages, 'little' if little_endian else 'big', text_start, text_end,
+                             current_data_address, instruction_count, tuple(symbols[:memory_map_count]),
+                             tuple(symbols[memory_map_count:]),
+                             exit_code if flags & SNAPSHOT_HAS_EXIT_CODE else None, None,
+                             heap_break if flags & SNAPSHOT_HAS_HEAP_BREAK else None)
+
+def translate_mips_to_binary(input_file, output_file, output_format='text', byteorder='big', return_image=True,
+                             optimize=False):
+    """Translate MIPS instructions to binary, handling .data and .text sections.
+
+    output_format is 'text' (one line of 32 '0'/'1' characters per instruction)
+    or 'packed' (see write_packed_object). byteorder is the target endianness
+    used for the data image in memory and for the packed 4-byte words.
+    The source is streamed to the output (see Assembler.assemble_to_file).
+    Returns the assembled ProgramImage, or with return_image=False only the
+    instruction count, so that very large sources are never held in memory.
+    With optimize, the whole program is assembled in memory and run through
+    mips_optimizer.optimize_image before it is written.
+    """
+    if not optimize:
+        return Assembler(byteorder).assemble_to_file(input_file, output_file, output_format, return_image)
+    from mips_optimizer import optimize_image  # mips_optimizer builds on this module
+    image, _ = optimize_image(Assembler(byteorder).assemble_file(input_file))
+    if output_format == 'packed':
+        write_packed_object(output_file, image)
     else:
-        raise ValueError(f"Invalid immediate value '{immediate_value}'.")
-
-    opcode = opcode_map['addi']
-    rs = '00000'
-    return opcode + rs + rt + immediate
-
-def translate_mips_to_binary(input_file, output_file):
-    """Translate MIPS instructions to binary, handling .data and .text sections."""
-    global current_instruction_address
-    with open(input_file, 'r') as file:
-        lines = file.readlines()
-
-    binary_instructions = []
-    in_text_section = False
-
-    for line in lines:
-        line = line.strip()
-        if not line or line.startswith('#'):
-            continue
-
-        if line.startswith('.data'):
-            in_text_section = False
-            continue
-        elif line.startswith('.text'):
-            in_text_section = True
-            continue
-
-        if in_text_section:
-            if ':' in line:
-                label = line.split(':')[0].strip()
-                label_map[label] = current_instruction_address
-            else:
-                current_instruction_address += 4
+        write_text_object(output_file, image)
+    return image if return_image else len(image.text)
 
-    current_instruction_address = 0x00400000
-    for line in lines:
-        line = line.strip()
 
-        if not line or line.startswith('#'):
-            continue
 
-        if line.startswith('.data'):
-            in_text_section = False
-            continue
-        elif line.startswith('.text'):
-            in_text_section = True
-            continue
+# Trace levels for MIPSProcessor.run
+TRACE_OFF = 0      # No tracing; run() takes the untraced fast path
+TRACE_PC = 1       # Program counter of each traced step
+TRACE_CHANGED = 2  # PC plus the registers the instruction changed
+TRACE_FULL = 3     # PC plus all 32 registers (the original console trace)
 
-        if not in_text_section:
-            parse_data_section(line)
-            continue
 
-        if ':' in line:
-            continue
+class ConsoleTraceSink:
+    """Trace sink that formats records for the console, written in batches."""
+    wants_disassembly = True
 
-        operation = line.split()[0]
-        if operation in funct_map:
-            binary_instructions.append(parse_r_type(line))
-        elif operation in ['lw', 'sw', 'beq', 'bne', 'addi', 'slti', 'andi', 'ori', 'xori']:
-            binary_instructions.append(parse_i_type(line, current_instruction_address))
-        elif operation in ['j', 'jal']:
-            binary_instructions.append(parse_j_type(line))
-        elif operation == 'la':
-            binary_instructions.append(parse_la_instruction(line))
-        elif operation == 'li':
-            binary_instructions.append(parse_li_instruction(line))
+    def __init__(self, stream=None, batch_size=256):
+        self.stream = stream if stream is not None else sys.stdout
+        self.batch_size = batch_size
+        self.pending = []
 
-        current_instruction_address += 4
+    def emit(self, level, step, pc, text, changes):
+        if level == TRACE_PC:
+            self.pending.append(f"Executing at {hex(pc)}\n")
+        elif not changes:
+            self.pending.append(f"Executing at {hex(pc)}: {text}\n")
+        else:
+            values = ' | '.join(f"{register_names_by_index[i]}: {value}" for i, value in changes)
+            header = "Register values:" if level == TRACE_FULL else "Changed registers:"
+            self.pending.append(f"Executing at {hex(pc)}: {text}\n{header}\n{values}\n")
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.stream.write(''.join(self.pending))
+            self.pending.clear()
+        self.stream.flush()
+
+    def close(self):
+        self.flush()
+
+
+class JsonlTraceSink:
+    """Trace sink that writes one JSON object per record to a file, in batches."""
+
+    def __init__(self, path, batch_size=4096, disassemble=False):
+        self.file = open(path, 'w')
+        self.batch_size = batch_size
+        self.wants_disassembly = disassemble
+        self.pending = []
+
+    def emit(self, level, step, pc, text, changes):
+        record = {'step': step, 'pc': pc}
+        if text is not None:
+            record['asm'] = text
+        if changes is not None:
+            record['regs'] = {register_names_by_index[i]: value for i, value in changes}
+        self.pending.append(json.dumps(record))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.file.write('\n'.join(self.pending) + '\n')
+            self.pending.clear()
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+class BinaryTraceSink:
+    """Trace sink that writes compact little-endian binary records to a file.
+
+    Each record is a '<QIB' header (step, pc, register count) followed by that
+    many '<Bq' (register index, value) pairs.
+    """
+    wants_disassembly = False
+    record_header = struct.Struct('<QIB')
+    register_entry = struct.Struct('<Bq')
+
+    def __init__(self, path, batch_size=4096):
+        self.file = open(path, 'wb')
+        self.batch_size = batch_size
+        self.pending = bytearray()
+        self.count = 0
+
+    def emit(self, level, step, pc, text, changes):
+        changes = changes or ()
+        self.pending += self.record_header.pack(step, pc & 0xFFFFFFFF, len(changes))
+        for index, value in changes:
+            self.pending += self.register_entry.pack(index, (value + (1 << 63)) % (1 << 64) - (1 << 63))
+        self.count += 1
+        if self.count >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        self.file.write(self.pending)
+        self.pending.clear()
+        self.count = 0
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+# SPIM system call numbers, passed in $v0
+SYSCALL_PRINT_INT = 1
+SYSCALL_PRINT_STRING = 4
+SYSCALL_READ_INT = 5
+SYSCALL_READ_STRING = 8
+SYSCALL_SBRK = 9
+SYSCALL_EXIT = 10
+SYSCALL_PRINT_CHAR = 11
+SYSCALL_READ_CHAR = 12
+SYSCALL_OPEN = 13
+SYSCALL_READ = 14
+SYSCALL_WRITE = 15
+SYSCALL_CLOSE = 16
+SYSCALL_EXIT2 = 17
+
+# SYSCALL_OPEN flags (as in SPIM/MARS) -> Python file mode
+SYSCALL_FILE_MODES = {0: 'rb', 1: 'wb', 9: 'ab'}
+
+
+class SystemCalls:
+    """The SPIM syscall set for one MIPSProcessor.
+
+    Console output is buffered and written in large chunks: whenever more than
+    buffer_size characters are pending, on exit, and at the end of every run().
+    Console input is read a line at a time from input_stream; pass a string to
+    preload it. Strings and file data move between memory and Python in bulk
+    (PagedMemory.read_string, read_bytes, write_bytes), never one byte per call.
+    Memory bytes map to characters as Latin-1.
+    """
+
+    def __init__(self, input_stream=None, output_stream=None, buffer_size=65536):
+        if isinstance(input_stream, str):
+            input_stream = io.StringIO(input_stream)
+        self.input_stream = input_stream if input_stream is not None else sys.stdin
+        self.output_stream = output_stream if output_stream is not None else sys.stdout
+        self.buffer_size = buffer_size
+        self.pending = []
+        self.pending_size = 0
+        self.files = {}  # File descriptor -> binary file object from SYSCALL_OPEN
+        self.next_descriptor = 3  # 0, 1 and 2 are the console
+        self.heap_break = None  # Next address returned by sbrk; starts after the data section
+        self.handlers = {
+            SYSCALL_PRINT_INT: self.print_int, SYSCALL_PRINT_STRING: self.print_string,
+            SYSCALL_READ_INT: self.read_int, SYSCALL_READ_STRING: self.read_string,
+            SYSCALL_SBRK: self.sbrk, SYSCALL_EXIT: self.exit, SYSCALL_PRINT_CHAR: self.print_char,
+            SYSCALL_READ_CHAR: self.read_char, SYSCALL_OPEN: self.open, SYSCALL_READ: self.read,
+            SYSCALL_WRITE: self.write, SYSCALL_CLOSE: self.close_file, SYSCALL_EXIT2: self.exit2,
+        }
+
+    def dispatch(self, processor):
+        """Run the syscall selected by $v0; processor.pc already points past the syscall."""
+        handler = self.handlers.get(processor.registers[2])
+        if handler is None:
+            raise ValueError(f"Unsupported syscall {processor.registers[2]} at {hex(processor.pc - 4)}.")
+        handler(processor)
+
+    def emit(self, text):
+        """Append console output, writing it out once the buffer is full."""
+        self.pending.append(text)
+        self.pending_size += len(text)
+        if self.pending_size >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.output_stream.write(''.join(self.pending))
+            self.pending.clear()
+            self.pending_size = 0
+        self.output_stream.flush()
+
+    def close(self):
+        """Flush console output and close every file the program left open."""
+        self.flush()
+        for file in self.files.values():
+            file.close()
+        self.files.clear()
+
+    def print_int(self, processor):
+        value = processor.registers[4] & 0xFFFFFFFF
+        self.emit(str(value - 0x100000000 if value & 0x80000000 else value))
+
+    def print_string(self, processor):
+        self.emit(processor.memory.read_string(processor.registers[4]).decode('latin-1'))
+
+    def print_char(self, processor):
+        self.emit(chr(processor.registers[4] & 0xFF))
+
+    def read_int(self, processor):
+        try:
+            processor.registers[2] = int(self.input_stream.readline().strip())
+        except ValueError:
+            processor.registers[2] = 0
+
+    def read_string(self, processor):
+        """Read a line into the buffer at $a0: at most $a1 - 1 characters, then a NUL."""
+        length = processor.registers[5]
+        if length < 1:
+            return
+        data = self.input_stream.readline(length - 1).encode('latin-1', 'replace')
+        processor.memory.write_bytes(processor.registers[4], data + b'\0')
+
+    def read_char(self, processor):
+        character = self.input_stream.read(1)
+        processor.registers[2] = ord(character) & 0xFF if character else -1
+
+    def sbrk(self, processor):
+        """Return the current heap break in $v0 and move it up by $a0 bytes (kept 8-byte aligned)."""
+        if self.heap_break is None:
+            self.heap_break = (processor.current_data_address + 7) & ~7
+        processor.registers[2] = self.heap_break
+        self.heap_break = (self.heap_break + processor.registers[4] + 7) & ~7
+
+    def exit(self, processor):
+        self.exit2(processor, 0)
+
+    def exit2(self, processor, code=None):
+        """Flush output, record the exit code ($a0 for exit2) and halt by moving the PC past the text."""
+        self.flush()
+        processor.exit_code = processor.registers[4] if code is None else code
+        processor.pc = processor.text_end
+
+    def open(self, processor):
+        """Open the file named at $a0 with flags $a1 (0 read, 1 write, 9 append); $v0 = descriptor or -1."""
+        mode = SYSCALL_FILE_MODES.get(processor.registers[5])
+        name = processor.memory.read_string(processor.registers[4]).decode('latin-1')
+        try:
+            file = open(name, mode) if mode is not None else None
+        except OSError:
+            file = None
+        if file is None:
+            processor.registers[2] = -1
+            return
+        processor.registers[2] = descriptor = self.next_descriptor
+        self.files[descriptor] = file
+        self.next_descriptor += 1
+
+    def read(self, processor):
+        """Read up to $a2 bytes from descriptor $a0 into memory at $a1; $v0 = bytes read, or -1 on error."""
+        descriptor, length = processor.registers[4], processor.registers[6]
+        if length >= 0 and descriptor == 0:  # A negative length would make read() consume everything
+            data = self.input_stream.read(length).encode('latin-1', 'replace')
+        elif length >= 0 and descriptor in self.files:
+            data = self.files[descriptor].read(length)
+        else:
+            processor.registers[2] = -1
+            return
+        processor.memory.write_bytes(processor.registers[5], data)
+        processor.registers[2] = len(data)
+
+    def write(self, processor):
+        """Write $a2 bytes from memory at $a1 to descriptor $a0; $v0 = bytes written or -1."""
+        descriptor = processor.registers[4]
+        if processor.registers[6] < 0:
+            processor.registers[2] = -1
+            return
+        data = processor.memory.read_bytes(processor.registers[5], processor.registers[6])
+        if descriptor in (1, 2):
+            self.emit(data.decode('latin-1'))
+        elif descriptor in self.files:
+            self.files[descriptor].write(data)
+        else:
+            processor.registers[2] = -1
+            return
+        processor.registers[2] = len(data)
+
+    def close_file(self, processor):
+        file = self.files.pop(processor.registers[4], None)
+        if file is not None:
+            file.close()
 
-    with open(output_file, 'w') as file:
-        for binary_instruction in binary_instructions:
-            file.write(binary_instruction + '\n')
 
+# Execution modes for MIPSProcessor.run when tracing is off
+EXEC_REFERENCE = 'reference'  # execute_instruction on the stored binary string every step
+EXEC_DECODED = 'decoded'      # Dispatch through the pre-decoded instruction cache
+EXEC_BLOCK = 'block'          # Run translated basic blocks, one Python call per block
 
 
 class MIPSProcessor:
-    def __init__(self, memory_map, memory, label_map, current_data_address, current_instruction_address):
+    def __init__(self, memory_map, memory, label_map, current_data_address, current_instruction_address,
+                 trace_level=TRACE_FULL, trace_interval=1, trace_sink=None, execution_mode=EXEC_DECODED,
+                 syscalls=None):
         self.registers = [0] * 32  # 32 MIPS registers initialized to 0
-        self.memory = memory  # Use the memory dictionary from the translation phase
+        self.registers[28] = GLOBAL_POINTER_START  # $gp
+        self.registers[29] = STACK_POINTER_START  # $sp
+        self.memory = memory  # Use the PagedMemory from the translation phase
         self.memory_map = memory_map  # Use memory_map for resolving data addresses
         self.label_map = label_map  # Use label_map for resolving jump addresses
+        # (label_map it was built from, address -> label) for disassembly; built on first use and
+        # dropped whenever labels are loaded (see invalidate_labels)
+        self.label_addresses = None
         self.current_data_address = current_data_address  # Starting point for data section
         self.pc = current_instruction_address  # Start program counter at the start of the text segment
+        self.text_start = current_instruction_address  # Bounds of the loaded text segment
+        self.text_end = current_instruction_address
+        self.decoded_cache = {}  # Maps text address -> DecodedInstruction
+        self.trace_level = trace_level  # One of TRACE_OFF / TRACE_PC / TRACE_CHANGED / TRACE_FULL
+        self.trace_interval = trace_interval  # Trace every Nth executed instruction
+        self.trace_sink = trace_sink if trace_sink is not None else ConsoleTraceSink()
+        self.execution_mode = execution_mode  # One of EXEC_REFERENCE / EXEC_DECODED / EXEC_BLOCK
+        self.block_cache = {}  # Maps block start address -> TranslatedBlock
+        self.instruction_count = 0  # Instructions executed so far across run() calls
+        self.syscalls = syscalls if syscalls is not None else SystemCalls()  # Console, file and heap state
+        self.exit_code = None  # Set by the exit syscalls
+        # Objects with on_step(pc, decoded, next_pc), called after every instruction (see run_instrumented)
+        self.step_observers = []
+        # Object with fetch(address) and access(address, size, is_write), told about every
+        # instruction fetch and load/store (see mips_cachesim.MemoryHierarchy)
+        self.memory_hierarchy = None
+        # Object with run(processor, max_steps) used for untraced runs (see mips_profiler.Profiler)
+        self.profiler = None
+        # Debugging: PCs to stop at before executing, and byte address -> 'r' / 'w' / 'rw' watched by loads/stores
+        self.breakpoints = set()
+        self.watchpoints = {}
+        # Why the last run() stopped early: ('breakpoint', pc), ('until', pc) or
+        # ('watchpoint', address, 'r' / 'w', pc); None if it halted or used up max_steps
+        self.stop_reason = None
+
+        # Handlers for the pre-decoded fast path, keyed by integer opcode / funct
+        self.r_type_handlers = {
+            0b100000: self._exec_add, 0b100010: self._exec_sub, 0b100100: self._exec_and,
+            0b100101: self._exec_or, 0b101010: self._exec_slt, 0b000000: self._exec_sll,
+            0b011000: self._exec_mul, 0b000010: self._exec_srl, 0b001000: self._exec_jr,
+            0b001100: self._exec_syscall,
+        }
+        self.i_type_handlers = {
+            0b100011: self._exec_lw, 0b101011: self._exec_sw, 0b001000: self._exec_addi,
+            0b000100: self._exec_beq, 0b000101: self._exec_bne, 0b001010: self._exec_slti,
+            0b001100: self._exec_andi, 0b001101: self._exec_ori, 0b001110: self._exec_xori,
+            0b001111: self._exec_lui, 0b100000: self._exec_lb, 0b100100: self._exec_lbu,
+            0b100001: self._exec_lh, 0b100101: self._exec_lhu, 0b101000: self._exec_sb,
+            0b101001: self._exec_sh,
+        }
+        self.j_type_handlers = {0b000010: self._exec_j, 0b000011: self._exec_jal}
 
     def load_instructions(self, binary_file):
-        """Load binary instructions from a file into memory."""
+        """Load binary instructions from a file into memory and pre-decode them."""
         with open(binary_file, 'r') as file:
             lines = file.readlines()
 
         address = self.pc
+        self.decoded_cache.clear()
+        self.block_cache.clear()
         for line in lines:
             line = line.strip()
             if line:
-                self.memory[address] = line
+                word = int(line, 2)
+                self.memory.write_word(address, word)
+                self.decode_word(address, word)
                 address += 4
+        self.text_start = self.pc
+        self.text_end = address
+
+    def load_object(self, object_file):
+        """Load a packed object file written by write_packed_object.
+
+        The file is memory-mapped and the text words are decoded directly from a
+        memoryview over the mapping (see map_packed_object); the data image and
+        symbol tables are merged into this processor's memory, memory_map and
+        label_map. If the object's byte order differs from memory's, memory is
+        replaced by an empty PagedMemory in the object's byte order.
+        """
+        with map_packed_object(object_file) as packed:
+            if self.memory.byteorder != packed.byteorder:
+                self.memory = PagedMemory(packed.byteorder)
+            self.memory.write_bytes(packed.data_start, packed.data)
+            self.load_text(packed.text_start, packed.words)
+        self.current_data_address = packed.data_end
+        self.memory_map.update(packed.memory_map)
+        self.label_map.update(packed.label_map)
+        self.invalidate_labels()
+
+    @classmethod
+    def from_image(cls, image, **options):
+        """Create a processor with a ProgramImage loaded and the PC at its first instruction."""
+        processor = cls(dict(image.memory_map), PagedMemory(image.byteorder), dict(image.label_map),
+                        image.data_end, image.text_start, **options)
+        processor.load_image(image)
+        return processor
+
+    def load_image(self, image):
+        """Load a ProgramImage's text and data into memory and pre-decode the text."""
+        self.memory.write_bytes(image.data_start, image.data)
+        self.load_text(image.text_start, image.text)
+        self.current_data_address = image.data_end
+        self.memory_map.update(image.memory_map)
+        self.label_map.update(image.label_map)
+        self.invalidate_labels()
+
+    def load_text(self, start, words):
+        """Write consecutive instruction words from start into memory, pre-decode them and set the PC there."""
+        self.decoded_cache.clear()
+        self.block_cache.clear()
+        address = start
+        for word in words:
+            self.memory.write_word(address, word)
+            self.decode_word(address, word)
+            address += 4
+        self.pc = self.text_start = start
+        self.text_end = address
+
+    def decode_at(self, address):
+        """Decode the instruction stored at an address once and cache its integer form."""
+        return self.decode_word(address, self.memory.read_word(address, signed=False))
+
+    def decode_word(self, address, word):
+        """Decode a 32-bit instruction word and cache it for the given text address."""
+        opcode = word >> 26
+        rs = (word >> 21) & 0x1F
+        rt = (word >> 16) & 0x1F
+        rd = shamt = funct = imm = 0
+        handler = self._exec_nop
+
+        if opcode == 0:  # R-type instruction
+            rd = (word >> 11) & 0x1F
+            shamt = (word >> 6) & 0x1F
+            funct = word & 0x3F
+            if funct != 0 or shamt != 0:  # sll with a zero shift amount is a no-op
+                handler = self.r_type_handlers.get(funct, self._exec_nop)
+        elif opcode in self.i_type_handlers:
+            imm = (word & 0xFFFF) - ((word & 0x8000) << 1)
+            handler = self.i_type_handlers[opcode]
+        elif opcode in self.j_type_handlers:
+            rs = rt = 0
+            imm = word & 0x3FFFFFF
+            handler = self.j_type_handlers[opcode]
+
+        decoded = DecodedInstruction(opcode, rs, rt, rd, shamt, funct, imm, handler)
+        self.decoded_cache[address] = decoded
+        return decoded
+
+    def invalidate_decoded(self, address):
+        """Drop cached decodings and translated blocks for a word written into the text segment."""
+        if self.text_start <= address < self.text_end:
+            address &= ~3
+            self.decoded_cache.pop(address, None)
+            stale = [start for start, block in self.block_cache.items() if block.start <= address < block.end]
+            for start in stale:
+                del self.block_cache[start]
+
+    def translate_block(self, start):
+        """Translate the basic block starting at an address into a compiled Python function.
+
+        The block runs until a beq/bne/j/jal/jr/syscall (inclusive) or until the end of
+        the text segment. A store that lands in the text segment ends the block
+        early so the run loop sees the invalidated code; the function then
+        reports fewer executed instructions than the block's length.
+        """
+        lines = [f"def block(self, r, mem):"]
+        address = start
+        while self.text_start <= address < self.text_end:
+            decoded = self.decoded_cache.get(address)
+            if decoded is None:
+                decoded = self.decode_at(address)
+            statements, terminates = self._block_statements(address, decoded, (address - start) // 4 + 1)
+            lines.extend('    ' + statement for statement in statements)
+            address += 4
+            if terminates:
+                break
+        else:
+            lines.append(f"    return {address}, {(address - start) // 4}")
+
+        namespace = {}
+        exec(compile('\n'.join(lines), f'<mips block {hex(start)}>', 'exec'), namespace)
+        block = TranslatedBlock(start, address, (address - start) // 4, namespace['block'])
+        self.block_cache[start] = block
+        return block
+
+    def _block_statements(self, pc, decoded, count):
+        """Python source for one decoded instruction, plus whether it ends the block.
+
+        count is the number of instructions executed once this one has run,
+        returned alongside the next PC from every exit of the block.
+        """
+        opcode, rs, rt, rd, shamt, funct, imm, handler = decoded
+        next_pc = pc + 4
+        func = handler.__func__
+        cls = MIPSProcessor
+        if func is cls._exec_add:
+            return [f"r[{rd}] = r[{rs}] + r[{rt}]"], False
+        if func is cls._exec_sub:
+            return [f"r[{rd}] = r[{rs}] - r[{rt}]"], False
+        if func is cls._exec_and:
+            return [f"r[{rd}] = r[{rs}] & r[{rt}]"], False
+        if func is cls._exec_or:
+            return [f"r[{rd}] = r[{rs}] | r[{rt}]"], False
+        if func is cls._exec_slt:
+            return [f"r[{rd}] = 1 if r[{rs}] < r[{rt}] else 0"], False
+        if func is cls._exec_sll:
+            return [f"r[{rd}] = r[{rt}] << {shamt}"], False
+        if func is cls._exec_mul:
+            return [f"r[{rd}] = r[{rs}] * r[{rt}]"], False
+        if func is cls._exec_srl:
+            return [f"r[{rd}] = r[{rt}] >> {shamt}"], False
+        if func is cls._exec_jr:
+            return [f"return r[{rs}], {count}"], True
+        if func is cls._exec_syscall:
+            return [f"self.pc = {next_pc}", "self.syscalls.dispatch(self)", f"return self.pc, {count}"], True
+        loads = {cls._exec_lw: 'read_word({})', cls._exec_lh: 'read_half({})',
+                 cls._exec_lhu: 'read_half({}, False)', cls._exec_lb: 'read_byte({})',
+                 cls._exec_lbu: 'read_byte({}, False)'}
+        stores = {cls._exec_sw: 'write_word', cls._exec_sh: 'write_half', cls._exec_sb: 'write_byte'}
+        if func in loads or func in stores:
+            if rs:
+                statements = [f"a = (r[{rs}] + {imm}) & 0xFFFFFFFF"]
+                address = 'a'
+            else:
+                statements = []
+                address = self.current_data_address - imm
+            if func in loads:
+                return statements + [f"r[{rt}] = mem." + loads[func].format(address)], False
+            statements.append(f"mem.{stores[func]}({address}, r[{rt}])")
+            if rs:
+                statements += [f"if {self.text_start} <= a < {self.text_end}:",
+                               f"    self.invalidate_decoded(a)", f"    return {next_pc}, {count}"]
+            elif self.text_start <= address < self.text_end:
+                statements += [f"self.invalidate_decoded({address})", f"return {next_pc}, {count}"]
+                return statements, True
+            return statements, False
+        if func is cls._exec_lui:
+            return [f"r[{rt}] = {(imm & 0xFFFF) << 16}"], False
+        if func is cls._exec_addi:
+            return [f"r[{rt}] = r[{rs}] + {imm}"], False
+        if func is cls._exec_beq:
+            return [f"return ({next_pc + imm * 4} if r[{rs}] == r[{rt}] else {next_pc}), {count}"], True
+        if func is cls._exec_bne:
+            return [f"return ({next_pc + imm * 4} if r[{rs}] != r[{rt}] else {next_pc}), {count}"], True
+        if func is cls._exec_slti:
+            return [f"r[{rt}] = 1 if r[{rs}] < {imm} else 0"], False
+        if func is cls._exec_andi:
+            return [f"r[{rt}] = r[{rs}] & {imm & 0xFFFF}"], False
+        if func is cls._exec_ori:
+            return [f"r[{rt}] = r[{rs}] | {imm & 0xFFFF}"], False
+        if func is cls._exec_xori:
+            return [f"r[{rt}] = r[{rs}] ^ {imm & 0xFFFF}"], False
+        if func is cls._exec_j:
+            return [f"return {(next_pc & 0xF0000000) | (imm << 2)}, {count}"], True
+        if func is cls._exec_jal:
+            return [f"r[31] = {next_pc}", f"return {(next_pc & 0xF0000000) | (imm << 2)}, {count}"], True
+        return [], False  # nop and unimplemented encodings
 
     def get_register_name(self, reg_code):
         """Convert a 5-bit register code into its corresponding register name."""
-        register_names = {v: k for k, v in register_map.items()}
         return register_names.get(reg_code, f'${int(reg_code, 2)}')
 
     def get_register(self, reg_code):
@@ -350,69 +1510,238 @@ class MIPSProcessor:
         else:
             return int(value, 2)
 
-    def decode_instruction(self, instruction):
-        """Decode a 32-bit binary MIPS instruction into its MIPS assembly form."""
-        opcode = instruction[:6]
-
-        if opcode == '000000':  # R-type instruction
-            rs = self.get_register_name(instruction[6:11])
-            rt = self.get_register_name(instruction[11:16])
-            rd = self.get_register_name(instruction[16:21])
-            shamt = int(instruction[21:26], 2)
-            funct = instruction[26:]
-            funct_names = {v: k for k, v in funct_map.items()}
-            operation = funct_names.get(funct, 'unknown')
-
-            if operation == 'sll' or operation == 'srl':
-                return f"{operation} {rd}, {rt}, {shamt}"
-            elif operation == 'jr':
-                return f"{operation} {rs}"
+    def invalidate_labels(self):
+        """Rebuild the disassembly label index on next use; call after editing label_map in place."""
+        self.label_addresses = None
+
+    def decode_instruction(self, instruction, address=None):
+        """Decode a 32-bit binary MIPS instruction into its MIPS assembly form.
+
+        Branch targets are resolved relative to address (default: the current PC).
+        """
+        if isinstance(instruction, str):
+            instruction = int(instruction, 2)
+        if self.label_addresses is None or self.label_addresses[0] is not self.label_map:
+            self.label_addresses = (self.label_map, LabelIndex(self.label_map).exact)
+        return format_instruction(instruction & 0xFFFFFFFF, self.pc if address is None else address,
+                                  self.label_addresses[1])
+
+    def snapshot(self):
+        """Capture pc, registers, memory and run status; memory pages are shared copy-on-write, not copied.
+
+        Of the syscall state only the sbrk heap break is captured: console and
+        file I/O already performed cannot be taken back.
+        """
+        return ProcessorSnapshot(self.pc, tuple(self.registers), self.memory.snapshot(), self.memory.byteorder,
+                                 self.text_start, self.text_end, self.current_data_address,
+                                 self.instruction_count, tuple(self.memory_map.items()),
+                                 tuple(self.label_map.items()), self.exit_code, self.stop_reason,
+                                 self.syscalls.heap_break)
+
+    def restore(self, snapshot):
+        """Return to a state captured by snapshot (which stays valid for further restores).
+
+        The decoded instruction and block caches are kept when the text pages are
+        the very same objects as in the snapshot, and cleared otherwise.
+        """
+        text_pages = range(snapshot.text_start >> PAGE_SHIFT, ((snapshot.text_end - 1) >> PAGE_SHIFT) + 1)
+        same_text = ((self.text_start, self.text_end) == (snapshot.text_start, snapshot.text_end)
+                     and self.memory.byteorder == snapshot.byteorder
+                     and all(self.memory.pages.get(number) is snapshot.pages.get(number) for number in text_pages))
+        if not same_text:
+            self.decoded_cache.clear()
+            self.block_cache.clear()
+        if self.memory.byteorder != snapshot.byteorder:
+            self.memory = PagedMemory(snapshot.byteorder)
+        self.memory.restore(snapshot.pages)
+        self.registers[:] = snapshot.registers
+        self.pc = snapshot.pc
+        self.text_start, self.text_end = snapshot.text_start, snapshot.text_end
+        self.current_data_address = snapshot.current_data_address
+        self.instruction_count = snapshot.instruction_count
+        self.exit_code = snapshot.exit_code
+        self.stop_reason = snapshot.stop_reason
+        self.syscalls.heap_break = snapshot.heap_break
+        self.memory_map.update(snapshot.memory_map)
+        self.label_map.update(snapshot.label_map)
+        self.invalidate_labels()
+
+    @classmethod
+    def from_snapshot(cls, snapshot, **options):
+        """Create a new processor resumed from a snapshot."""
+        processor = cls({}, PagedMemory(snapshot.byteorder), {}, snapshot.current_data_address,
+                        snapshot.text_start, **options)
+        processor.restore(snapshot)
+        return processor
+
+    def save_snapshot(self, output_file):
+        """Snapshot this processor and write it to a file (see write_snapshot)."""
+        write_snapshot(output_file, self.snapshot())
+
+    @property
+    def halted(self):
+        """True once the PC has left the loaded text segment."""
+        return not self.text_start <= self.pc < self.text_end
+
+    def run(self, max_steps=None, until_pc=None):
+        """Run the MIPS processor, tracing steps to the trace sink at the configured level.
+
+        Traced runs, runs with step observers, a memory hierarchy, breakpoints
+        or watchpoints attached, and runs with until_pc always step one
+        instruction at a time. Otherwise an attached profiler runs the program,
+        or else the configured execution_mode is used.
+        With max_steps, execution stops after that many instructions even if
+        the program has not halted, and a later call resumes from the current
+        PC. Execution also stops before an instruction at until_pc or at a
+        breakpoint, or after a watched access (see stop_reason). Buffered
+        syscall output is flushed before returning. Returns the number of
+        instructions executed.
+        """
+        self.stop_reason = None
+        if (self.trace_level == TRACE_OFF and not self.step_observers and self.memory_hierarchy is None
+                and not self.breakpoints and not self.watchpoints and until_pc is None):
+            if self.profiler is not None:
+                steps = self.profiler.run(self, max_steps)
+            elif self.execution_mode == EXEC_BLOCK:
+                steps = self.run_blocks(max_steps)
+            elif self.execution_mode == EXEC_REFERENCE:
+                steps = self.run_reference(max_steps)
             else:
-                return f"{operation} {rd}, {rs}, {rt}"
-
-        elif opcode in ['100011', '101011', '001000', '000100', '000101', '001010', '001100', '001101', '001110']:
-            # I-type instructions: lw, sw, addi, beq, bne, slti, andi, ori, xori
-            rs = self.get_register_name(instruction[6:11])
-            rt = self.get_register_name(instruction[11:16])
-            immediate = self.sign_extend(instruction[16:])
-            operation = {
-                '100011': 'lw', '101011': 'sw', '001000': 'addi',
-                '000100': 'beq', '000101': 'bne', '001010': 'slti',
-                '001100': 'andi', '001101': 'ori', '001110': 'xori'
-            }[opcode]
-
-            if operation in ['lw', 'sw']:
-                return f"{operation} {rt}, {immediate}({rs})"
-            elif operation in ['beq', 'bne']:
-                # Try to resolve the label from the offset
-                target_address = self.pc + (immediate * 4)
-                label = next((k for k, v in self.label_map.items() if v == target_address), hex(target_address))
-                return f"{operation} {rs}, {rt}, {label}"
-            else:
-                return f"{operation} {rt}, {rs}, {immediate}"
-
-        elif opcode in ['000010', '000011']:  # J-type instructions: j, jal
-            address = int(instruction[6:], 2) << 2
-            operation = 'j' if opcode == '000010' else 'jal'
-            label = next((k for k, v in self.label_map.items() if v == address), hex(address))
-            return f"{operation} {label}"
-
-        return "unknown instruction"
-
-    def run(self):
-        """Run the MIPS processor and print each instruction with register states."""
-        while self.pc in self.memory:
-            instruction = self.memory[self.pc]
-            decoded_instruction = self.decode_instruction(instruction)
-            print(f"Executing at {hex(self.pc)}: {decoded_instruction}")
-
+                steps = self.run_untraced(max_steps)
+        else:
+            try:
+                steps = self.run_instrumented(max_steps, until_pc)
+            finally:
+                self.trace_sink.flush()
+        self.instruction_count += steps
+        self.syscalls.flush()
+        return steps
+
+    def run_untraced(self, max_steps=None):
+        """Execute until the PC leaves the text segment, with no tracing work in the loop."""
+        text_start, text_end = self.text_start, self.text_end
+        decoded_cache = self.decoded_cache
+        limit = -1 if max_steps is None else max_steps
+        steps = 0
+        while text_start <= self.pc < text_end and steps != limit:
+            pc = self.pc
+            decoded = decoded_cache.get(pc)
+            if decoded is None:
+                decoded = self.decode_at(pc)
+            self.pc = pc + 4  # Move to the next instruction by default
+            decoded.handler(decoded.rs, decoded.rt, decoded.rd, decoded.shamt, decoded.imm)
+            steps += 1
+        return steps
+
+    def run_blocks(self, max_steps=None):
+        """Execute until the PC leaves the text segment, one compiled call per basic block.
+
+        A block that would overrun max_steps is finished one instruction at a time.
+        """
+        text_start, text_end = self.text_start, self.text_end
+        block_cache = self.block_cache
+        steps = 0
+        while text_start <= self.pc < text_end:
+            block = block_cache.get(self.pc)
+            if block is None:
+                block = self.translate_block(self.pc)
+            if max_steps is not None and steps + block.length > max_steps:
+                return steps + self.run_untraced(max_steps - steps)
+            self.pc, executed = block.function(self, self.registers, self.memory)
+            steps += executed
+        return steps
+
+    def run_reference(self, max_steps=None):
+        """Execute until the PC leaves the text segment with the string-based reference interpreter."""
+        limit = -1 if max_steps is None else max_steps
+        steps = 0
+        while self.text_start <= self.pc < self.text_end and steps != limit:
+            instruction = format(self.memory.read_word(self.pc, signed=False), '032b')
             self.pc += 4  # Move to the next instruction by default
             self.execute_instruction(instruction)
-
-            self.print_registers()  # Print the state of registers after each instruction
+            steps += 1
+        return steps
+
+    def run_instrumented(self, max_steps=None, until_pc=None):
+        """Execute one instruction at a time, tracing and notifying step observers.
+
+        Every trace_interval-th step is emitted to the trace sink (unless tracing
+        is off), and each observer's on_step(pc, decoded, next_pc) is called
+        after every instruction. The memory hierarchy, if any, sees each fetch
+        and each load/store address before the instruction executes.
+        Breakpoints and until_pc are checked before each instruction except the
+        first, so a stopped run can be resumed; watchpoints stop the run right
+        after the watched access.
+        """
+        text_start, text_end = self.text_start, self.text_end
+        decoded_cache = self.decoded_cache
+        registers = self.registers
+        level = self.trace_level
+        interval = self.trace_interval
+        sink = self.trace_sink
+        wants_disassembly = sink.wants_disassembly and level != TRACE_PC
+        observers = self.step_observers
+        hierarchy = self.memory_hierarchy
+        stops = self.breakpoints if until_pc is None else self.breakpoints | {until_pc}
+        watchpoints = self.watchpoints
+        watched = None
+        step = first = self.instruction_count
+        limit = -1 if max_steps is None else step + max_steps
+        while text_start <= self.pc < text_end and step != limit:
+            pc = self.pc
+            if pc in stops and step != first:
+                self.stop_reason = ('until' if pc == until_pc else 'breakpoint', pc)
+                break
+            decoded = decoded_cache.get(pc)
+            if decoded is None:
+                decoded = self.decode_at(pc)
+
+            sampled = level != TRACE_OFF and step % interval == 0
+            if sampled:
+                text = self.decode_instruction(self.memory.read_word(pc, signed=False)) if wants_disassembly else None
+                if level == TRACE_CHANGED:
+                    before = registers[:]
+            if hierarchy is not None:
+                hierarchy.fetch(pc)
+                access = memory_access_sizes.get(decoded.opcode)
+                if access is not None:
+                    hierarchy.access(self.effective_address(decoded.rs, decoded.imm), *access)
+            if watchpoints:
+                access = memory_access_sizes.get(decoded.opcode)
+                if access is not None:
+                    watched = self.watched_access(self.effective_address(decoded.rs, decoded.imm), *access)
+
+            self.pc = pc + 4  # Move to the next instruction by default
+            decoded.handler(decoded.rs, decoded.rt, decoded.rd, decoded.shamt, decoded.imm)
+
+            if sampled:
+                if level == TRACE_FULL:
+                    changes = list(enumerate(registers))
+                elif level == TRACE_CHANGED:
+                    changes = [(i, value) for i, value in enumerate(registers) if value != before[i]]
+                else:
+                    changes = None
+                sink.emit(level, step, pc, text, changes)
+            for observer in observers:
+                observer.on_step(pc, decoded, self.pc)
+            step += 1
+            if watched is not None:
+                self.stop_reason = ('watchpoint', watched[0], watched[1], pc)
+                break
+        return step - self.instruction_count
+
+    def watched_access(self, address, size, is_write):
+        """(address, 'r' / 'w') if a load/store touches a watched byte, else None."""
+        kind = 'w' if is_write else 'r'
+        for byte in range(address, address + size):
+            if kind in self.watchpoints.get(byte, ''):
+                return byte, kind
+        return None
 
     def execute_instruction(self, instruction):
         """Decode and execute a 32-bit binary MIPS instruction."""
+        if not isinstance(instruction, str):  # Packed or stored word
+            instruction = format(instruction & 0xFFFFFFFF, '032b')
         opcode = instruction[:6]
 
         if opcode == '000000':  # R-type instruction
@@ -424,8 +1753,8 @@ class MIPSProcessor:
 
             self.execute_r_type(rs, rt, rd, shamt, funct)
 
-        elif opcode in ['100011', '101011', '001000', '000100', '000101', '001010', '001100', '001101', '001110']:
-            # I-type instructions: lw, sw, addi, beq, bne, slti, andi, ori, xori
+        elif opcode in i_type_opcodes:
+            # I-type instructions: loads/stores, addi, beq, bne, slti, andi, ori, xori, lui
             rs = self.get_register(instruction[6:11])
             rt = self.get_register(instruction[11:16])
             immediate = self.sign_extend(instruction[16:])
@@ -456,15 +1785,36 @@ class MIPSProcessor:
             self.registers[rd] = self.registers[rt] >> shamt
         elif funct == '001000':  # jr
             self.pc = self.registers[rs]
+        elif funct == '001100':  # syscall
+            self.syscalls.dispatch(self)
 
     def execute_i_type(self, opcode, rs, rt, immediate):
         """Execute an I-type instruction."""
         if opcode == '100011':  # lw
-            address = self.current_data_address - immediate  # Calculate effective address
-            self.registers[rt] = self.memory.get(address, 0)  # Load from memory
+            address = self.effective_address(rs, immediate)  # Calculate effective address
+            self.registers[rt] = self.memory.read_word(address)  # Load from memory
         elif opcode == '101011':  # sw
-            address = self.current_data_address - immediate  # Calculate effective address
-            self.memory[address] = self.registers[rt]  # Store to memory
+            address = self.effective_address(rs, immediate)  # Calculate effective address
+            self.memory.write_word(address, self.registers[rt])  # Store to memory
+            self.invalidate_decoded(address)
+        elif opcode == '100001':  # lh
+            self.registers[rt] = self.memory.read_half(self.effective_address(rs, immediate))
+        elif opcode == '100101':  # lhu
+            self.registers[rt] = self.memory.read_half(self.effective_address(rs, immediate), signed=False)
+        elif opcode == '101001':  # sh
+            address = self.effective_address(rs, immediate)
+            self.memory.write_half(address, self.registers[rt])
+            self.invalidate_decoded(address)
+        elif opcode == '100000':  # lb
+            self.registers[rt] = self.memory.read_byte(self.effective_address(rs, immediate))
+        elif opcode == '100100':  # lbu
+            self.registers[rt] = self.memory.read_byte(self.effective_address(rs, immediate), signed=False)
+        elif opcode == '101000':  # sb
+            address = self.effective_address(rs, immediate)
+            self.memory.write_byte(address, self.registers[rt])
+            self.invalidate_decoded(address)
+        elif opcode == '001111':  # lui
+            self.registers[rt] = (immediate & 0xFFFF) << 16
         elif opcode == '001000':  # addi
             self.registers[rt] = self.registers[rs] + immediate
         elif opcode == '000100':  # beq
@@ -482,6 +1832,16 @@ class MIPSProcessor:
         elif opcode == '001110':  # xori
             self.registers[rt] = self.registers[rs] ^ (immediate & 0xFFFF)
 
+    def effective_address(self, rs, immediate):
+        """Effective address of a load/store.
+
+        With a base register this is register + offset. Label operands are encoded
+        against $zero as an offset back from current_data_address.
+        """
+        if rs:
+            return (self.registers[rs] + immediate) & 0xFFFFFFFF
+        return self.current_data_address - immediate
+
     def execute_j_type(self, opcode, address):
         """Execute a J-type instruction."""
         if opcode == '000010':  # j
@@ -490,20 +1850,122 @@ class MIPSProcessor:
             self.registers[31] = self.pc  # Store return address in $ra
             self.pc = (self.pc & 0xF0000000) | (address << 2)
 
+    # Pre-decoded handlers: each takes (rs, rt, rd, shamt, imm) as integers and
+    # mirrors the corresponding branch of execute_r_type / execute_i_type / execute_j_type
+
+    def _exec_nop(self, rs, rt, rd, shamt, imm):
+        pass
+
+    def _exec_add(self, rs, rt, rd, shamt, imm):
+        self.registers[rd] = self.registers[rs] + self.registers[rt]
+
+    def _exec_sub(self, rs, rt, rd, shamt, imm):
+        self.registers[rd] = self.registers[rs] - self.registers[rt]
+
+    def _exec_and(self, rs, rt, rd, shamt, imm):
+        self.registers[rd] = self.registers[rs] & self.registers[rt]
+
+    def _exec_or(self, rs, rt, rd, shamt, imm):
+        self.registers[rd] = self.registers[rs] | self.registers[rt]
+
+    def _exec_slt(self, rs, rt, rd, shamt, imm):
+        self.registers[rd] = 1 if self.registers[rs] < self.registers[rt] else 0
+
+    def _exec_sll(self, rs, rt, rd, shamt, imm):
+        self.registers[rd] = self.registers[rt] << shamt
+
+    def _exec_mul(self, rs, rt, rd, shamt, imm):
+        self.registers[rd] = self.registers[rs] * self.registers[rt]
+
+    def _exec_srl(self, rs, rt, rd, shamt, imm):
+        self.registers[rd] = self.registers[rt] >> shamt
+
+    def _exec_jr(self, rs, rt, rd, shamt, imm):
+        self.pc = self.registers[rs]
+
+    def _exec_syscall(self, rs, rt, rd, shamt, imm):
+        self.syscalls.dispatch(self)
+
+    def _exec_lw(self, rs, rt, rd, shamt, imm):
+        address = (self.registers[rs] + imm) & 0xFFFFFFFF if rs else self.current_data_address - imm
+        self.registers[rt] = self.memory.read_word(address)
+
+    def _exec_sw(self, rs, rt, rd, shamt, imm):
+        address = (self.registers[rs] + imm) & 0xFFFFFFFF if rs else self.current_data_address - imm
+        self.memory.write_word(address, self.registers[rt])
+        if self.text_start <= address < self.text_end:
+            self.invalidate_decoded(address)
+
+    def _exec_lh(self, rs, rt, rd, shamt, imm):
+        self.registers[rt] = self.memory.read_half(self.effective_address(rs, imm))
+
+    def _exec_lhu(self, rs, rt, rd, shamt, imm):
+        self.registers[rt] = self.memory.read_half(self.effective_address(rs, imm), False)
+
+    def _exec_sh(self, rs, rt, rd, shamt, imm):
+        address = self.effective_address(rs, imm)
+        self.memory.write_half(address, self.registers[rt])
+        if self.text_start <= address < self.text_end:
+            self.invalidate_decoded(address)
+
+    def _exec_lb(self, rs, rt, rd, shamt, imm):
+        self.registers[rt] = self.memory.read_byte(self.effective_address(rs, imm))
+
+    def _exec_lbu(self, rs, rt, rd, shamt, imm):
+        self.registers[rt] = self.memory.read_byte(self.effective_address(rs, imm), False)
+
+    def _exec_sb(self, rs, rt, rd, shamt, imm):
+        address = self.effective_address(rs, imm)
+        self.memory.write_byte(address, self.registers[rt])
+        if self.text_start <= address < self.text_end:
+            self.invalidate_decoded(address)
+
+    def _exec_lui(self, rs, rt, rd, shamt, imm):
+        self.registers[rt] = (imm & 0xFFFF) << 16
+
+    def _exec_addi(self, rs, rt, rd, shamt, imm):
+        self.registers[rt] = self.registers[rs] + imm
+
+    def _exec_beq(self, rs, rt, rd, shamt, imm):
+        if self.registers[rs] == self.registers[rt]:
+            self.pc += imm * 4
+
+    def _exec_bne(self, rs, rt, rd, shamt, imm):
+        if self.registers[rs] != self.registers[rt]:
+            self.pc += imm * 4
+
+    def _exec_slti(self, rs, rt, rd, shamt, imm):
+        self.registers[rt] = 1 if self.registers[rs] < imm else 0
+
+    def _exec_andi(self, rs, rt, rd, shamt, imm):
+        self.registers[rt] = self.registers[rs] & (imm & 0xFFFF)
+
+    def _exec_ori(self, rs, rt, rd, shamt, imm):
+        self.registers[rt] = self.registers[rs] | (imm & 0xFFFF)
+
+    def _exec_xori(self, rs, rt, rd, shamt, imm):
+        self.registers[rt] = self.registers[rs] ^ (imm & 0xFFFF)
+
+    def _exec_j(self, rs, rt, rd, shamt, imm):
+        self.pc = (self.pc & 0xF0000000) | (imm << 2)
+
+    def _exec_jal(self, rs, rt, rd, shamt, imm):
+        self.registers[31] = self.pc  # Store return address in $ra
+        self.pc = (self.pc & 0xF0000000) | (imm << 2)
+
     def print_registers(self):
         """Print the current state of the registers horizontally."""
         print("Register values:")
         register_values = []
         for i in range(32):
-            reg_name = self.get_register_name(format(i, '05b'))
-            register_values.append(f"{reg_name}: {self.registers[i]}")
+            register_values.append(f"{register_names_by_index[i]}: {self.registers[i]}")
         # Join the values with a separator and print them in one line
         print(' | '.join(register_values))
 
     def print_memory(self):
         """Print the current state of memory."""
         print("Memory values:")
-        for address, value in sorted(self.memory.items()):
+        for address, value in self.memory.nonzero_words():
             print(f"{hex(address)}: {value}")
 
 
@@ -512,16 +1974,16 @@ class MIPSProcessor:
 
 # Main function
 if __name__ == "__main__":
+    from mips_asm_cache import AssemblyCache
+
     input_file = 'input.txt'
     output_file = 'output.txt'
-    translate_mips_to_binary(input_file, output_file)
+    image = AssemblyCache().assemble_file(input_file)  # Reassembles only when the source has changed
+    write_text_object(output_file, image)
     print(f"Translation complete. Binary instructions written to {output_file}.")
-    print("Memory Map:", memory_map)
-    print("Label Map:", label_map)
-    print("Memory: ", memory)
-    processor = MIPSProcessor(memory_map, memory, label_map, current_data_address, current_instruction_address)
-    processor.load_instructions(output_file)
+    print("Memory Map:", dict(image.memory_map))
+    print("Label Map:", dict(image.label_map))
+    print("Memory: ", image.data)
+    processor = MIPSProcessor.from_image(image)
     processor.run()
     processor.print_memory()
-
-
@@ -0,0 +1,19 @@
+# Tight ALU loop: 11 instructions per iteration, no memory traffic
+.data
+.text
+main:
+li $t0, 20000
+li $t1, 0
+li $t2, 1
+loop:
+add $t1, $t1, $t2
+xori $t3, $t1, 85
+and $t4, $t3, $t1
+or $t5, $t4, $t2
+sub $t1, $t1, $t5
+addi $t1, $t1, 7
+mul $t6, $t2, $t2
+addi $t2, $t2, 1
+andi $t2, $t2, 255
+addi $t0, $t0, -1
+bne $t0, $zero, loop
@@ -0,0 +1,22 @@
+# Array sum with lw, writing running prefix sums back with sw; 200 passes over 64 words
+.data
+arr: .word 0, 37, 74, 10, 47, 84, 20, 57, 94, 30, 67, 3, 40, 77, 13, 50, 87, 23, 60, 97, 33, 70, 6, 43, 80, 16, 53, 90, 26, 63, 100, 36, 73, 9, 46, 83, 19, 56, 93, 29, 66, 2, 39, 76, 12, 49, 86, 22, 59, 96, 32, 69, 5, 42, 79, 15, 52, 89, 25, 62, 99, 35, 72, 8
+prefix: .word 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0
+.text
+main:
+li $s2, 200
+pass:
+la $s0, arr
+la $s1, prefix
+li $t0, 64
+li $t1, 0
+sum:
+lw $t2, 0($s0)
+add $t1, $t1, $t2
+sw $t1, 0($s1)
+addi $s0, $s0, 4
+addi $s1, $s1, 4
+addi $t0, $t0, -1
+bne $t0, $zero, sum
+addi $s2, $s2, -1
+bne $s2, $zero, pass
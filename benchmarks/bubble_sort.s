@@ -0,0 +1,27 @@
+# Bubble sort of 100 words in reverse order (worst case: every comparison swaps)
+.data
+arr: .word 100, 99, 98, 97, 96, 95, 94, 93, 92, 91, 90, 89, 88, 87, 86, 85, 84, 83, 82, 81, 80, 79, 78, 77, 76, 75, 74, 73, 72, 71, 70, 69, 68, 67, 66, 65, 64, 63, 62, 61, 60, 59, 58, 57, 56, 55, 54, 53, 52, 51, 50, 49, 48, 47, 46, 45, 44, 43, 42, 41, 40, 39, 38, 37, 36, 35, 34, 33, 32, 31, 30, 29, 28, 27, 26, 25, 24, 23, 22, 21, 20, 19, 18, 17, 16, 15, 14, 13, 12, 11, 10, 9, 8, 7, 6, 5, 4, 3, 2, 1
+.text
+main:
+li $s1, 100
+li $t0, 0
+outer:
+la $s0, arr
+addi $t1, $s1, -1
+sub $t1, $t1, $t0
+beq $t1, $zero, done
+inner:
+lw $t2, 0($s0)
+lw $t3, 4($s0)
+slt $t4, $t3, $t2
+beq $t4, $zero, noswap
+sw $t3, 0($s0)
+sw $t2, 4($s0)
+noswap:
+addi $s0, $s0, 4
+addi $t1, $t1, -1
+bne $t1, $zero, inner
+addi $t0, $t0, 1
+j outer
+done:
+nop
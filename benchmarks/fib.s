@@ -0,0 +1,30 @@
+# Recursive fib(18) with jal/jr and a stack frame per call
+.data
+.text
+main:
+li $a0, 18
+jal fib
+move $s0, $v0
+j done
+fib:
+slti $t0, $a0, 2
+beq $t0, $zero, recurse
+move $v0, $a0
+jr $ra
+recurse:
+addi $sp, $sp, -12
+sw $ra, 0($sp)
+sw $a0, 4($sp)
+addi $a0, $a0, -1
+jal fib
+sw $v0, 8($sp)
+lw $a0, 4($sp)
+addi $a0, $a0, -2
+jal fib
+lw $t1, 8($sp)
+add $v0, $v0, $t1
+lw $ra, 0($sp)
+addi $sp, $sp, 12
+jr $ra
+done:
+nop
@@ -0,0 +1,21 @@
+# Count lowercase letters in an .asciiz string with lbu, 300 times
+.data
+text: .asciiz "The Quick Brown Fox Jumps Over The Lazy Dog while a MIPS simulator walks every byte of this sentence, counting lowercase letters until it reaches the terminating NUL byte"
+.text
+main:
+li $s2, 300
+repeat:
+la $s0, text
+li $t0, 0
+walk:
+lbu $t1, 0($s0)
+beq $t1, $zero, walked
+slti $t2, $t1, 97
+bne $t2, $zero, skip
+addi $t0, $t0, 1
+skip:
+addi $s0, $s0, 1
+j walk
+walked:
+addi $s2, $s2, -1
+bne $s2, $zero, repeat
@@ -0,0 +1,198 @@
+"""Content-addressed on-disk cache of assembled MIPS programs.
+
+Each entry is a packed object file (text words, data image, memory_map and
+label_map) named by the SHA-256 of the assembler version, byte order and
+source text, so an edited source or a newer assembler simply misses. Hits
+refresh the entry's modification time; when the cache grows past its size
+limit, the least recently used entries are deleted first.
+
+Several processes can share one cache directory. Entries are written to a
+temporary file and moved into place with os.replace, so readers only ever see
+complete files, and eviction runs under an exclusive fcntl lock where that is
+available. An entry deleted by another process between lookup and read is
+treated as a miss.
+
+Usage:
+    python mips_asm_cache.py [--dir DIR] [--max-size BYTES] [--clear] [--stats] [FILE...]
+"""
+
+import argparse
+import hashlib
+import io
+import os
+import struct
+import tempfile
+import time
+
+from Mips_Simulator import ASSEMBLER_VERSION, Assembler, read_packed_object, write_packed_object
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; eviction then runs unlocked
+    fcntl = None
+
+DEFAULT_CACHE_DIR = os.environ.get('MIPS_ASM_CACHE',
+                                   os.path.join(os.path.expanduser('~'), '.cache', 'mips_asm'))
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+ENTRY_SUFFIX = '.bin'
+LOCK_NAME = 'lock'
+STALE_TEMP_SECONDS = 3600  # Temporary files older than this were left by a crashed writer
+
+
+class AssemblyCache:
+    """Maps source text to ProgramImages through a directory of packed object files."""
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, byteorder='big'):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.byteorder = byteorder
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, source):
+        """Hex digest identifying a source text (bytes) for this assembler version and byte order."""
+        digest = hashlib.sha256(f"{ASSEMBLER_VERSION}:{self.byteorder}:".encode('ascii'))
+        digest.update(source)
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ENTRY_SUFFIX)
+
+    def get(self, key):
+        """The cached ProgramImage for a key, or None."""
+        path = self.path(key)
+        try:
+            image = read_packed_object(path)
+        except FileNotFoundError:
+            return None
+        except (ValueError, OSError, struct.error):
+            self.discard(path)  # Truncated or from an incompatible object format
+            return None
+        try:
+            os.utime(path)  # Mark as recently used
+        except FileNotFoundError:
+            pass  # Evicted meanwhile by another process
+        return image
+
+    def put(self, key, image):
+        """Store an image atomically, then evict old entries if the cache is over its limit."""
+        descriptor, temporary = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        os.close(descriptor)
+        try:
+            write_packed_object(temporary, image)
+            os.replace(temporary, self.path(key))
+        except BaseException:
+            self.discard(temporary)
+            raise
+        self.evict()
+
+    def assemble(self, source, filename=None):
+        """ProgramImage for source text (bytes), assembled only if it is not already cached."""
+        key = self.key(source)
+        image = self.get(key)
+        if image is not None:
+            self.hits += 1
+            return image
+        self.misses += 1
+        image = Assembler(self.byteorder).assemble(io.StringIO(source.decode('utf-8')), filename)
+        self.put(key, image)
+        return image
+
+    def assemble_file(self, input_file):
+        """ProgramImage for a source file, through the cache."""
+        with open(input_file, 'rb') as file:
+            return self.assemble(file.read(), input_file)
+
+    def entries(self):
+        """(modification time, size, path) for every cache entry."""
+        entries = []
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if entry.name.endswith(ENTRY_SUFFIX):
+                    try:
+                        status = entry.stat()
+                    except FileNotFoundError:
+                        continue  # Evicted by another process
+                    entries.append((status.st_mtime, status.st_size, entry.path))
+        return entries
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes."""
+        with self.lock():
+            entries = sorted(self.entries())
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                self.discard(path)
+                total -= size
+            self.remove_stale_temporaries()
+
+    def remove_stale_temporaries(self):
+        cutoff = time.time() - STALE_TEMP_SECONDS
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if entry.name.endswith('.tmp'):
+                    try:
+                        if entry.stat().st_mtime < cutoff:
+                            self.discard(entry.path)
+                    except FileNotFoundError:
+                        pass
+
+    def clear(self):
+        """Delete every entry."""
+        with self.lock():
+            for _, _, path in self.entries():
+                self.discard(path)
+
+    def lock(self):
+        return _DirectoryLock(os.path.join(self.directory, LOCK_NAME))
+
+    @staticmethod
+    def discard(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+class _DirectoryLock:
+    """Exclusive fcntl lock on a file, held for the duration of a with block."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def __enter__(self):
+        self.file = open(self.path, 'a')
+        if fcntl is not None:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info):
+        if fcntl is not None:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+        self.file.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the assembled-program cache.")
+    parser.add_argument('files', nargs='*', help="MIPS source files to assemble through the cache")
+    parser.add_argument('--dir', default=DEFAULT_CACHE_DIR, help="Cache directory (default: $MIPS_ASM_CACHE "
+                                                                 "or ~/.cache/mips_asm)")
+    parser.add_argument('--max-size', type=int, default=DEFAULT_MAX_BYTES, help="Size limit in bytes")
+    parser.add_argument('--clear', action='store_true', help="Delete every cached entry first")
+    parser.add_argument('--stats', action='store_true', help="Print the entry count and total size")
+    args = parser.parse_args()
+
+    cache = AssemblyCache(args.dir, args.max_size)
+    if args.clear:
+        cache.clear()
+    for input_file in args.files:
+        cache.assemble_file(input_file)
+    if args.files:
+        print(f"{cache.hits} hits, {cache.misses} misses.")
+    if args.stats:
+        entries = cache.entries()
+        print(f"{len(entries)} entries, {sum(size for _, size, _ in entries)} bytes in {args.dir}.")
@@ -0,0 +1,308 @@
+"""Batch assembly and simulation of many MIPS programs across a pool of worker processes.
+
+Usage:
+    python mips_batch.py assemble [-j WORKERS] [-o OUTPUT_DIR] [--format text|packed] FILE...
+    python mips_batch.py simulate [-j WORKERS] [--max-steps N] [--timeout SECONDS]
+                                  [--set REG=VALUE]... [--dump START:LENGTH]... [--stdin FILE]
+                                  [--cache DIR] FILE...
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from Mips_Simulator import (DATA_SEGMENT_START, EXEC_DECODED, OBJECT_MAGIC, TEXT_SEGMENT_START, TRACE_OFF,
+                            Assembler, MIPSProcessor, PagedMemory, ProgramImage, SystemCalls, register_map,
+                            register_names_by_index)
+from mips_asm_cache import AssemblyCache
+
+# Outcome of assembling one source file; exactly one of image / error is None
+# (image is also None when images are not returned to the caller)
+AssemblyResult = namedtuple('AssemblyResult', ['input_file', 'output_file', 'image', 'error'])
+
+
+def output_path(input_file, output_dir, output_format='text'):
+    """Path of the binary written for a source file inside output_dir."""
+    stem = os.path.splitext(os.path.basename(input_file))[0]
+    return os.path.join(output_dir, stem + ('.bin' if output_format == 'packed' else '.txt'))
+
+
+def assemble_one(input_file, output_file=None, output_format='text', byteorder='big', return_image=True):
+    """Assemble one source file, reporting any failure in the result instead of raising."""
+    try:
+        if output_file is not None:
+            image = Assembler(byteorder).assemble_to_file(input_file, output_file, output_format, return_image)
+        else:
+            image = Assembler(byteorder).assemble_file(input_file)
+    except (OSError, ValueError) as error:
+        return AssemblyResult(input_file, output_file, None, f"{type(error).__name__}: {error}")
+    return AssemblyResult(input_file, output_file, image if return_image else None, None)
+
+
+def assemble_batch(input_files, output_dir=None, output_format='text', byteorder='big',
+                   max_workers=None, return_images=True):
+    """Assemble many source files in a process pool.
+
+    Yields one AssemblyResult per file in completion order. When output_dir is
+    given, each program is also written there (see output_path).
+    """
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(assemble_one, input_file,
+                            output_path(input_file, output_dir, output_format) if output_dir is not None else None,
+                            output_format, byteorder, return_images)
+            for input_file in input_files
+        ]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+# One simulation to run. program is a source file, a packed object file or a
+# ProgramImage; registers maps register names or indices to initial values;
+# memory maps addresses or data labels to a word (int) or bytes written before
+# the run; memory_ranges lists (address or label, length) regions to return;
+# stdin is the text that read syscalls consume.
+SimulationJob = namedtuple('SimulationJob', ['program', 'registers', 'memory', 'max_steps', 'timeout',
+                                             'memory_ranges', 'job_id', 'stdin'],
+                           defaults=(None, None, None, None, (), None, ''))
+
+# Outcome of one SimulationJob; memory maps each requested range start to its bytes,
+# output is the program's console output and exit_code is set if it called exit
+SimulationResult = namedtuple('SimulationResult', ['job_id', 'program', 'registers', 'pc', 'memory',
+                                                   'instruction_count', 'halted', 'timed_out', 'error',
+                                                   'elapsed', 'output', 'exit_code'])
+
+# Instructions executed between wall-clock timeout checks
+SLICE_STEPS = 20000
+
+
+def load_program(program, execution_mode=EXEC_DECODED, cache=None):
+    """Create an untraced processor for a source file, packed object file or ProgramImage.
+
+    Source files are assembled through cache (an AssemblyCache) when one is given.
+    """
+    if isinstance(program, ProgramImage):
+        return MIPSProcessor.from_image(program, trace_level=TRACE_OFF, execution_mode=execution_mode)
+    with open(program, 'rb') as file:
+        is_object = file.read(len(OBJECT_MAGIC)) == OBJECT_MAGIC
+    if is_object:
+        processor = MIPSProcessor({}, PagedMemory(), {}, DATA_SEGMENT_START, TEXT_SEGMENT_START,
+                                  trace_level=TRACE_OFF, execution_mode=execution_mode)
+        processor.load_object(program)
+        return processor
+    image = cache.assemble_file(program) if cache is not None else Assembler().assemble_file(program)
+    return MIPSProcessor.from_image(image, trace_level=TRACE_OFF, execution_mode=execution_mode)
+
+
+def resolve_address(processor, location):
+    """An integer address, or the address of a data label in the processor's memory_map."""
+    if isinstance(location, str):
+        if location not in processor.memory_map:
+            raise ValueError(f"Undefined label '{location}' in the .data section.")
+        return processor.memory_map[location]
+    return location
+
+
+def validate_job(job):
+    """Raise ValueError unless a job's max_steps is None or an int >= 0 and its timeout None or >= 0."""
+    if job.max_steps is not None and (not isinstance(job.max_steps, int) or isinstance(job.max_steps, bool)
+                                      or job.max_steps < 0):
+        raise ValueError(f"max_steps must be None or a non-negative integer, not {job.max_steps!r}.")
+    if job.timeout is not None and (not isinstance(job.timeout, (int, float)) or isinstance(job.timeout, bool)
+                                    or not job.timeout >= 0):
+        raise ValueError(f"timeout must be None or a non-negative number, not {job.timeout!r}.")
+
+
+def run_simulation(job, execution_mode=EXEC_DECODED, cache=None):
+    """Run one SimulationJob to completion, budget or timeout, reporting errors in the result.
+
+    An invalid budget or timeout raises ValueError instead (see validate_job).
+    """
+    validate_job(job)
+    start = time.perf_counter()
+    processor = None
+    error = None
+    memory = {}
+    timed_out = False
+    console = io.StringIO()
+    syscalls = SystemCalls(job.stdin or '', console)
+    try:
+        processor = load_program(job.program, execution_mode, cache)
+        processor.syscalls = syscalls
+        for register, value in (job.registers or {}).items():
+            processor.registers[register if isinstance(register, int) else int(register_map[register], 2)] = value
+        for location, value in (job.memory or {}).items():
+            address = resolve_address(processor, location)
+            if isinstance(value, int):
+                processor.memory.write_word(address, value)
+            else:
+                processor.memory.write_bytes(address, value)
+
+        deadline = start + job.timeout if job.timeout is not None else None
+        remaining = job.max_steps
+        while not processor.halted and remaining != 0:
+            executed = processor.run(SLICE_STEPS if remaining is None else min(SLICE_STEPS, remaining))
+            if remaining is not None:
+                remaining -= executed
+            if deadline is not None and time.perf_counter() > deadline:
+                timed_out = not processor.halted
+                break
+
+        memory = {location: processor.memory.read_bytes(resolve_address(processor, location), length)
+                  for location, length in job.memory_ranges}
+    except Exception as failure:  # Any failure is reported against this job only
+        error = f"{type(failure).__name__}: {failure}"
+    finally:
+        syscalls.close()  # Flush console output and close files the program left open
+    if processor is None:
+        return SimulationResult(job.job_id, job.program, None, None, {}, 0, False, False, error,
+                                time.perf_counter() - start, console.getvalue(), None)
+    succeeded = error is None  # A failed job is never reported as halted or timed out
+    return SimulationResult(job.job_id, job.program, list(processor.registers), processor.pc, memory,
+                            processor.instruction_count, processor.halted and succeeded, timed_out and succeeded,
+                            error, time.perf_counter() - start, console.getvalue(), processor.exit_code)
+
+
+def run_simulation_batch(jobs, max_workers=None, execution_mode=EXEC_DECODED, cache=None):
+    """Run SimulationJobs in a process pool, yielding each SimulationResult as it completes.
+
+    With an AssemblyCache, workers share its directory and skip reassembling unchanged sources.
+    """
+    jobs = list(jobs)
+    for job in jobs:
+        validate_job(job)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(run_simulation, job, execution_mode, cache) for job in jobs]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def assemble_command(args):
+    """Run the 'assemble' subcommand and return the process exit status."""
+    failures = 0
+    report = []
+    results = assemble_batch(args.files, args.output_dir, args.format, args.byteorder,
+                             args.jobs, return_images=False)
+    for result in results:
+        if result.error is None:
+            print(f"ok      {result.input_file}" + (f" -> {result.output_file}" if result.output_file else ''))
+        else:
+            failures += 1
+            print(f"FAILED  {result.input_file}: {result.error}")
+        report.append({'input': result.input_file, 'output': result.output_file, 'error': result.error})
+
+    if args.report:
+        with open(args.report, 'w') as file:
+            json.dump(report, file, indent=2)
+    print(f"{len(report) - failures} assembled, {failures} failed.")
+    return 1 if failures else 0
+
+
+def parse_register_setting(text):
+    """Parse a '--set' argument such as '$a0=5' into (register, value)."""
+    register, value = text.split('=', 1)
+    if register not in register_map:
+        raise argparse.ArgumentTypeError(f"Unknown register '{register}'.")
+    return register, int(value, 0)
+
+
+def non_negative_int(text):
+    """Parse a '--max-steps' argument, which must be an integer >= 0."""
+    value = int(text)
+    if value < 0:
+        raise argparse.ArgumentTypeError(f"must be a non-negative integer, not {value}.")
+    return value
+
+
+def non_negative_float(text):
+    """Parse a '--timeout' argument, which must be a number >= 0."""
+    value = float(text)
+    if not value >= 0:
+        raise argparse.ArgumentTypeError(f"must be a non-negative number, not {text}.")
+    return value
+
+
+def parse_memory_range(text):
+    """Parse a '--dump' argument such as 'arr:16' or '0x10010000:64' into (location, length)."""
+    location, length = text.rsplit(':', 1)
+    try:
+        location = int(location, 0)
+    except ValueError:
+        pass  # A data label
+    return location, int(length, 0)
+
+
+def result_record(result):
+    """JSON-ready dict of a SimulationResult (without its program); memory ranges are hex strings."""
+    return {
+        'halted': result.halted,
+        'timed_out': result.timed_out,
+        'instruction_count': result.instruction_count,
+        'pc': result.pc,
+        'registers': (dict(zip(register_names_by_index, result.registers))
+                      if result.registers is not None else None),
+        'memory': {str(location): data.hex() for location, data in result.memory.items()},
+        'output': result.output,
+        'exit_code': result.exit_code,
+        'elapsed': round(result.elapsed, 6),
+        'error': result.error,
+    }
+
+
+def simulate_command(args):
+    """Run the 'simulate' subcommand, printing one JSON line per finished job."""
+    stdin = ''
+    if args.stdin:
+        with open(args.stdin) as file:
+            stdin = file.read()
+    jobs = [SimulationJob(program, dict(args.set), None, args.max_steps, args.timeout, args.dump, program, stdin)
+            for program in args.files]
+    failures = 0
+    cache = AssemblyCache(args.cache) if args.cache else None
+    for result in run_simulation_batch(jobs, args.jobs, args.mode, cache):
+        failures += result.error is not None
+        print(json.dumps({'program': result.program, **result_record(result)}), flush=True)
+    return 1 if failures else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Batch MIPS assembly and simulation.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    assemble = commands.add_parser('assemble', help="Assemble many source files in parallel.")
+    assemble.add_argument('files', nargs='+', help="MIPS source files")
+    assemble.add_argument('-j', '--jobs', type=int, default=None, help="Worker processes (default: CPU count)")
+    assemble.add_argument('-o', '--output-dir', default=None, help="Directory for the assembled binaries")
+    assemble.add_argument('--format', choices=['text', 'packed'], default='text', help="Output format")
+    assemble.add_argument('--byteorder', choices=['big', 'little'], default='big', help="Target byte order")
+    assemble.add_argument('--report', default=None, help="Write a JSON report of every file to this path")
+    assemble.set_defaults(handler=assemble_command)
+
+    simulate = commands.add_parser('simulate', help="Run many programs in parallel.")
+    simulate.add_argument('files', nargs='+', help="MIPS source or packed object files")
+    simulate.add_argument('-j', '--jobs', type=int, default=None, help="Worker processes (default: CPU count)")
+    simulate.add_argument('--max-steps', type=non_negative_int, default=None, help="Instruction budget per program")
+    simulate.add_argument('--timeout', type=non_negative_float, default=None, help="Wall-clock seconds per program")
+    simulate.add_argument('--set', type=parse_register_setting, action='append', default=[],
+                          metavar='REG=VALUE', help="Initial register value, e.g. '$a0=5'")
+    simulate.add_argument('--dump', type=parse_memory_range, action='append', default=[],
+                          metavar='START:LENGTH', help="Memory range to return, e.g. 'arr:16'")
+    simulate.add_argument('--cache', default=None, metavar='DIR',
+                          help="Reuse assembled programs from this cache directory (see mips_asm_cache)")
+    simulate.add_argument('--stdin', default=None, help="File whose contents every program reads as input")
+    simulate.add_argument('--mode', choices=['reference', 'decoded', 'block'], default=EXEC_DECODED,
+                          help="Execution mode")
+    simulate.set_defaults(handler=simulate_command)
+    return parser
+
+
+if __name__ == "__main__":
+    arguments = build_parser().parse_args()
+    sys.exit(arguments.handler(arguments))
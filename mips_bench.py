@@ -0,0 +1,189 @@
+"""Benchmark harness for the MIPS assembler and simulator.
+
+It measures:
+- interpreter throughput in instructions per second, for every workload in
+  benchmarks/ under each execution mode;
+- translate_mips_to_binary throughput in source lines per second, on a
+  large generated program;
+- peak Python memory use during each benchmark, via tracemalloc.
+
+Each benchmark runs a few warmup rounds and then a number of timed
+repetitions, and reports the best and median rate. Results can be written as
+JSON. With --baseline, the run fails if any benchmark's best rate is slower
+than the baseline by more than --threshold.
+
+Usage:
+    python mips_bench.py [-o results.json] [--baseline old.json] [--threshold 0.1]
+                         [--warmup N] [--repetitions N] [--filter TEXT] [--assembler-lines N]
+"""
+
+import argparse
+import glob
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from Mips_Simulator import (EXEC_BLOCK, EXEC_DECODED, EXEC_REFERENCE, TRACE_OFF, Assembler, MIPSProcessor,
+                            translate_mips_to_binary)
+
+WORKLOAD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks')
+EXECUTION_MODES = (EXEC_REFERENCE, EXEC_DECODED, EXEC_BLOCK)
+
+
+def generate_source(lines):
+    """A synthetic program of roughly the given number of lines, mixing every kind of statement."""
+    body = ['.data']
+    for index in range(lines // 20):
+        body.append(f"value{index}: .word {index}, {index + 1}, {index + 2}")
+        body.append(f'name{index}: .asciiz "item {index}"')
+    body += ['.text', 'main:']
+    index = 0
+    while len(body) < lines:
+        body += [
+            f"block{index}:",
+            f"la $s0, value{index % max(1, lines // 20)}",
+            "lw $t0, 0($s0)",
+            f"addi $t1, $t0, {index % 1000}",
+            "add $t2, $t1, $t0",
+            "sub $t3, $t2, $t1",
+            "slt $t4, $t3, $t2",
+            "sw $t2, 4($s0)",
+            f"bne $t4, $zero, block{index}",
+            f"li $t5, {index % 30000}",
+            "lb $t6, 0($s0)",
+        ]
+        index += 1
+    return body
+
+
+def measure(function, warmup, repetitions):
+    """Run function warmup + repetitions times; return its per-repetition work counts and seconds."""
+    for _ in range(warmup):
+        function()
+    timings = []
+    work = 0
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        work = function()
+        timings.append(time.perf_counter() - start)
+    return work, timings
+
+
+def peak_memory(function):
+    """Peak bytes allocated by the Python heap during one call of function."""
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def result(name, unit, work, timings, peak):
+    return {
+        'name': name,
+        'unit': unit,
+        'work': work,
+        'best_seconds': min(timings),
+        'median_seconds': statistics.median(timings),
+        'best_rate': work / min(timings),
+        'median_rate': work / statistics.median(timings),
+        'peak_memory_bytes': peak,
+    }
+
+
+def interpreter_benchmarks(workloads, warmup, repetitions, name_filter=''):
+    """Instructions per second for each workload under each execution mode."""
+    results = []
+    for path in workloads:
+        image = Assembler().assemble_file(path)
+        for mode in EXECUTION_MODES:
+            name = f"run/{os.path.splitext(os.path.basename(path))[0]}/{mode}"
+            if name_filter not in name:
+                continue
+
+            def run():
+                processor = MIPSProcessor.from_image(image, trace_level=TRACE_OFF, execution_mode=mode)
+                return processor.run()
+
+            work, timings = measure(run, warmup, repetitions)
+            results.append(result(name, 'instructions/s', work, timings, peak_memory(run)))
+    return results
+
+
+def assembler_benchmark(lines, warmup, repetitions):
+    """Source lines per second through translate_mips_to_binary on a generated program."""
+    source = generate_source(lines)
+    with tempfile.TemporaryDirectory() as directory:
+        input_file = os.path.join(directory, 'generated.s')
+        output_file = os.path.join(directory, 'generated.txt')
+        with open(input_file, 'w') as file:
+            file.write('\n'.join(source) + '\n')
+
+        def assemble():
+            translate_mips_to_binary(input_file, output_file)
+            return len(source)
+
+        work, timings = measure(assemble, warmup, repetitions)
+        return result(f"assemble/{lines}-lines", 'lines/s', work, timings, peak_memory(assemble))
+
+
+def compare(results, baseline, threshold):
+    """Names of benchmarks whose best rate fell more than threshold below the baseline, with the change."""
+    previous = {entry['name']: entry for entry in baseline['results']}
+    regressions = []
+    for entry in results:
+        old = previous.get(entry['name'])
+        if old is None:
+            continue
+        change = entry['best_rate'] / old['best_rate'] - 1
+        if change < -threshold:
+            regressions.append((entry['name'], change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the MIPS assembler and simulator.")
+    parser.add_argument('-o', '--output', default=None, help="Write results as JSON to this path")
+    parser.add_argument('--baseline', default=None, help="JSON results of an earlier run to compare against")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="Allowed slowdown against the baseline before failing (default 0.10)")
+    parser.add_argument('--warmup', type=int, default=1, help="Untimed runs before measuring")
+    parser.add_argument('--repetitions', type=int, default=5, help="Timed runs per benchmark")
+    parser.add_argument('--filter', default='', help="Only run benchmarks whose name contains this text")
+    parser.add_argument('--assembler-lines', type=int, default=20000, help="Size of the generated source")
+    parser.add_argument('--workloads', default=WORKLOAD_DIR, help="Directory of .s workloads")
+    args = parser.parse_args(argv)
+
+    workloads = sorted(glob.glob(os.path.join(args.workloads, '*.s')))
+    results = interpreter_benchmarks(workloads, args.warmup, args.repetitions, args.filter)
+    if args.filter in f"assemble/{args.assembler_lines}-lines":
+        results.append(assembler_benchmark(args.assembler_lines, args.warmup, args.repetitions))
+
+    for entry in results:
+        print(f"{entry['name']:<36}{entry['best_rate']:>14,.0f} {entry['unit']:<16}"
+              f"median {entry['median_rate']:>12,.0f}   peak {entry['peak_memory_bytes'] / 1024:>9,.0f} KiB")
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({'python': platform.python_version(), 'platform': platform.platform(),
+                       'warmup': args.warmup, 'repetitions': args.repetitions, 'results': results},
+                      file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.threshold)
+        for name, change in regressions:
+            print(f"REGRESSION  {name}: {change:+.1%}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
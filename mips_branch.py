@@ -0,0 +1,283 @@
+"""Branch prediction models driven by the MIPS simulator's executed instruction stream.
+
+Several direction predictors for beq/bne can run side by side in one simulation
+pass:
+- static not-taken,
+- backward-taken/forward-not-taken (BTFN),
+- 1-bit and 2-bit saturating counter tables,
+- gshare.
+A branch target buffer (BTB) and a return-address stack (RAS) model target
+prediction for taken branches, j, jal and jr. Tables are bytearrays and arrays
+indexed by PC bits.
+
+Usage:
+    python mips_branch.py [--table-bits N] [--history-bits N] [--btb-entries N] [--ras-depth N] FILE
+"""
+
+import argparse
+from array import array
+
+from Mips_Simulator import TRACE_OFF, Assembler, LabelIndex, MIPSProcessor, instruction_name
+
+
+class StaticNotTaken:
+    """Predicts every branch not taken."""
+
+    name = 'not-taken'
+
+    def predict(self, pc, target):
+        return False
+
+    def update(self, pc, target, taken):
+        pass
+
+
+class BackwardTaken:
+    """Predicts backward branches (loops) taken and forward branches not taken."""
+
+    name = 'btfn'
+
+    def predict(self, pc, target):
+        return target <= pc
+
+    def update(self, pc, target, taken):
+        pass
+
+
+class OneBitPredictor:
+    """Table of last outcomes indexed by the low PC bits."""
+
+    def __init__(self, table_bits=10):
+        self.name = f'1-bit/{1 << table_bits}'
+        self.mask = (1 << table_bits) - 1
+        self.table = bytearray(1 << table_bits)
+
+    def predict(self, pc, target):
+        return self.table[(pc >> 2) & self.mask] == 1
+
+    def update(self, pc, target, taken):
+        self.table[(pc >> 2) & self.mask] = taken
+
+
+class TwoBitPredictor:
+    """Table of 2-bit saturating counters indexed by the low PC bits; 2 and 3 predict taken."""
+
+    def __init__(self, table_bits=10, initial=1):
+        self.name = f'2-bit/{1 << table_bits}'
+        self.mask = (1 << table_bits) - 1
+        self.table = bytearray([initial]) * (1 << table_bits)
+
+    def index(self, pc):
+        return (pc >> 2) & self.mask
+
+    def predict(self, pc, target):
+        return self.table[self.index(pc)] >= 2
+
+    def update(self, pc, target, taken):
+        index = self.index(pc)
+        counter = self.table[index]
+        if taken:
+            if counter < 3:
+                self.table[index] = counter + 1
+        elif counter > 0:
+            self.table[index] = counter - 1
+
+
+class GsharePredictor(TwoBitPredictor):
+    """2-bit counters indexed by the PC XORed with a global history of branch outcomes."""
+
+    def __init__(self, history_bits=8, table_bits=10, initial=1):
+        super().__init__(table_bits, initial)
+        self.name = f'gshare/h{history_bits}/{1 << table_bits}'
+        self.history_mask = (1 << history_bits) - 1
+        self.history = 0
+
+    def index(self, pc):
+        return ((pc >> 2) ^ self.history) & self.mask
+
+    def update(self, pc, target, taken):
+        super().update(pc, target, taken)
+        self.history = ((self.history << 1) | taken) & self.history_mask
+
+
+class BranchTargetBuffer:
+    """Direct-mapped table of the last target of each taken control transfer."""
+
+    def __init__(self, entries=256):
+        if entries <= 0 or entries & (entries - 1):
+            raise ValueError(f"BTB entries must be a power of two, not {entries}.")
+        self.mask = entries - 1
+        self.tags = array('q', [-1] * entries)
+        self.targets = array('Q', [0] * entries)
+
+    def predict(self, pc):
+        """Predicted target for pc, or None on a BTB miss."""
+        index = (pc >> 2) & self.mask
+        return self.targets[index] if self.tags[index] == pc else None
+
+    def update(self, pc, target):
+        index = (pc >> 2) & self.mask
+        self.tags[index] = pc
+        self.targets[index] = target
+
+
+class ReturnAddressStack:
+    """Fixed-depth circular stack of return addresses pushed by jal and popped by jr $ra."""
+
+    def __init__(self, depth=16):
+        self.depth = depth
+        self.entries = array('Q', [0] * depth)
+        self.top = 0  # Number of pushes minus pops; older entries are overwritten past depth
+
+    def push(self, address):
+        self.entries[self.top % self.depth] = address
+        self.top += 1
+
+    def pop(self):
+        """Predicted return address, or None when the stack is empty."""
+        if self.top == 0:
+            return None
+        self.top -= 1
+        return self.entries[self.top % self.depth]
+
+
+class BranchStatistics:
+    """Step observer that scores direction predictors, a BTB and a RAS on every control transfer.
+
+    For each beq/bne, every direction predictor predicts and is then
+    updated with the real outcome. The BTB is asked for the target of every
+    control transfer that was taken. jr $ra is predicted by the RAS and any
+    other jr by the BTB. Branch outcomes are read from the processor's
+    registers, so the statistics must be attached with attach().
+    """
+
+    def __init__(self, predictors=None, btb=None, ras=None, label_map=None):
+        if predictors is None:
+            predictors = [StaticNotTaken(), BackwardTaken(), OneBitPredictor(), TwoBitPredictor(),
+                          GsharePredictor()]
+        self.predictors = predictors
+        self.btb = btb if btb is not None else BranchTargetBuffer()
+        self.ras = ras if ras is not None else ReturnAddressStack()
+        self.labels = LabelIndex(label_map or {})
+        self.kinds = {}  # pc -> (decoded, mnemonic)
+        self.registers = None  # The observed processor's registers, set by attach()
+        self.reset()
+
+    def reset(self):
+        self.branches = 0
+        self.taken = 0
+        self.correct = array('Q', [0] * len(self.predictors))
+        self.per_pc = {}  # Branch pc -> array of [executions, taken, correct per predictor...]
+        self.btb_lookups = self.btb_hits = 0
+        self.returns = self.ras_hits = 0
+
+    def attach(self, processor):
+        """Score a processor's branches, resolving PCs to labels from its label_map."""
+        self.labels = LabelIndex(processor.label_map)
+        self.registers = processor.registers
+        processor.step_observers.append(self)
+        return self
+
+    def on_step(self, pc, decoded, next_pc):
+        kind = self.kinds.get(pc)
+        if kind is None or kind[0] is not decoded:
+            kind = self.kinds[pc] = (decoded, instruction_name(decoded))
+        name = kind[1]
+
+        if name == 'beq' or name == 'bne':
+            # The outcome comes from the branch condition, not next_pc: a taken branch
+            # to pc + 4 lands where a not-taken one would. beq/bne write no registers,
+            # so their operands still hold the values that were compared.
+            registers = self.registers
+            taken = (registers[decoded.rs] == registers[decoded.rt]) == (name == 'beq')
+            target = pc + 4 + decoded.imm * 4
+            counts = self.per_pc.get(pc)
+            if counts is None:
+                counts = self.per_pc[pc] = array('Q', [0] * (2 + len(self.predictors)))
+            counts[0] += 1
+            self.branches += 1
+            if taken:
+                counts[1] += 1
+                self.taken += 1
+            for position, predictor in enumerate(self.predictors):
+                if predictor.predict(pc, target) == taken:
+                    counts[2 + position] += 1
+                    self.correct[position] += 1
+                predictor.update(pc, target, taken)
+            if taken:
+                self.predict_target(pc, next_pc)
+        elif name == 'jr' and decoded.rs == 31:
+            self.returns += 1
+            if self.ras.pop() == next_pc:
+                self.ras_hits += 1
+        elif name == 'j' or name == 'jal' or name == 'jr':
+            if name == 'jal':
+                self.ras.push(pc + 4)
+            self.predict_target(pc, next_pc)
+
+    def predict_target(self, pc, target):
+        self.btb_lookups += 1
+        if self.btb.predict(pc) == target:
+            self.btb_hits += 1
+        self.btb.update(pc, target)
+
+    def report(self):
+        """Accuracy per predictor and per branch PC as a dict."""
+        def accuracy(correct, total):
+            return correct / total if total else 0.0
+
+        return {
+            'branches': self.branches,
+            'taken': self.taken,
+            'predictors': {predictor.name: accuracy(self.correct[position], self.branches)
+                           for position, predictor in enumerate(self.predictors)},
+            'btb': {'lookups': self.btb_lookups, 'hits': self.btb_hits,
+                    'accuracy': accuracy(self.btb_hits, self.btb_lookups)},
+            'ras': {'returns': self.returns, 'hits': self.ras_hits,
+                    'accuracy': accuracy(self.ras_hits, self.returns)},
+            'per_pc': {
+                f"0x{pc:08x}": {
+                    'location': self.labels.describe(pc),
+                    'executions': counts[0],
+                    'taken': counts[1],
+                    'accuracy': {predictor.name: accuracy(counts[2 + position], counts[0])
+                                 for position, predictor in enumerate(self.predictors)},
+                }
+                for pc, counts in sorted(self.per_pc.items())
+            },
+        }
+
+    def format_report(self):
+        """Human-readable version of report()."""
+        report = self.report()
+        lines = [f"Branches: {self.branches} ({self.taken} taken)"]
+        for name, value in report['predictors'].items():
+            lines.append(f"  {name:<24}{value:>8.2%}")
+        lines.append(f"  {'BTB':<24}{report['btb']['accuracy']:>8.2%}  ({self.btb_lookups} lookups)")
+        lines.append(f"  {'RAS':<24}{report['ras']['accuracy']:>8.2%}  ({self.returns} returns)")
+        lines += ["", f"{'branch':<24}{'execs':>8}{'taken':>8}"
+                  + ''.join(f"{predictor.name:>22}" for predictor in self.predictors)]
+        for entry in report['per_pc'].values():
+            lines.append(f"{entry['location']:<24}{entry['executions']:>8}{entry['taken']:>8}"
+                         + ''.join(f"{value:>22.2%}" for value in entry['accuracy'].values()))
+        return '\n'.join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare branch predictors on a MIPS program.")
+    parser.add_argument('file', help="MIPS source file")
+    parser.add_argument('--table-bits', type=int, default=10, help="log2 of the counter table size")
+    parser.add_argument('--history-bits', type=int, default=8, help="gshare global history length")
+    parser.add_argument('--btb-entries', type=int, default=256, help="BTB entries (power of two)")
+    parser.add_argument('--ras-depth', type=int, default=16, help="Return-address stack depth")
+    parser.add_argument('--max-steps', type=int, default=None, help="Instruction budget")
+    args = parser.parse_args()
+
+    statistics = BranchStatistics(
+        [StaticNotTaken(), BackwardTaken(), OneBitPredictor(args.table_bits), TwoBitPredictor(args.table_bits),
+         GsharePredictor(args.history_bits, args.table_bits)],
+        BranchTargetBuffer(args.btb_entries), ReturnAddressStack(args.ras_depth))
+    processor = MIPSProcessor.from_image(Assembler().assemble_file(args.file), trace_level=TRACE_OFF)
+    statistics.attach(processor)
+    processor.run(args.max_steps)
+    print(statistics.format_report())
@@ -0,0 +1,261 @@
+"""Configurable cache hierarchy model for the MIPS simulator.
+
+There are separate L1 instruction and data caches and an optional unified L2.
+Each cache sets its own size, associativity, line size, replacement policy
+(LRU, FIFO or random) and write policy (write-back or write-through).
+Tags, dirty bits and replacement stamps live in flat arrays indexed by
+set * associativity + way, so each access costs a slice and a few integer ops.
+
+Usage:
+    python mips_cachesim.py [--l1i SPEC] [--l1d SPEC] [--l2 SPEC] FILE
+    SPEC is SIZE:ASSOCIATIVITY:LINE_SIZE[:lru|fifo|random[:wb|wt]], e.g. 32768:8:64:lru:wb
+"""
+
+import argparse
+import random
+from array import array
+
+from Mips_Simulator import TRACE_OFF, Assembler, LabelIndex, MIPSProcessor
+
+REPLACEMENT_POLICIES = ('lru', 'fifo', 'random')
+WRITE_POLICIES = ('write-back', 'write-through')
+
+# Per-cache counters, in the order used by Cache.counters() and per-label statistics
+CACHE_COUNTERS = ('accesses', 'hits', 'misses', 'evictions', 'writebacks')
+
+
+class Cache:
+    """One set-associative cache level.
+
+    A miss reads the line from next_level (or from memory when next_level is
+    None). Write-back caches mark lines dirty and write them to next_level on
+    eviction. Write-through caches pass every write on and do not allocate
+    lines on a write miss.
+    """
+
+    def __init__(self, name, size=32768, associativity=4, line_size=64, replacement='lru',
+                 write_policy='write-back', next_level=None, seed=0):
+        if replacement not in REPLACEMENT_POLICIES:
+            raise ValueError(f"Unknown replacement policy '{replacement}'.")
+        if write_policy not in WRITE_POLICIES:
+            raise ValueError(f"Unknown write policy '{write_policy}'.")
+        if line_size <= 0 or line_size & (line_size - 1):
+            raise ValueError(f"Line size must be a power of two, not {line_size}.")
+        if associativity <= 0 or size % (line_size * associativity):
+            raise ValueError(f"Cache size {size} is not a multiple of {associativity} ways of {line_size} bytes.")
+        sets = size // (line_size * associativity)
+        if sets & (sets - 1):
+            raise ValueError(f"Number of sets must be a power of two, not {sets}.")
+
+        self.name = name
+        self.size = size
+        self.associativity = associativity
+        self.line_size = line_size
+        self.replacement = replacement
+        self.write_policy = write_policy
+        self.next_level = next_level
+        self.sets = sets
+        self.offset_bits = line_size.bit_length() - 1
+        self.set_mask = sets - 1
+        self.set_bits = sets.bit_length() - 1
+        self.random = random.Random(seed)
+
+        self.tags = array('q', [-1] * (sets * associativity))  # -1 marks an invalid way
+        self.stamps = array('Q', [0] * (sets * associativity))  # Last use (LRU) or fill time (FIFO)
+        self.dirty = bytearray(sets * associativity)
+        self.clock = 0
+        self.hits = self.misses = self.evictions = self.writebacks = 0
+
+    def access(self, address, is_write=False):
+        """Look up the line holding an address, filling it on a miss. Returns True on a hit."""
+        line = address >> self.offset_bits
+        base = (line & self.set_mask) * self.associativity
+        tag = line >> self.set_bits
+        ways = self.tags[base:base + self.associativity]
+        self.clock += 1
+
+        if tag in ways:
+            slot = base + ways.index(tag)
+            self.hits += 1
+            if self.replacement == 'lru':
+                self.stamps[slot] = self.clock
+            if is_write:
+                if self.write_policy == 'write-back':
+                    self.dirty[slot] = 1
+                elif self.next_level is not None:
+                    self.next_level.access(address, True)
+            return True
+
+        self.misses += 1
+        if is_write and self.write_policy == 'write-through':  # No write-allocate
+            if self.next_level is not None:
+                self.next_level.access(address, True)
+            return False
+
+        if -1 in ways:
+            slot = base + ways.index(-1)
+        else:
+            if self.replacement == 'random':
+                slot = base + self.random.randrange(self.associativity)
+            else:
+                stamps = self.stamps[base:base + self.associativity]
+                slot = base + stamps.index(min(stamps))
+            self.evictions += 1
+            if self.dirty[slot]:
+                self.writebacks += 1
+                if self.next_level is not None:
+                    victim = ((self.tags[slot] << self.set_bits) | (slot // self.associativity)) << self.offset_bits
+                    self.next_level.access(victim, True)
+
+        if self.next_level is not None:
+            self.next_level.access(address, False)
+        self.tags[slot] = tag
+        self.stamps[slot] = self.clock
+        self.dirty[slot] = is_write  # Only reachable for write-back on a write
+        return False
+
+    @property
+    def accesses(self):
+        return self.hits + self.misses
+
+    def counters(self):
+        """Counter values in CACHE_COUNTERS order."""
+        return (self.accesses, self.hits, self.misses, self.evictions, self.writebacks)
+
+    def reset(self):
+        """Invalidate every line and clear the counters."""
+        self.tags = array('q', [-1] * len(self.tags))
+        self.stamps = array('Q', [0] * len(self.stamps))
+        self.dirty = bytearray(len(self.dirty))
+        self.clock = 0
+        self.hits = self.misses = self.evictions = self.writebacks = 0
+
+    def __repr__(self):
+        return (f"Cache({self.name!r}, size={self.size}, associativity={self.associativity}, "
+                f"line_size={self.line_size}, replacement={self.replacement!r}, "
+                f"write_policy={self.write_policy!r})")
+
+
+class MemoryHierarchy:
+    """L1 instruction and data caches over an optional unified L2.
+
+    Attach it to a processor with attach(). It is then sent every instruction
+    fetch and every load/store address. Data accesses are also counted per data
+    label. An address belongs to the nearest memory_map label at or below it,
+    up to the end of the data section. Other addresses, such as the stack, are
+    counted under None.
+    """
+
+    def __init__(self, l1i=None, l1d=None, l2=None):
+        self.l2 = l2
+        self.l1i = l1i if l1i is not None else Cache('L1I', next_level=l2)
+        self.l1d = l1d if l1d is not None else Cache('L1D', next_level=l2)
+        self.l1i.next_level = self.l1d.next_level = l2
+        self.data_labels = LabelIndex({})
+        self.data_start = self.data_end = 0
+        self.per_label = {}  # label -> [L1D counters..., L2 counters...] in CACHE_COUNTERS order
+
+    @property
+    def caches(self):
+        return [cache for cache in (self.l1i, self.l1d, self.l2) if cache is not None]
+
+    def attach(self, processor):
+        """Model the caches for a processor's fetches and data accesses."""
+        self.data_labels = LabelIndex(processor.memory_map)
+        self.data_start = min(processor.memory_map.values(), default=0)
+        self.data_end = processor.current_data_address
+        processor.memory_hierarchy = self
+        return self
+
+    def fetch(self, address):
+        self.l1i.access(address, False)
+
+    def access(self, address, size, is_write):
+        if not self.data_start <= address < self.data_end:
+            label = None
+        else:
+            label = self.data_labels.enclosing(address)
+        counts = self.per_label.get(label)
+        if counts is None:
+            counts = self.per_label[label] = [0] * (2 * len(CACHE_COUNTERS))
+
+        l1d, l2 = self.l1d, self.l2
+        evictions, writebacks = l1d.evictions, l1d.writebacks
+        if l2 is not None:
+            l2_hits, l2_misses, l2_evictions, l2_writebacks = l2.hits, l2.misses, l2.evictions, l2.writebacks
+        counts[0] += 1
+        if l1d.access(address, is_write):
+            counts[1] += 1
+        else:
+            counts[2] += 1
+        counts[3] += l1d.evictions - evictions
+        counts[4] += l1d.writebacks - writebacks
+        if l2 is not None:
+            hits, misses = l2.hits - l2_hits, l2.misses - l2_misses
+            counts[5] += hits + misses
+            counts[6] += hits
+            counts[7] += misses
+            counts[8] += l2.evictions - l2_evictions
+            counts[9] += l2.writebacks - l2_writebacks
+
+    def reset(self):
+        for cache in self.caches:
+            cache.reset()
+        self.per_label = {}
+
+    def report(self):
+        """Counters per cache and per data label as a dict."""
+        report = {'caches': {cache.name: dict(zip(CACHE_COUNTERS, cache.counters())) for cache in self.caches},
+                  'per_label': {}}
+        for label, counts in self.per_label.items():
+            entry = {self.l1d.name: dict(zip(CACHE_COUNTERS, counts))}
+            if self.l2 is not None:
+                entry[self.l2.name] = dict(zip(CACHE_COUNTERS, counts[len(CACHE_COUNTERS):]))
+            report['per_label'][str(label)] = entry
+        return report
+
+    def format_report(self):
+        """Human-readable version of report()."""
+        header = ''.join(f"{counter:>12}" for counter in CACHE_COUNTERS) + f"{'miss rate':>12}"
+        lines = [f"{'cache':<20}" + header]
+        for cache in self.caches:
+            lines.append(f"{cache.name:<20}" + ''.join(f"{value:>12}" for value in cache.counters())
+                         + f"{cache.misses / cache.accesses if cache.accesses else 0.0:>12.2%}")
+        lines += ["", f"{'data label':<20}" + header]
+        for label, counts in sorted(self.per_label.items(), key=lambda item: -item[1][2]):
+            lines.append(f"{str(label):<20}" + ''.join(f"{value:>12}" for value in counts[:len(CACHE_COUNTERS)])
+                         + f"{counts[2] / counts[0] if counts[0] else 0.0:>12.2%}")
+        return '\n'.join(lines)
+
+
+def parse_cache_spec(name, text, next_level=None):
+    """Build a Cache from 'SIZE:ASSOCIATIVITY:LINE_SIZE[:POLICY[:wb|wt]]'."""
+    fields = text.split(':')
+    if not 3 <= len(fields) <= 5:
+        raise ValueError(f"Invalid cache specification '{text}'.")
+    size, associativity, line_size = (int(field, 0) for field in fields[:3])
+    replacement = fields[3] if len(fields) > 3 else 'lru'
+    write_policy = {'wb': 'write-back', 'wt': 'write-through'}.get(fields[4] if len(fields) > 4 else 'wb')
+    if write_policy is None:
+        raise ValueError(f"Invalid write policy in '{text}'; use wb or wt.")
+    return Cache(name, size, associativity, line_size, replacement, write_policy, next_level)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate an L1/L2 cache hierarchy for a MIPS program.")
+    parser.add_argument('file', help="MIPS source file")
+    parser.add_argument('--l1i', default='32768:4:64', help="L1 instruction cache (default 32768:4:64)")
+    parser.add_argument('--l1d', default='32768:4:64', help="L1 data cache (default 32768:4:64)")
+    parser.add_argument('--l2', default=None, help="Unified L2 cache (default: none)")
+    parser.add_argument('--max-steps', type=int, default=None, help="Instruction budget")
+    args = parser.parse_args()
+
+    try:
+        l2 = parse_cache_spec('L2', args.l2) if args.l2 else None
+        hierarchy = MemoryHierarchy(parse_cache_spec('L1I', args.l1i, l2), parse_cache_spec('L1D', args.l1d, l2), l2)
+    except ValueError as error:
+        parser.error(str(error))
+    processor = MIPSProcessor.from_image(Assembler().assemble_file(args.file), trace_level=TRACE_OFF)
+    hierarchy.attach(processor)
+    processor.run(args.max_steps)
+    print(hierarchy.format_report())
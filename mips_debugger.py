@@ -0,0 +1,257 @@
+"""Interactive debugger for the MIPS simulator.
+
+Breakpoints are a set of PCs checked in constant time. Watchpoints cover byte
+ranges of memory, given by address or by .data label, and stop the program
+right after a load or store that touches them. Continue and until run with an
+instruction budget, so an infinite loop returns control instead of hanging.
+When no breakpoints or watchpoints are set, a plain MIPSProcessor.run() still
+uses the fast execution paths.
+
+Usage:
+    python mips_debugger.py [--budget N] FILE
+
+Commands: break, delete, watch, unwatch, step, continue, until, regs, mem, list, info, quit
+(type 'help COMMAND' in the shell).
+"""
+
+import argparse
+import cmd
+
+from Mips_Simulator import TRACE_OFF, Assembler, LabelIndex, MIPSProcessor, register_names_by_index
+
+
+class Debugger:
+    """Breakpoint, watchpoint and stepping control over one MIPSProcessor."""
+
+    def __init__(self, processor, budget=1000000):
+        self.processor = processor
+        self.budget = budget  # Instructions per continue / until; None for no limit
+        self.code_labels = LabelIndex(processor.label_map)
+        self.data_labels = LabelIndex(processor.memory_map)
+
+    def resolve(self, location):
+        """An address from an int, a numeric string ('0x400010', '4194320'), or a code or data label."""
+        if isinstance(location, int):
+            return location
+        if location in self.processor.label_map:
+            return self.processor.label_map[location]
+        if location in self.processor.memory_map:
+            return self.processor.memory_map[location]
+        try:
+            return int(location, 0)
+        except ValueError:
+            raise ValueError(f"Unknown label or address '{location}'.") from None
+
+    def label_length(self, label):
+        """Bytes from a data label to the next data label or the end of the data section."""
+        start = self.processor.memory_map[label]
+        later = [address for address in self.data_labels.addresses if address > start]
+        return (later[0] if later else self.processor.current_data_address) - start
+
+    def add_breakpoint(self, location):
+        address = self.resolve(location)
+        self.processor.breakpoints.add(address)
+        return address
+
+    def remove_breakpoint(self, location):
+        address = self.resolve(location)
+        self.processor.breakpoints.discard(address)
+        return address
+
+    def watch(self, location, length=None, kind='rw'):
+        """Watch loads ('r'), stores ('w') or both of length bytes; a data label defaults to its whole extent."""
+        if kind not in ('r', 'w', 'rw'):
+            raise ValueError(f"Watch kind must be 'r', 'w' or 'rw', not '{kind}'.")
+        address = self.resolve(location)
+        if length is None:
+            length = self.label_length(location) if location in self.processor.memory_map else 4
+        watchpoints = self.processor.watchpoints
+        for byte in range(address, address + length):
+            merged = watchpoints.get(byte, '') + kind
+            watchpoints[byte] = ''.join(letter for letter in 'rw' if letter in merged)
+        return address, length
+
+    def unwatch(self, location, length=None):
+        address = self.resolve(location)
+        if length is None:
+            length = self.label_length(location) if location in self.processor.memory_map else 4
+        for byte in range(address, address + length):
+            self.processor.watchpoints.pop(byte, None)
+        return address, length
+
+    def step(self, count=1):
+        return self.processor.run(count)
+
+    def cont(self):
+        return self.processor.run(self.budget)
+
+    def until(self, location):
+        return self.processor.run(self.budget, until_pc=self.resolve(location))
+
+    def location(self, address):
+        return self.code_labels.describe(address)
+
+    def current_instruction(self):
+        """Disassembly of the instruction at the PC, or None once halted."""
+        processor = self.processor
+        if processor.halted:
+            return None
+        return processor.decode_instruction(processor.memory.read_word(processor.pc, signed=False))
+
+    def status(self, steps):
+        """One line describing why the last run stopped."""
+        processor = self.processor
+        reason = processor.stop_reason
+        if processor.halted:
+            return f"Program halted after {processor.instruction_count} instructions ({steps} this run)."
+        if reason is None:
+            return f"Stopped after {steps} instructions at {self.location(processor.pc)}."
+        if reason[0] == 'watchpoint':
+            _, address, kind, pc = reason
+            access = 'Read of' if kind == 'r' else 'Write to'
+            return (f"{access} {self.data_labels.describe(address)} ({address:#010x}) "
+                    f"by {self.location(pc)}; now at {self.location(processor.pc)}.")
+        return f"{reason[0].capitalize()} at {self.location(reason[1])}."
+
+
+class DebuggerShell(cmd.Cmd):
+    """Line-oriented front end for Debugger."""
+
+    prompt = '(mips) '
+
+    def __init__(self, debugger, **options):
+        super().__init__(**options)
+        self.debugger = debugger
+        self.intro = f"MIPS debugger. Stopped at {self.where()}. Type 'help' for commands."
+
+    def where(self):
+        instruction = self.debugger.current_instruction()
+        if instruction is None:
+            return "end of program"
+        return f"{self.debugger.location(self.debugger.processor.pc)}: {instruction}"
+
+    def report(self, steps):
+        print(self.debugger.status(steps))
+        if not self.debugger.processor.halted:
+            print(f"  {self.where()}")
+
+    def onecmd(self, line):
+        try:
+            return super().onecmd(line)
+        except (ValueError, IndexError) as error:
+            print(f"Error: {error}")
+            return False
+
+    def emptyline(self):
+        pass  # Do not repeat the last command
+
+    def do_break(self, argument):
+        """break LOCATION: stop before the instruction at a label or address."""
+        print(f"Breakpoint at {self.debugger.location(self.debugger.add_breakpoint(argument.strip()))}.")
+
+    do_b = do_break
+
+    def do_delete(self, argument):
+        """delete LOCATION: remove a breakpoint."""
+        print(f"Deleted breakpoint at {self.debugger.location(self.debugger.remove_breakpoint(argument.strip()))}.")
+
+    def do_watch(self, argument):
+        """watch LOCATION [LENGTH] [r|w|rw]: stop after loads/stores touching memory."""
+        parts = argument.split()
+        length = int(parts[1], 0) if len(parts) > 1 else None
+        kind = parts[2] if len(parts) > 2 else 'rw'
+        address, length = self.debugger.watch(parts[0], length, kind)
+        print(f"Watching {length} bytes at {address:#010x} ({kind}).")
+
+    def do_unwatch(self, argument):
+        """unwatch LOCATION [LENGTH]: remove a watchpoint."""
+        parts = argument.split()
+        address, length = self.debugger.unwatch(parts[0], int(parts[1], 0) if len(parts) > 1 else None)
+        print(f"Stopped watching {length} bytes at {address:#010x}.")
+
+    def do_step(self, argument):
+        """step [N]: execute N instructions (default 1)."""
+        self.report(self.debugger.step(int(argument, 0) if argument.strip() else 1))
+
+    do_s = do_step
+
+    def do_continue(self, argument):
+        """continue: run to the next breakpoint, watchpoint, the end, or the instruction budget."""
+        self.report(self.debugger.cont())
+
+    do_c = do_continue
+
+    def do_until(self, argument):
+        """until LOCATION: run until the PC reaches a label or address."""
+        self.report(self.debugger.until(argument.strip()))
+
+    def do_regs(self, argument):
+        """regs: show the PC and all registers."""
+        processor = self.debugger.processor
+        print(f"pc = {processor.pc:#010x}  ({self.debugger.location(processor.pc)})")
+        for row in range(0, 32, 4):
+            print('  '.join(f"{register_names_by_index[index]:>5} = {processor.registers[index]:>11}"
+                            for index in range(row, row + 4)))
+
+    do_r = do_regs
+
+    def do_mem(self, argument):
+        """mem LOCATION [LENGTH]: dump memory as hex words (LENGTH in bytes, default 16)."""
+        parts = argument.split()
+        address = self.debugger.resolve(parts[0])
+        length = int(parts[1], 0) if len(parts) > 1 else 16
+        data = self.debugger.processor.memory.read_bytes(address, length)
+        for offset in range(0, length, 16):
+            chunk = data[offset:offset + 16]
+            print(f"{address + offset:#010x}: " + ' '.join(chunk[i:i + 4].hex() for i in range(0, len(chunk), 4)))
+
+    do_x = do_mem
+
+    def do_list(self, argument):
+        """list [N]: disassemble N instructions from the PC (default 5)."""
+        processor = self.debugger.processor
+        address = processor.pc
+        for _ in range(int(argument, 0) if argument.strip() else 5):
+            if not processor.text_start <= address < processor.text_end:
+                break
+            text = processor.decode_instruction(processor.memory.read_word(address, signed=False), address)
+            marker = '=>' if address == processor.pc else '  '
+            flag = '*' if address in processor.breakpoints else ' '
+            print(f"{marker}{flag} {address:#010x}  {self.debugger.location(address):<20} {text}")
+            address += 4
+
+    do_l = do_list
+
+    def do_info(self, argument):
+        """info: list breakpoints and watched bytes."""
+        processor = self.debugger.processor
+        for address in sorted(processor.breakpoints):
+            print(f"breakpoint  {address:#010x}  {self.debugger.location(address)}")
+        ranges = []  # [start, length, kind] runs of consecutive watched bytes
+        for address in sorted(processor.watchpoints):
+            kind = processor.watchpoints[address]
+            if ranges and ranges[-1][0] + ranges[-1][1] == address and ranges[-1][2] == kind:
+                ranges[-1][1] += 1
+            else:
+                ranges.append([address, 1, kind])
+        for address, length, kind in ranges:
+            print(f"watch       {address:#010x}  {self.debugger.data_labels.describe(address)}"
+                  f"  {length} bytes ({kind})")
+
+    def do_quit(self, argument):
+        """quit: leave the debugger."""
+        return True
+
+    do_q = do_quit
+    do_EOF = do_quit
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Debug a MIPS program interactively.")
+    parser.add_argument('file', help="MIPS source file")
+    parser.add_argument('--budget', type=int, default=1000000,
+                        help="Instructions per continue/until before returning to the prompt")
+    args = parser.parse_args()
+
+    processor = MIPSProcessor.from_image(Assembler().assemble_file(args.file), trace_level=TRACE_OFF)
+    DebuggerShell(Debugger(processor, args.budget)).cmdloop()
@@ -0,0 +1,126 @@
+"""Streaming disassembler for assembled MIPS programs.
+
+It reads either binary format written by translate_mips_to_binary: text
+objects with one line of 32 '0'/'1' characters per instruction, or packed
+objects. It writes annotated assembly one instruction at a time, so even very
+large images are never held in memory as text.
+
+Packed objects are memory-mapped and their words are formatted straight from
+the mapping. Decode tables and the address-to-label index are built once.
+The most recently formatted lines are cached per address (up to
+LINE_CACHE_SIZE of them), so disassembling the same code again (e.g. for
+traces or the debugger) costs a dict lookup.
+
+Usage:
+    python mips_disasm.py [-o OUTPUT] [--text-start ADDRESS] [--no-encoding] FILE
+"""
+
+import argparse
+import sys
+from collections import OrderedDict
+
+from Mips_Simulator import OBJECT_MAGIC, TEXT_SEGMENT_START, format_instruction, map_packed_object
+
+# Lines written to the output file per writelines() call
+WRITE_BATCH = 4096
+# Formatted lines kept per Disassembler; the least recently used are dropped first
+LINE_CACHE_SIZE = 65536
+
+
+class Disassembler:
+    """Formats instruction words as assembly, with labels taken from a label_map."""
+
+    def __init__(self, label_map=None, show_encoding=True, cache_size=LINE_CACHE_SIZE):
+        self.show_encoding = show_encoding
+        self.cache_size = cache_size
+        self.cache = OrderedDict()  # address -> (word, formatted line), least recently used first
+        self.set_labels(label_map or {})
+
+    def set_labels(self, label_map):
+        """Replace the label index (and drop cached lines, which embed label names)."""
+        self.labels = {}  # address -> first label, used for branch and jump targets
+        self.label_lines = {}  # address -> 'label:' header lines for every label defined there
+        for name, address in sorted(dict(label_map).items(), key=lambda item: (item[1], item[0])):
+            self.labels.setdefault(address, name)
+            self.label_lines[address] = self.label_lines.get(address, '') + f"{name}:\n"
+        self.cache.clear()
+
+    def line(self, address, word):
+        """One formatted instruction line, from the cache when the word at address is unchanged."""
+        cached = self.cache.get(address)
+        if cached is not None and cached[0] == word:
+            self.cache.move_to_end(address)
+            return cached[1]
+        text = format_instruction(word, address, self.labels)
+        if self.show_encoding:
+            text = f"    {address:#010x}:  {word:08x}  {text}\n"
+        else:
+            text = f"    {text}\n"
+        self.cache[address] = (word, text)
+        self.cache.move_to_end(address)
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return text
+
+    def iter_lines(self, words, start=TEXT_SEGMENT_START):
+        """Yield output lines (label headers and instructions) for consecutive words from start."""
+        label_lines = self.label_lines
+        address = start
+        for word in words:
+            header = label_lines.get(address)
+            if header is not None:
+                yield header
+            yield self.line(address, word)
+            address += 4
+
+    def disassemble_text_file(self, input_file, start=TEXT_SEGMENT_START):
+        """Yield lines for a text object file; it has no symbols, so only current labels are used."""
+        with open(input_file, 'r') as file:
+            words = (int(line, 2) for line in file if line.strip())
+            yield from self.iter_lines(words, start)
+
+    def disassemble_object_file(self, input_file):
+        """Yield lines for a packed object file, using its own label table.
+
+        The file stays mapped until the generator is exhausted or closed.
+        """
+        with map_packed_object(input_file) as packed:
+            self.set_labels(packed.label_map)
+            yield from self.iter_lines(packed.words, packed.text_start)
+
+    def disassemble_file(self, input_file, start=TEXT_SEGMENT_START):
+        """Yield lines for a text or packed object file, detected from its first bytes."""
+        with open(input_file, 'rb') as file:
+            is_object = file.read(len(OBJECT_MAGIC)) == OBJECT_MAGIC
+        if is_object:
+            return self.disassemble_object_file(input_file)
+        return self.disassemble_text_file(input_file, start)
+
+
+def write_lines(lines, output):
+    """Write an iterable of lines to a file object in batches."""
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) == WRITE_BATCH:
+            output.writelines(batch)
+            batch.clear()
+    output.writelines(batch)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Disassemble a text or packed MIPS binary.")
+    parser.add_argument('file', help="Text object (.txt) or packed object (.bin) file")
+    parser.add_argument('-o', '--output', default=None, help="Write the assembly here instead of stdout")
+    parser.add_argument('--text-start', type=lambda text: int(text, 0), default=TEXT_SEGMENT_START,
+                        help="Address of the first instruction in a text object file")
+    parser.add_argument('--no-encoding', action='store_true', help="Omit addresses and instruction words")
+    args = parser.parse_args()
+
+    disassembler = Disassembler(show_encoding=not args.no_encoding)
+    lines = disassembler.disassemble_file(args.file, args.text_start)
+    if args.output:
+        with open(args.output, 'w') as output:
+            write_lines(lines, output)
+    else:
+        write_lines(lines, sys.stdout)
@@ -0,0 +1,372 @@
+"""Peephole and dead-code optimizer for assembled MIPS programs.
+
+The optimizer works on a ProgramImage, where every branch and jump target is
+known. Each pass builds a control-flow graph of basic blocks from the branch
+and jump instructions, then:
+- retargets branches and jumps whose target is a j (or beq $x, $x) to that
+  jump's final destination,
+- deletes basic blocks that cannot be reached from the first instruction,
+- deletes no-ops: nop, sll $x, $x, 0, move $x, $x (and add/or/sub $x, $x,
+  $zero), addi/ori/xori $x, $x, 0,
+- merges addi $x, $s, a followed by addi $x, $x, b (so li $x, a followed by
+  addi $x, $x, b becomes a single li),
+- deletes writes to a register that is overwritten later in the same block
+  before anything reads it (so only the last of a chain of li survives),
+- deletes branches and jumps to the next remaining instruction.
+The remaining instructions are then packed together, and branch offsets, jump
+targets and label_map are rewritten. Passes repeat until nothing changes.
+
+Semantics are those of MIPSProcessor. Code addresses are assumed to be taken
+only by jal; if the program jumps through any register other than $ra, every
+label and every return address is kept as a possible entry point. Rules that
+rely on $zero reading as zero are skipped if the program writes to $zero.
+
+Usage:
+    python mips_optimizer.py [-o OUTPUT] [--format text|packed] [--run] [--max-steps N] [--stdin FILE] FILE
+"""
+
+import argparse
+import io
+from collections import namedtuple
+
+from Mips_Simulator import (EXEC_DECODED, TRACE_OFF, Assembler, MIPSProcessor, PagedMemory, SystemCalls,
+                            instruction_name, write_packed_object, write_text_object)
+from mips_pipeline import I_TYPE_ALU, R_TYPE_ALU, SHIFTS, register_usage
+
+# Instructions whose only effect is writing their destination register
+PURE_OPERATIONS = R_TYPE_ALU | I_TYPE_ALU | SHIFTS | {'lui'}
+# Values that fit a signed 16-bit immediate or branch offset
+IMMEDIATE_RANGE = range(-0x8000, 0x8000)
+
+# Static instruction counts before and after optimize_image, and how many
+# instructions each optimization deleted (retargeted counts rewritten branches and jumps)
+OptimizationReport = namedtuple('OptimizationReport', ['static_before', 'static_after', 'unreachable', 'redundant',
+                                                       'folded', 'dead', 'retargeted', 'passes'])
+
+# Executed instruction counts of a program before and after optimization, whether both
+# runs produced the same console output, exit code and halted flag, and whether they
+# left the same registers and the same memory outside the text segment (see compare_runs)
+DynamicComparison = namedtuple('DynamicComparison', ['before', 'after', 'same_output', 'same_registers',
+                                                     'same_memory'])
+
+
+class PeepholeOptimizer:
+    """One optimization pass over the text of a ProgramImage (see module docstring)."""
+
+    def __init__(self, image):
+        self.image = image
+        # Only used to decode words exactly as the simulator would; nothing is loaded into its memory
+        processor = MIPSProcessor({}, PagedMemory(image.byteorder), {}, image.data_end, image.text_start,
+                                  trace_level=TRACE_OFF)
+        self.start = image.text_start
+        self.end = image.text_start + 4 * len(image.text)
+        self.words = list(image.text)
+        self.decoded = [processor.decode_word(self.start + 4 * index, word) for index, word in enumerate(self.words)]
+        self.names = [instruction_name(decoded) for decoded in self.decoded]
+        self.usage = [register_usage(decoded) for decoded in self.decoded]
+        self.targets = [self.target(index) for index in range(len(self.words))]
+        self.removed = [False] * len(self.words)
+        self.counts = dict.fromkeys(('unreachable', 'redundant', 'folded', 'dead', 'retargeted'), 0)
+        self.zero_is_constant = not any(usage[2] == 0 for usage in self.usage)
+        self.indirect = any(name == 'jr' and decoded.rs != 31 for name, decoded in zip(self.names, self.decoded))
+
+    def target(self, index):
+        """Branch or jump target address of the instruction at an index, or None."""
+        name = self.names[index]
+        next_pc = self.start + 4 * index + 4
+        if name == 'beq' or name == 'bne':
+            return next_pc + self.decoded[index].imm * 4
+        if name == 'j' or name == 'jal':
+            return (next_pc & 0xF0000000) | (self.decoded[index].imm << 2)
+        return None
+
+    def index(self, address):
+        """Text index of an address, len(text) for the end of the text, or None outside it."""
+        if self.start <= address <= self.end and not address & 3:
+            return (address - self.start) >> 2
+        return None
+
+    def is_jump(self, index):
+        """Whether the instruction always transfers control to its target (j, or beq $x, $x)."""
+        name = self.names[index]
+        return name == 'j' or (name == 'beq' and self.decoded[index].rs == self.decoded[index].rt)
+
+    def remove(self, index, reason):
+        self.removed[index] = True
+        self.counts[reason] += 1
+
+    def run(self):
+        """Apply every optimization once; returns the new ProgramImage, or None if nothing changed."""
+        self.retarget_chains()
+        blocks = self.basic_blocks()
+        for start, end in self.reachable(blocks):
+            self.optimize_block(start, end)
+        self.remove_jumps_to_next()
+        if not any(self.counts.values()):
+            return None
+        return self.compact()
+
+    def final_target(self, address):
+        """Where control ends up after entering at address and following nops and unconditional jumps."""
+        seen = set()
+        while address not in seen:
+            seen.add(address)
+            index = self.index(address)
+            if index is None or index == len(self.words):
+                break
+            if self.words[index] == 0:
+                address += 4
+            elif self.is_jump(index):
+                address = self.targets[index]
+            else:
+                break
+        return address
+
+    def retarget_chains(self):
+        for index, target in enumerate(self.targets):
+            if target is None:
+                continue
+            final = self.final_target(target)
+            if final == target:
+                continue
+            # Deleting instructions only brings addresses closer, so an offset that fits now still fits
+            if self.names[index] in ('beq', 'bne') and (final - self.start - 4 * index - 4) // 4 not in IMMEDIATE_RANGE:
+                continue
+            self.targets[index] = final
+            self.counts['retargeted'] += 1
+
+    def basic_blocks(self):
+        """{start index: (end index, successor start indices)} for the CFG of the text."""
+        count = len(self.words)
+        leaders = {0}
+        for index, target in enumerate(self.targets):
+            if target is not None or self.names[index] == 'jr':
+                leaders.add(index + 1)
+            if target is not None and self.index(target) is not None:
+                leaders.add(self.index(target))
+        if self.indirect:
+            leaders.update(self.index(address) for _, address in self.image.label_map
+                           if self.index(address) is not None)
+        leaders = sorted(leader for leader in leaders if leader < count)
+
+        blocks = {}
+        for start, end in zip(leaders, leaders[1:] + [count]):
+            last = end - 1
+            name = self.names[last]
+            successors = []
+            if self.targets[last] is not None:
+                successors.append(self.index(self.targets[last]))
+            if name != 'jr' and not self.is_jump(last):
+                successors.append(end)
+            blocks[start] = (end, [successor for successor in successors
+                                   if successor is not None and successor < count])
+        return blocks
+
+    def reachable(self, blocks):
+        """Yield (start, end) of every block reachable from the entry point; the others are removed."""
+        roots = [0] if blocks else []
+        if self.indirect:
+            roots += [start for start in blocks if start and self.names[start - 1] == 'jal']
+            roots += [self.index(address) for _, address in self.image.label_map if self.index(address) in blocks]
+        seen = set(roots)
+        work = list(roots)
+        while work:
+            for successor in blocks[work.pop()][1]:
+                if successor not in seen:
+                    seen.add(successor)
+                    work.append(successor)
+        for start, (end, _) in blocks.items():
+            if start in seen:
+                yield start, end
+            else:
+                for index in range(start, end):
+                    self.remove(index, 'unreachable')
+
+    def is_noop(self, index):
+        """Whether the instruction at an index changes nothing."""
+        name = self.names[index]
+        opcode, rs, rt, rd, shamt, funct, imm, _ = self.decoded[index]
+        if opcode == 0 and funct == 0 and shamt == 0:
+            return rd == rt  # nop, or sll $x, $x, 0
+        if name in ('addi', 'ori', 'xori'):
+            return rt == rs and imm == 0
+        if name in ('add', 'or', 'sub') and self.zero_is_constant:
+            return rd == rs and rt == 0  # move $x, $x is add $x, $x, $zero
+        return False
+
+    def optimize_block(self, start, end):
+        """No-op removal, addi folding and dead-write removal within one basic block."""
+        previous = None
+        for index in range(start, end):
+            if self.is_noop(index):
+                self.remove(index, 'redundant')
+                continue
+            if previous is not None and self.names[index] == 'addi' and self.names[previous] == 'addi':
+                first, second = self.decoded[previous], self.decoded[index]
+                total = first.imm + second.imm
+                if second.rs == second.rt == first.rt and total in IMMEDIATE_RANGE:
+                    self.words[index] = self.words[index] & 0xFC1F0000 | first.rs << 21 | total & 0xFFFF
+                    self.decoded[index] = second._replace(rs=first.rs, imm=total)
+                    self.usage[index] = register_usage(self.decoded[index])
+                    self.remove(previous, 'folded')
+            previous = index
+
+        overwritten = set()  # Registers written later in the block before being read
+        for index in range(end - 1, start - 1, -1):
+            if self.removed[index]:
+                continue
+            reads_ex, reads_id, written, _ = self.usage[index]
+            if self.names[index] in PURE_OPERATIONS and written in overwritten:
+                self.remove(index, 'dead')
+                continue
+            if written is not None:
+                overwritten.add(written)
+            overwritten.difference_update(reads_ex)
+            overwritten.difference_update(reads_id)
+
+    def remove_jumps_to_next(self):
+        """Delete j/beq/bne instructions whose target is the next instruction still in place."""
+        count = len(self.words)
+        remaining = [0] * (count + 1)  # remaining[i]: instructions still in place before index i
+        for index in range(count):
+            remaining[index + 1] = remaining[index] + (not self.removed[index])
+        for index, target in enumerate(self.targets):
+            if self.removed[index] or self.names[index] not in ('j', 'beq', 'bne'):
+                continue
+            target_index = self.index(target)
+            if target_index is not None and target_index > index and \
+                    remaining[target_index] == remaining[index + 1]:
+                self.remove(index, 'redundant')
+
+    def compact(self):
+        """The ProgramImage with removed instructions deleted and every text address rewritten."""
+        new_index = []
+        count = 0
+        for removed in self.removed:
+            new_index.append(count)
+            count += not removed
+        new_index.append(count)
+
+        def relocate(address):
+            index = self.index(address)
+            return address if index is None else self.start + 4 * new_index[index]
+
+        words = []
+        for index, word in enumerate(self.words):
+            if self.removed[index]:
+                continue
+            target = self.targets[index]
+            if target is not None:
+                address = self.start + 4 * len(words)
+                if self.names[index] in ('beq', 'bne'):
+                    offset = (relocate(target) - address - 4) // 4
+                    if offset not in IMMEDIATE_RANGE:
+                        raise ValueError(f"Branch at {address:#010x} cannot reach {target:#010x}.")
+                    word = word & 0xFFFF0000 | offset & 0xFFFF
+                else:
+                    word = word & 0xFC000000 | (relocate(target) >> 2) & 0x3FFFFFF
+            words.append(word)
+        return self.image._replace(text=tuple(words),
+                                   label_map=tuple((name, relocate(address)) for name, address in self.image.label_map))
+
+
+def optimize_image(image):
+    """Optimize a ProgramImage until no pass changes it; returns (optimized image, OptimizationReport)."""
+    counts = dict.fromkeys(('unreachable', 'redundant', 'folded', 'dead', 'retargeted'), 0)
+    optimized = image
+    passes = 0
+    while True:
+        optimizer = PeepholeOptimizer(optimized)
+        result = optimizer.run()
+        passes += 1
+        for reason, count in optimizer.counts.items():
+            counts[reason] += count
+        if result is None:
+            break
+        optimized = result
+    return optimized, OptimizationReport(len(image.text), len(optimized.text), passes=passes, **counts)
+
+
+def run_to_end(image, max_steps, stdin, execution_mode):
+    """An untraced processor that has run an image for up to max_steps instructions, and its console output."""
+    processor = MIPSProcessor.from_image(image, trace_level=TRACE_OFF, execution_mode=execution_mode)
+    console = io.StringIO()
+    processor.syscalls = SystemCalls(stdin, console)
+    try:
+        processor.run(max_steps)
+    finally:
+        processor.syscalls.close()
+    return processor, console.getvalue()
+
+
+def comparable(processor, value):
+    """value, or None if it is an address in the processor's text segment.
+
+    Return addresses saved by jal move with the code, so a code address in one
+    run matches any code address in the other.
+    """
+    return None if processor.text_start <= value <= processor.text_end else value
+
+
+def compare_runs(original, optimized, max_steps=None, stdin='', execution_mode=EXEC_DECODED):
+    """Run both images and compare their executed instruction counts, output, registers and memory.
+
+    Memory is compared as the nonzero words outside the text segment; registers
+    and memory words holding code addresses match each other (see comparable).
+    The PC is not compared.
+    """
+    before, before_output = run_to_end(original, max_steps, stdin, execution_mode)
+    after, after_output = run_to_end(optimized, max_steps, stdin, execution_mode)
+    registers, memory = [], []
+    for processor in (before, after):
+        registers.append([comparable(processor, value) for value in processor.registers])
+        memory.append([(address, comparable(processor, value)) for address, value in processor.memory.nonzero_words()
+                       if not processor.text_start <= address < processor.text_end])
+    same_output = (before_output, before.exit_code, before.halted) == (after_output, after.exit_code, after.halted)
+    return DynamicComparison(before.instruction_count, after.instruction_count, same_output,
+                             registers[0] == registers[1], memory[0] == memory[1])
+
+
+def format_report(report, comparison=None):
+    """Human-readable summary of an OptimizationReport and an optional DynamicComparison."""
+    lines = [f"Static:  {report.static_before} -> {report.static_after} instructions "
+             f"({report.unreachable} unreachable, {report.redundant} redundant, {report.folded} folded, "
+             f"{report.dead} dead; {report.retargeted} branches retargeted; {report.passes} passes)"]
+    if comparison is not None:
+        saved = comparison.before - comparison.after
+        share = 100.0 * saved / comparison.before if comparison.before else 0.0
+        lines.append(f"Dynamic: {comparison.before} -> {comparison.after} instructions ({share:.1f}% fewer)")
+        if not comparison.same_output:
+            lines.append("Warning: the optimized program's output or exit code differs.")
+        if not comparison.same_registers:
+            lines.append("Warning: the optimized program ends with different registers.")
+        if not comparison.same_memory:
+            lines.append("Warning: the optimized program ends with different data or stack memory.")
+    return '\n'.join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Optimize an assembled MIPS program.")
+    parser.add_argument('file', help="MIPS source file")
+    parser.add_argument('-o', '--output', default=None, help="Write the optimized object file here")
+    parser.add_argument('--format', choices=['text', 'packed'], default='text', help="Object file format")
+    parser.add_argument('--run', action='store_true', help="Run both versions and report dynamic counts")
+    parser.add_argument('--max-steps', type=int, default=None, help="Instruction budget for --run")
+    parser.add_argument('--stdin', default=None, metavar='FILE', help="Input for the read syscalls in --run")
+    args = parser.parse_args()
+
+    original = Assembler().assemble_file(args.file)
+    optimized, report = optimize_image(original)
+    comparison = None
+    if args.run:
+        stdin = ''
+        if args.stdin:
+            with open(args.stdin) as file:
+                stdin = file.read()
+        comparison = compare_runs(original, optimized, args.max_steps, stdin)
+    print(format_report(report, comparison))
+    if args.output:
+        if args.format == 'packed':
+            write_packed_object(args.output, optimized)
+        else:
+            write_text_object(args.output, optimized)
@@ -0,0 +1,201 @@
+"""Cycle-level timing model of the classic 5-stage MIPS pipeline (IF/ID/EX/MEM/WB).
+
+The model observes the functional simulator and does not change what it computes.
+It runs in order, one instruction per cycle, and adds stall cycles for:
+- data hazards (with or without forwarding),
+- load-use hazards,
+- control transfers (taken beq/bne, j, jal, jr).
+Branches and jr are resolved in ID, so their operands are needed one stage earlier.
+
+Usage:
+    python mips_pipeline.py [--no-forwarding] [--branch-penalty N] [--jump-penalty N] FILE
+"""
+
+import argparse
+
+from Mips_Simulator import TRACE_OFF, Assembler, LabelIndex, MIPSProcessor, instruction_name
+
+# Stall causes reported by PipelineModel
+STALL_CAUSES = ('data', 'load-use', 'branch', 'jump')
+
+LOADS = {'lw', 'lh', 'lhu', 'lb', 'lbu'}
+STORES = {'sw', 'sh', 'sb'}
+R_TYPE_ALU = {'add', 'sub', 'and', 'or', 'slt', 'mul'}
+I_TYPE_ALU = {'addi', 'slti', 'andi', 'ori', 'xori'}
+SHIFTS = {'sll', 'srl'}
+
+
+def register_usage(decoded):
+    """(registers read in EX, registers read in ID, register written, is_load) for an instruction."""
+    name = instruction_name(decoded)
+    if name in R_TYPE_ALU:
+        return (decoded.rs, decoded.rt), (), decoded.rd, False
+    if name in SHIFTS:
+        return (decoded.rt,), (), decoded.rd, False
+    if name in I_TYPE_ALU:
+        return (decoded.rs,), (), decoded.rt, False
+    if name in LOADS:
+        return (decoded.rs,), (), decoded.rt, True
+    if name in STORES:
+        return (decoded.rs, decoded.rt), (), None, False
+    if name == 'lui':
+        return (), (), decoded.rt, False
+    if name in ('beq', 'bne'):
+        return (), (decoded.rs, decoded.rt), None, False
+    if name == 'jr':
+        return (), (decoded.rs,), None, False
+    if name == 'jal':
+        return (), (), 31, False
+    if name == 'syscall':
+        return (2, 4, 5, 6), (), 2, False  # Reads $v0 and $a0-$a2, may return a result in $v0
+    return (), (), None, False
+
+
+class PipelineModel:
+    """Step observer that estimates cycles and stalls for the executed instruction stream.
+
+    Timing is tracked by the cycle each instruction spends in ID. For every
+    register the model stores the earliest ID cycle at which a consumer can
+    read it: one entry for consumers that need it in EX, one for consumers
+    that need it in ID (branches, jr). Stalls are the gap between that cycle
+    and the instruction's natural ID cycle. A run of n instructions takes
+    n + 4 cycles plus stalls. The model must be attached (see attach), since
+    beq/bne outcomes are read from the processor's registers.
+    """
+
+    def __init__(self, forwarding=True, branch_penalty=1, jump_penalty=1, label_map=None):
+        self.forwarding = forwarding
+        self.branch_penalty = branch_penalty  # Cycles lost on a taken beq/bne
+        self.jump_penalty = jump_penalty  # Cycles lost on j/jal/jr
+        self.labels = LabelIndex(label_map or {})
+        self.usage = {}  # pc -> (decoded, register_usage(decoded), instruction_name(decoded))
+        self.registers = None
+        self.reset()
+
+    def reset(self):
+        """Clear all counters and pipeline state."""
+        self.ready_ex = [0] * 32  # Earliest ID cycle of a consumer reading the register in EX
+        self.ready_id = [0] * 32  # Earliest ID cycle of a consumer reading the register in ID
+        self.load_producer = [False] * 32  # Whether the last writer of the register was a load
+        self.next_id = 1  # ID cycle of the next instruction without stalls (IF is cycle 0)
+        self.last_id = 0
+        self.instructions = 0
+        self.stalls = dict.fromkeys(STALL_CAUSES, 0)
+        self.per_label = {}  # label -> {'instructions': n, 'cycles': n, cause: stalls, ...}
+
+    def attach(self, processor):
+        """Observe a processor's execution, resolving labels from its label_map."""
+        self.labels = LabelIndex(processor.label_map)
+        self.registers = processor.registers
+        processor.step_observers.append(self)
+        return self
+
+    def on_step(self, pc, decoded, next_pc):
+        cached = self.usage.get(pc)
+        if cached is None or cached[0] is not decoded:
+            cached = self.usage[pc] = (decoded, register_usage(decoded), instruction_name(decoded))
+        ex_sources, id_sources, destination, is_load = cached[1]
+        name = cached[2]
+
+        cycle = self.next_id
+        needed = cycle
+        cause = None
+        for register in ex_sources:
+            if register and self.ready_ex[register] > needed:
+                needed = self.ready_ex[register]
+                cause = 'load-use' if self.load_producer[register] else 'data'
+        for register in id_sources:
+            if register and self.ready_id[register] > needed:
+                needed = self.ready_id[register]
+                cause = 'load-use' if self.load_producer[register] else 'data'
+        stall = needed - cycle
+        cycle = needed
+
+        if destination:
+            if not self.forwarding:
+                self.ready_ex[destination] = self.ready_id[destination] = cycle + 3  # Read after WB
+            elif is_load:
+                self.ready_ex[destination] = cycle + 2  # Forwarded from MEM/WB
+                self.ready_id[destination] = cycle + 3
+            else:
+                self.ready_ex[destination] = cycle + 1  # Forwarded from EX/MEM
+                self.ready_id[destination] = cycle + 2
+            self.load_producer[destination] = is_load
+
+        penalty = 0
+        control = None
+        if name == 'beq' or name == 'bne':
+            # Taken or not comes from the condition, not next_pc: a taken branch to
+            # pc + 4 still redirects fetch. beq/bne write no registers, so their
+            # operands still hold the values that were compared.
+            if (self.registers[decoded.rs] == self.registers[decoded.rt]) == (name == 'beq'):
+                control = 'branch'
+                penalty = self.branch_penalty
+        elif name == 'j' or name == 'jal' or name == 'jr':
+            control = 'jump'
+            penalty = self.jump_penalty
+        self.next_id = cycle + 1 + penalty
+        self.last_id = cycle
+        self.instructions += 1
+
+        label = self.labels.enclosing(pc)
+        entry = self.per_label.get(label)
+        if entry is None:
+            entry = self.per_label[label] = dict.fromkeys(('instructions', 'cycles') + STALL_CAUSES, 0)
+        entry['instructions'] += 1
+        entry['cycles'] += 1 + stall + penalty
+        if stall:
+            self.stalls[cause] += stall
+            entry[cause] += stall
+        if penalty:
+            self.stalls[control] += penalty
+            entry[control] += penalty
+
+    @property
+    def cycles(self):
+        """Total cycles until the last instruction leaves WB."""
+        return self.last_id + 4 if self.instructions else 0
+
+    @property
+    def cpi(self):
+        return self.cycles / self.instructions if self.instructions else 0.0
+
+    def report(self):
+        """Cycle, CPI and stall statistics as a dict."""
+        return {
+            'instructions': self.instructions,
+            'cycles': self.cycles,
+            'cpi': self.cpi,
+            'stalls': dict(self.stalls),
+            'per_label': {str(label): dict(entry) for label, entry in self.per_label.items()},
+        }
+
+    def format_report(self):
+        """Human-readable version of report()."""
+        lines = [
+            f"Instructions: {self.instructions}",
+            f"Cycles:       {self.cycles}",
+            f"CPI:          {self.cpi:.3f}",
+            "Stalls:       " + ', '.join(f"{cause}={count}" for cause, count in self.stalls.items()),
+            "",
+            f"{'label':<20}{'instrs':>10}{'cycles':>10}" + ''.join(f"{cause:>10}" for cause in STALL_CAUSES),
+        ]
+        for label, entry in sorted(self.per_label.items(), key=lambda item: -item[1]['cycles']):
+            lines.append(f"{str(label):<20}{entry['instructions']:>10}{entry['cycles']:>10}"
+                         + ''.join(f"{entry[cause]:>10}" for cause in STALL_CAUSES))
+        return '\n'.join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Estimate 5-stage pipeline cycles for a MIPS program.")
+    parser.add_argument('file', help="MIPS source file")
+    parser.add_argument('--no-forwarding', action='store_true', help="Disable operand forwarding")
+    parser.add_argument('--branch-penalty', type=int, default=1, help="Cycles lost on a taken beq/bne")
+    parser.add_argument('--jump-penalty', type=int, default=1, help="Cycles lost on j/jal/jr")
+    parser.add_argument('--max-steps', type=int, default=None, help="Instruction budget")
+    args = parser.parse_args()
+
+    processor = MIPSProcessor.from_image(Assembler().assemble_file(args.file), trace_level=TRACE_OFF)
+    model = PipelineModel(not args.no_forwarding, args.branch_penalty, args.jump_penalty).attach(processor)
+    processor.run(args.max_steps)
+    print(model.format_report())
@@ -0,0 +1,176 @@
+"""Low-overhead profiler for MIPS guest programs.
+
+The profiler runs the program as translated basic blocks and counts how often
+each block is entered. From those counts it derives per-PC execution counts,
+per-label totals and a shadow call stack: jal pushes its target, and jr $ra
+pops. Instructions are charged to the call stack that executed them. The
+result is written as collapsed stacks ('main;fib;fib 1234') that flame-graph
+tools such as flamegraph.pl and speedscope accept.
+
+Usage:
+    python mips_profiler.py [--top N] [--collapsed FILE] [--max-steps N] FILE
+"""
+
+import argparse
+
+from Mips_Simulator import TRACE_OFF, Assembler, LabelIndex, MIPSProcessor, instruction_name
+
+# How the last instruction of a block moves the shadow call stack
+CALL, RETURN = 1, 2
+
+
+class Profiler:
+    """Per-PC, per-block and per-call-stack instruction counts for a processor.
+
+    Once attached, every untraced MIPSProcessor.run() goes through
+    Profiler.run. Counts accumulate across runs until reset() is called.
+    """
+
+    def __init__(self):
+        self.labels = LabelIndex({})
+        self.reset()
+
+    def reset(self):
+        self.block_counts = {}  # Block start -> times entered
+        self.block_ends = {}  # Block start -> end address (exclusive)
+        self.step_counts = {}  # pc -> executions outside whole blocks (budget-limited tails, blocks left early)
+        self.stack_counts = {}  # Tuple of frame names -> instructions executed with that stack
+        self.stack = ()
+        self.transfers = {}  # Block start -> CALL / RETURN / None for its last instruction
+
+    def attach(self, processor):
+        """Profile a processor's runs; frames are named after its label_map."""
+        self.labels = LabelIndex(processor.label_map)
+        if not self.stack:
+            self.stack = (self.labels.describe(processor.pc),)
+        processor.profiler = self
+        return self
+
+    def transfer(self, decoded):
+        name = instruction_name(decoded)
+        if name == 'jal':
+            return CALL
+        if name == 'jr' and decoded.rs == 31:
+            return RETURN
+        return None
+
+    def move_stack(self, transfer, next_pc):
+        if transfer == CALL:
+            self.stack += (self.labels.describe(next_pc),)
+        elif transfer == RETURN and len(self.stack) > 1:
+            self.stack = self.stack[:-1]
+
+    def run(self, processor, max_steps=None):
+        """Execute like MIPSProcessor.run_blocks while recording profile counts."""
+        text_start, text_end = processor.text_start, processor.text_end
+        block_cache, decoded_cache = processor.block_cache, processor.decoded_cache
+        registers, memory = processor.registers, processor.memory
+        block_counts, stack_counts, transfers = self.block_counts, self.stack_counts, self.transfers
+        steps = 0
+        while text_start <= processor.pc < text_end:
+            start = processor.pc
+            block = block_cache.get(start)
+            if block is None:
+                block = processor.translate_block(start)
+            if self.block_ends.get(start) != block.end:
+                self.block_ends[start] = block.end
+                transfers[start] = self.transfer(decoded_cache[block.end - 4])
+
+            if max_steps is not None and steps + block.length > max_steps:
+                return steps + self.run_steps(processor, max_steps - steps)
+            processor.pc, executed = block.function(processor, registers, memory)
+            steps += executed
+            stack_counts[self.stack] = stack_counts.get(self.stack, 0) + executed
+
+            if executed == block.length:
+                block_counts[start] = block_counts.get(start, 0) + 1
+                if transfers[start]:
+                    self.move_stack(transfers[start], processor.pc)
+            else:  # Left early after a store into the text segment, before the block's own transfer
+                for pc in range(start, start + 4 * executed, 4):
+                    self.step_counts[pc] = self.step_counts.get(pc, 0) + 1
+        return steps
+
+    def run_steps(self, processor, count):
+        """Execute up to count single instructions, profiling each one."""
+        for step in range(count):
+            pc = processor.pc
+            if not processor.text_start <= pc < processor.text_end:
+                return step
+            decoded = processor.decoded_cache.get(pc) or processor.decode_at(pc)
+            processor.run_untraced(1)
+            self.step_counts[pc] = self.step_counts.get(pc, 0) + 1
+            self.stack_counts[self.stack] = self.stack_counts.get(self.stack, 0) + 1
+            self.move_stack(self.transfer(decoded), processor.pc)
+        return count
+
+    def pc_counts(self):
+        """Executions per PC, expanded from the block counts."""
+        counts = dict(self.step_counts)
+        for start, entered in self.block_counts.items():
+            for pc in range(start, self.block_ends[start], 4):
+                counts[pc] = counts.get(pc, 0) + entered
+        return counts
+
+    def label_counts(self):
+        """Executed instructions per enclosing code label."""
+        counts = {}
+        for pc, executed in self.pc_counts().items():
+            label = self.labels.enclosing(pc)
+            counts[label] = counts.get(label, 0) + executed
+        return counts
+
+    def report(self, top=20):
+        """Hot spots as a dict: the top PCs, blocks and labels by executed instructions."""
+        pc_counts = self.pc_counts()
+        blocks = sorted(self.block_counts.items(),
+                        key=lambda item: -item[1] * (self.block_ends[item[0]] - item[0]))
+        return {
+            'instructions': sum(pc_counts.values()),
+            'labels': {str(label): count for label, count in
+                       sorted(self.label_counts().items(), key=lambda item: -item[1])},
+            'pcs': [{'pc': pc, 'location': self.labels.describe(pc), 'count': count}
+                    for pc, count in sorted(pc_counts.items(), key=lambda item: -item[1])[:top]],
+            'blocks': [{'start': start, 'location': self.labels.describe(start),
+                        'length': (self.block_ends[start] - start) // 4, 'entries': entered}
+                       for start, entered in blocks[:top]],
+        }
+
+    def format_report(self, top=20):
+        """Human-readable version of report()."""
+        report = self.report(top)
+        total = report['instructions'] or 1
+        lines = [f"Instructions: {report['instructions']}", "", f"{'label':<24}{'count':>12}{'share':>9}"]
+        lines += [f"{label:<24}{count:>12}{count / total:>9.2%}" for label, count in report['labels'].items()]
+        lines += ["", f"{'pc':<12}{'location':<24}{'count':>12}"]
+        lines += [f"{entry['pc']:#010x}  {entry['location']:<24}{entry['count']:>12}" for entry in report['pcs']]
+        lines += ["", f"{'block':<12}{'location':<24}{'length':>8}{'entries':>12}"]
+        lines += [f"{entry['start']:#010x}  {entry['location']:<24}{entry['length']:>8}{entry['entries']:>12}"
+                  for entry in report['blocks']]
+        return '\n'.join(lines)
+
+    def collapsed_stacks(self):
+        """Lines of 'frame;frame;frame count' in the collapsed-stack format."""
+        return [f"{';'.join(stack)} {count}" for stack, count in sorted(self.stack_counts.items())]
+
+    def write_collapsed(self, output_file):
+        """Write collapsed stacks for flamegraph.pl, speedscope or similar tools."""
+        with open(output_file, 'w') as file:
+            for line in self.collapsed_stacks():
+                file.write(line + '\n')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Profile a MIPS program.")
+    parser.add_argument('file', help="MIPS source file")
+    parser.add_argument('--top', type=int, default=20, help="Number of hot PCs and blocks to show")
+    parser.add_argument('--collapsed', default=None, help="Write collapsed stacks for flame graphs to this path")
+    parser.add_argument('--max-steps', type=int, default=None, help="Instruction budget")
+    args = parser.parse_args()
+
+    processor = MIPSProcessor.from_image(Assembler().assemble_file(args.file), trace_level=TRACE_OFF)
+    profiler = Profiler().attach(processor)
+    processor.run(args.max_steps)
+    print(profiler.format_report(args.top))
+    if args.collapsed:
+        profiler.write_collapsed(args.collapsed)
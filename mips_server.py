@@ -0,0 +1,326 @@
+"""Asyncio simulation service backed by a warm pool of worker processes.
+
+Clients connect over localhost TCP or a Unix socket and send one JSON object
+per line. Each simulation runs in a worker process that has already imported
+the simulator. Results come back as one JSON line per request, tagged with the
+request's id, in completion order. A client may have many requests in flight
+on one connection.
+
+Request fields (all optional except the program):
+    id          Any JSON value, echoed in the response
+    source      Assembly source text, or
+    image       base64 of a packed object file (see write_packed_object)
+    stdin       Text read by the read syscalls
+    registers   {"$a0": 5, ...} initial register values
+    memory      {"arr" or "0x10010000": word (int) or hex string of bytes}
+    dump        [["arr", 16], ...] memory ranges to return (as hex)
+    max_steps   Instruction budget (capped by the server's --max-steps)
+    timeout     Wall-clock seconds (capped by the server's --timeout)
+    mode        'reference', 'decoded' or 'block'
+
+{"cancel": ID} cancels a queued or running request. A running simulation is
+stopped by killing its worker, which is replaced straight away. Responses
+carry the fields of mips_batch.result_record, {"cancelled": true}, or an
+"error".
+
+Usage:
+    python mips_server.py [--host HOST] [--port PORT | --socket PATH] [-j WORKERS]
+                          [--max-pending N] [--max-steps N] [--timeout SECONDS] [--cache DIR]
+"""
+
+import argparse
+import asyncio
+import base64
+import io
+import json
+import multiprocessing
+import os
+import signal
+import socket
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from Mips_Simulator import EXEC_BLOCK, EXEC_DECODED, EXEC_REFERENCE, Assembler, parse_packed_object
+from mips_asm_cache import AssemblyCache
+from mips_batch import SimulationJob, result_record, run_simulation
+
+EXECUTION_MODES = (EXEC_REFERENCE, EXEC_DECODED, EXEC_BLOCK)
+# Seconds past a request's timeout before its worker is killed instead of left to stop itself
+KILL_GRACE = 2.0
+MAX_REQUEST_BYTES = 16 * 1024 * 1024  # Longest accepted request line
+
+Worker = namedtuple('Worker', ['process', 'connection'])
+
+# Workers are spawned fresh rather than forked from the (threaded) event-loop process
+CONTEXT = multiprocessing.get_context('spawn')
+
+
+def parse_location(location):
+    """An address from a numeric string ('0x10010000'), or the string itself as a data label."""
+    if isinstance(location, int):
+        return location
+    try:
+        return int(location, 0)
+    except ValueError:
+        return location
+
+
+def build_job(request, cache=None):
+    """SimulationJob for a request dict whose limits have already been applied (see module docstring)."""
+    if 'source' in request:
+        if cache is not None:
+            image = cache.assemble(request['source'].encode('utf-8'), '<request>')
+        else:
+            image = Assembler().assemble(io.StringIO(request['source']), '<request>')
+    elif 'image' in request:
+        image = parse_packed_object(base64.b64decode(request['image']), '<request>')
+    else:
+        raise ValueError("A request needs 'source' or 'image'.")
+    memory = {parse_location(location): value if isinstance(value, int) else bytes.fromhex(value)
+              for location, value in (request.get('memory') or {}).items()}
+    ranges = [(parse_location(location), length) for location, length in request.get('dump') or ()]
+    return SimulationJob(image, request.get('registers'), memory, request.get('max_steps'), request.get('timeout'),
+                         ranges, request.get('id'), request.get('stdin') or '')
+
+
+def simulate(request, cache=None):
+    """Result record for one request; runs inside a worker process."""
+    try:
+        job = build_job(request, cache)
+    except (ValueError, KeyError, TypeError, AttributeError) as error:
+        return {'error': f"{type(error).__name__}: {error}"}
+    return result_record(run_simulation(job, request['mode']))
+
+
+def worker_main(connection, cache_dir):
+    """Worker process loop: answer requests from the pipe until it is closed."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl-C reaches the whole process group; the server shuts us down
+    cache = AssemblyCache(cache_dir) if cache_dir else None
+    while True:
+        try:
+            request = connection.recv()
+        except EOFError:
+            return
+        connection.send(simulate(request, cache))
+
+
+class WorkerPool:
+    """Worker processes started ahead of time, each running one simulation at a time."""
+
+    def __init__(self, size, cache_dir=None):
+        self.size = size
+        self.cache_dir = cache_dir
+        self.idle = None  # asyncio.Queue of Workers, created by start()
+        self.workers = set()
+        self.receivers = ThreadPoolExecutor(max_workers=size)  # One blocking recv() per busy worker
+
+    def spawn(self):
+        parent, child = CONTEXT.Pipe()
+        process = CONTEXT.Process(target=worker_main, args=(child, self.cache_dir), daemon=True)
+        process.start()
+        child.close()
+        worker = Worker(process, parent)
+        self.workers.add(worker)
+        return worker
+
+    def replace(self, worker):
+        """Kill a worker (busy with a cancelled or overdue request, or dead) and start another."""
+        worker.process.kill()
+        worker.process.join()
+        worker.connection.close()
+        self.workers.discard(worker)
+        return self.spawn()
+
+    async def start(self):
+        self.idle = asyncio.Queue()
+        for _ in range(self.size):
+            self.idle.put_nowait(self.spawn())
+
+    async def run(self, request, timeout=None):
+        """Run a request on the next idle worker; raises on cancellation, timeout or a dead worker."""
+        worker = await self.idle.get()
+        try:
+            worker.connection.send(request)
+            receive = asyncio.get_running_loop().run_in_executor(self.receivers, worker.connection.recv)
+            return await asyncio.wait_for(receive, timeout)
+        except BaseException:
+            worker = self.replace(worker)
+            raise
+        finally:
+            self.idle.put_nowait(worker)
+
+    def close(self):
+        """Stop every worker; busy ones are killed, which also releases their receiving threads."""
+        for worker in self.workers:
+            worker.process.kill()
+        for worker in self.workers:
+            worker.process.join()
+            worker.connection.close()
+        self.workers.clear()
+        self.receivers.shutdown()
+
+
+class SimulationServer:
+    """Reads JSON-lines requests from each connection and answers them through a WorkerPool."""
+
+    def __init__(self, pool, max_pending=64, max_steps=10000000, timeout=10.0, execution_mode=EXEC_DECODED):
+        self.pool = pool
+        self.max_pending = max_pending  # Requests queued or running, across all connections
+        self.max_steps = max_steps
+        self.timeout = timeout
+        self.execution_mode = execution_mode
+        self.pending = 0
+
+    def limited(self, request):
+        """The request with its budget, timeout and mode clamped to the server's limits.
+
+        Raises ValueError for an unknown mode, a max_steps that is not a
+        non-negative integer or a timeout that is not a non-negative number.
+        """
+        mode = request.get('mode') or self.execution_mode
+        if mode not in EXECUTION_MODES:
+            raise ValueError(f"Unknown execution mode '{mode}'.")
+        max_steps = request.get('max_steps')
+        timeout = request.get('timeout')
+        if max_steps is not None and (type(max_steps) is not int or max_steps < 0):
+            raise ValueError(f"max_steps must be a non-negative integer, not {max_steps!r}.")
+        if timeout is not None and (type(timeout) not in (int, float) or not timeout >= 0):
+            raise ValueError(f"timeout must be a non-negative number, not {timeout!r}.")
+        return dict(request, mode=mode,
+                    max_steps=self.max_steps if max_steps is None else min(max_steps, self.max_steps),
+                    timeout=self.timeout if timeout is None else min(timeout, self.timeout))
+
+    async def handle_connection(self, reader, writer):
+        tasks = {}  # JSON-encoded request id -> task, for cancellation
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:  # Longer than MAX_REQUEST_BYTES
+                    await self.send(writer, {'id': None, 'error': "Request too large."})
+                    break
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("a request must be a JSON object")
+                except ValueError as error:
+                    await self.send(writer, {'id': None, 'error': f"Bad request: {error}"})
+                    continue
+                if 'cancel' in request:
+                    task = tasks.get(json.dumps(request['cancel']))
+                    if task is not None:
+                        task.cancel()
+                    continue
+                key = json.dumps(request.get('id'))
+                if key in tasks:
+                    await self.send(writer, {'id': request.get('id'),
+                                             'error': "A request with this id is already in flight."})
+                    continue
+                task = tasks[key] = asyncio.create_task(self.serve(request, writer))
+                task.add_done_callback(lambda done, key=key, request_id=request.get('id'):
+                                       self.finished(tasks, key, done, request_id, writer))
+        except (ConnectionError, asyncio.CancelledError):
+            pass  # Client gone, or the server is shutting down
+        finally:
+            for task in list(tasks.values()):
+                task.cancel()  # The client is gone; free its workers
+            writer.close()
+
+    def finished(self, tasks, key, task, request_id, writer):
+        """Forget a connection's finished task; answer for one cancelled before serve() started."""
+        if tasks.get(key) is task:
+            del tasks[key]
+        if task.cancelled():
+            asyncio.ensure_future(self.send(writer, {'id': request_id, 'cancelled': True}))
+
+    async def serve(self, request, writer):
+        """Run one request and write its response."""
+        response = {'id': request.get('id')}
+        if self.pending >= self.max_pending:
+            response['error'] = "Server busy."
+            await self.send(writer, response)
+            return
+        self.pending += 1
+        try:
+            request = self.limited(request)
+            response.update(await self.pool.run(request, request['timeout'] + KILL_GRACE))
+        except asyncio.CancelledError:
+            response['cancelled'] = True
+        except asyncio.TimeoutError:
+            response.update(timed_out=True, error="Killed after exceeding the time limit.")
+        except (ValueError, TypeError) as error:
+            response['error'] = f"{type(error).__name__}: {error}"
+        except (EOFError, OSError) as error:
+            response['error'] = f"Worker failed: {type(error).__name__}: {error}"
+        finally:
+            self.pending -= 1
+        await self.send(writer, response)
+
+    async def send(self, writer, response):
+        if writer.is_closing():
+            return
+        writer.write(json.dumps(response).encode('utf-8') + b'\n')
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+
+def submit(request, host='127.0.0.1', port=8765, socket_path=None):
+    """Blocking client helper: send one request and return its decoded response."""
+    if socket_path is not None:
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(socket_path)
+    else:
+        connection = socket.create_connection((host, port))
+    with connection, connection.makefile('rwb') as stream:
+        stream.write(json.dumps(request).encode('utf-8') + b'\n')
+        stream.flush()
+        return json.loads(stream.readline())
+
+
+async def run_server(args):
+    try:  # Shut down cleanly on SIGTERM as well as Ctrl-C
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    except NotImplementedError:
+        pass  # No signal handlers in Windows event loops
+    pool = WorkerPool(args.jobs, args.cache)
+    await pool.start()
+    server = SimulationServer(pool, args.max_pending, args.max_steps, args.timeout, args.mode)
+    if args.socket:
+        listener = await asyncio.start_unix_server(server.handle_connection, path=args.socket,
+                                                   limit=MAX_REQUEST_BYTES)
+        where = args.socket
+    else:
+        listener = await asyncio.start_server(server.handle_connection, args.host, args.port,
+                                              limit=MAX_REQUEST_BYTES)
+        where = f"{args.host}:{args.port}"
+    print(f"Serving on {where} with {args.jobs} workers.", flush=True)
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        pool.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve MIPS simulations over a local socket.")
+    parser.add_argument('--host', default='127.0.0.1', help="TCP address to listen on")
+    parser.add_argument('--port', type=int, default=8765, help="TCP port to listen on")
+    parser.add_argument('--socket', default=None, help="Listen on this Unix socket path instead of TCP")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                        help="Worker processes, i.e. simulations run at once (default: CPU count)")
+    parser.add_argument('--max-pending', type=int, default=64, help="Queued plus running requests before "
+                                                                   "new ones are refused")
+    parser.add_argument('--max-steps', type=int, default=10000000, help="Largest instruction budget per request")
+    parser.add_argument('--timeout', type=float, default=10.0, help="Largest wall-clock seconds per request")
+    parser.add_argument('--mode', choices=list(EXECUTION_MODES), default=EXEC_DECODED,
+                        help="Default execution mode")
+    parser.add_argument('--cache', default=None, metavar='DIR', help="Assembly cache directory (see mips_asm_cache)")
+    args = parser.parse_args()
+    try:
+        asyncio.run(run_server(args))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
@@ -0,0 +1,296 @@
+"""Lockstep (SIMT) execution of one MIPS program over many independent inputs with NumPy.
+
+Every lane is an independent copy of the machine. Registers are an (N, 32)
+int32 array and lane memory is an (N, bytes) uint8 array. Each step runs the
+instruction at the lowest PC among the lanes still running, for every lane at
+that PC, as a few vector operations. Lanes that took different branches wait
+while the others catch up. Because the lowest PC always goes first, lanes
+reconverge wherever the diverging paths meet again.
+
+Semantics follow MIPSProcessor's handlers, including label-form loads and
+stores relative to the end of the data section. Arithmetic wraps at 32 bits,
+and srl is a logical shift. Each lane sees two memory windows: the data
+section (plus headroom) and the top of the stack below 0x80000000. Accesses
+outside them, including stores into the text segment, raise ValueError.
+The only syscalls are exit and exit2, which halt the lanes that make them.
+
+NumPy is optional for the rest of the simulator and only needed here.
+"""
+
+from Mips_Simulator import (PAGE_SIZE, STACK_POINTER_START, SYSCALL_EXIT, SYSCALL_EXIT2, TRACE_OFF,
+                            MemoryAlignmentError, MIPSProcessor, instruction_name, register_map)
+
+try:
+    import numpy as np
+except ImportError:  # Optional dependency
+    np = None
+
+# End (exclusive) of the per-lane stack window; $sp starts just below it
+STACK_WINDOW_END = (STACK_POINTER_START + PAGE_SIZE) & ~(PAGE_SIZE - 1)
+
+
+def to_int32(value):
+    """A Python int reduced to a signed 32-bit value."""
+    value &= 0xFFFFFFFF
+    return value - (1 << 32) if value & 0x80000000 else value
+
+
+class SIMTProcessor:
+    """Runs one ProgramImage across `lanes` independent register and memory states at once.
+
+    Set up lanes with set_register / write_words / write_bytes, call run(),
+    then read back registers, pc, instruction_count, read_words and
+    read_bytes. All of these are per lane (first axis = lane).
+    """
+
+    def __init__(self, image, lanes, data_size=None, stack_size=8192):
+        if np is None:
+            raise ImportError("SIMTProcessor requires NumPy; install it with 'pip install numpy'.")
+        # Decode once with the scalar processor so both engines share one decoder
+        scalar = MIPSProcessor.from_image(image, trace_level=TRACE_OFF)
+        self.lanes = lanes
+        self.byteorder = image.byteorder
+        self.memory_map = scalar.memory_map
+        self.label_map = scalar.label_map
+        self.current_data_address = scalar.current_data_address
+        self.text_start, self.text_end = scalar.text_start, scalar.text_end
+
+        if data_size is None:  # The data section rounded up to whole pages, plus one page of headroom
+            data_size = ((image.data_end - image.data_start + PAGE_SIZE - 1) // PAGE_SIZE + 1) * PAGE_SIZE
+        self.data_base = image.data_start
+        self.data_size = data_size
+        self.stack_base = STACK_WINDOW_END - stack_size
+        self.stack_size = stack_size
+        self.memory = np.zeros((lanes, data_size + stack_size), dtype=np.uint8)
+        self.memory[:, :len(image.data)] = np.frombuffer(image.data, dtype=np.uint8)
+
+        self.registers = np.zeros((lanes, 32), dtype=np.int32)
+        self.registers[:, 28] = scalar.registers[28]  # $gp
+        self.registers[:, 29] = scalar.registers[29]  # $sp
+        self.pc = np.full(lanes, scalar.pc, dtype=np.int64)
+        self.instruction_count = np.zeros(lanes, dtype=np.int64)
+
+        handlers = {
+            'nop': self._nop, 'add': self._add, 'sub': self._sub, 'and': self._and, 'or': self._or,
+            'slt': self._slt, 'sll': self._sll, 'mul': self._mul, 'srl': self._srl, 'jr': self._jr,
+            'lw': self._lw, 'sw': self._sw, 'lh': self._lh, 'lhu': self._lhu, 'sh': self._sh,
+            'lb': self._lb, 'lbu': self._lbu, 'sb': self._sb, 'lui': self._lui, 'addi': self._addi,
+            'beq': self._beq, 'bne': self._bne, 'slti': self._slti, 'andi': self._andi, 'ori': self._ori,
+            'xori': self._xori, 'j': self._j, 'jal': self._jal, 'syscall': self._syscall,
+        }
+        # One (handler, decoded) pair per text word
+        self.program = [(handlers[instruction_name(scalar.decoded_cache[address])], scalar.decoded_cache[address])
+                        for address in range(self.text_start, self.text_end, 4)]
+
+    @property
+    def halted(self):
+        """Boolean array: lanes whose PC has left the text segment."""
+        return (self.pc < self.text_start) | (self.pc >= self.text_end)
+
+    def run(self, max_steps=None):
+        """Run every lane until it leaves the text segment or executes max_steps instructions.
+
+        Returns the number of vector steps taken (one per distinct PC visit).
+        """
+        pc, counts = self.pc, self.instruction_count
+        steps = 0
+        while True:
+            running = (pc >= self.text_start) & (pc < self.text_end)
+            if max_steps is not None:
+                running &= counts < max_steps
+            if not running.any():
+                return steps
+            current = int(pc[running].min())
+            rows = np.flatnonzero(running & (pc == current))
+            handler, decoded = self.program[(current - self.text_start) >> 2]
+            pc[rows] = current + 4  # Move to the next instruction by default
+            handler(rows, decoded, current)
+            counts[rows] += 1
+            steps += 1
+
+    # Lane state access
+
+    def register_index(self, register):
+        return register if isinstance(register, int) else int(register_map[register], 2)
+
+    def set_register(self, register, values):
+        """Set a register (name such as '$a0' or index) in every lane from a scalar or an (N,) array."""
+        values = np.broadcast_to(np.asarray(values, dtype=np.int64), (self.lanes,))
+        self.registers[:, self.register_index(register)] = (values & 0xFFFFFFFF).astype(np.uint32).view(np.int32)
+
+    def resolve(self, location):
+        """An integer address, or the address of a memory_map label."""
+        if isinstance(location, str):
+            if location not in self.memory_map:
+                raise ValueError(f"Undefined label '{location}' in the .data section.")
+            return self.memory_map[location]
+        return location
+
+    def write_words(self, location, values):
+        """Write one word per lane, or an (N, k) array of k consecutive words per lane."""
+        values = np.asarray(values, dtype=np.int64)
+        if values.ndim < 2:
+            values = np.broadcast_to(values, (self.lanes,))[:, None]
+        rows = np.arange(self.lanes)
+        base = self.resolve(location)
+        for column in range(values.shape[1]):
+            self.store(rows, np.full(self.lanes, base + 4 * column, dtype=np.int64), values[:, column], 4)
+
+    def read_words(self, location, count=1):
+        """An (N, count) int32 array of consecutive words in every lane."""
+        rows = np.arange(self.lanes)
+        base = self.resolve(location)
+        return np.stack([self.load(rows, np.full(self.lanes, base + 4 * column, dtype=np.int64), 4, True)
+                         for column in range(count)], axis=1)
+
+    def write_bytes(self, location, data):
+        """Write the same bytes to every lane, or an (N, length) uint8 array of per-lane bytes."""
+        data = np.frombuffer(data, dtype=np.uint8) if isinstance(data, (bytes, bytearray)) else np.asarray(data)
+        data = np.broadcast_to(data, (self.lanes, data.shape[-1]))
+        start = self.offsets(np.array([self.resolve(location)], dtype=np.int64), data.shape[1])[0]
+        self.memory[:, start:start + data.shape[1]] = data
+
+    def read_bytes(self, location, length):
+        """An (N, length) uint8 array of bytes from every lane."""
+        start = self.offsets(np.array([self.resolve(location)], dtype=np.int64), length)[0]
+        return self.memory[:, start:start + length].copy()
+
+    # Memory windows
+
+    def offsets(self, addresses, size):
+        """Column offsets in self.memory for lane addresses; raises for unaligned or unmapped accesses."""
+        addresses = addresses & 0xFFFFFFFF
+        if size in (2, 4) and (addresses & (size - 1)).any():
+            address = int(addresses[(addresses & (size - 1)) != 0][0])
+            raise MemoryAlignmentError(f"Unaligned {size}-byte access at address {hex(address)}.")
+        in_data = (addresses >= self.data_base) & (addresses + size <= self.data_base + self.data_size)
+        in_stack = (addresses >= self.stack_base) & (addresses + size <= STACK_WINDOW_END)
+        mapped = in_data | in_stack
+        if not mapped.all():
+            address = int(addresses[~mapped][0])
+            raise ValueError(f"Lane memory access at {hex(address)} is outside the data and stack windows.")
+        return np.where(in_data, addresses - self.data_base, addresses - self.stack_base + self.data_size)
+
+    def shifts(self, size):
+        if self.byteorder == 'big':
+            return np.arange(8 * (size - 1), -1, -8, dtype=np.uint32)
+        return np.arange(0, 8 * size, 8, dtype=np.uint32)
+
+    def load(self, rows, addresses, size, signed):
+        columns = self.offsets(addresses, size)[:, None] + np.arange(size)
+        data = self.memory[rows[:, None], columns].astype(np.uint32)
+        value = np.bitwise_or.reduce(data << self.shifts(size), axis=1)
+        if size == 4:
+            return value.view(np.int32)
+        if signed:
+            sign = np.uint32(1 << (8 * size - 1))
+            return (value.astype(np.int64) - ((value & sign).astype(np.int64) << 1)).astype(np.int32)
+        return value.astype(np.int32)
+
+    def store(self, rows, addresses, values, size):
+        columns = self.offsets(addresses, size)[:, None] + np.arange(size)
+        values = np.asarray(values, dtype=np.int64) & 0xFFFFFFFF
+        self.memory[rows[:, None], columns] = ((values[:, None] >> self.shifts(size)) & 0xFF).astype(np.uint8)
+
+    def effective_address(self, rows, rs, immediate):
+        """Per-lane load/store addresses, as in MIPSProcessor.effective_address."""
+        if rs:
+            return (self.registers[rows, rs].astype(np.int64) + immediate) & 0xFFFFFFFF
+        return np.full(len(rows), self.current_data_address - immediate, dtype=np.int64)
+
+    # Vector handlers: each takes (rows, decoded, pc) and mirrors MIPSProcessor._exec_<name>
+
+    def _nop(self, rows, d, pc):
+        pass
+
+    def _add(self, rows, d, pc):
+        self.registers[rows, d.rd] = self.registers[rows, d.rs] + self.registers[rows, d.rt]
+
+    def _sub(self, rows, d, pc):
+        self.registers[rows, d.rd] = self.registers[rows, d.rs] - self.registers[rows, d.rt]
+
+    def _and(self, rows, d, pc):
+        self.registers[rows, d.rd] = self.registers[rows, d.rs] & self.registers[rows, d.rt]
+
+    def _or(self, rows, d, pc):
+        self.registers[rows, d.rd] = self.registers[rows, d.rs] | self.registers[rows, d.rt]
+
+    def _slt(self, rows, d, pc):
+        self.registers[rows, d.rd] = self.registers[rows, d.rs] < self.registers[rows, d.rt]
+
+    def _sll(self, rows, d, pc):
+        self.registers[rows, d.rd] = (self.registers[rows, d.rt].view(np.uint32) << np.uint32(d.shamt)).view(np.int32)
+
+    def _mul(self, rows, d, pc):
+        product = self.registers[rows, d.rs].astype(np.int64) * self.registers[rows, d.rt]
+        self.registers[rows, d.rd] = (product & 0xFFFFFFFF).astype(np.uint32).view(np.int32)
+
+    def _srl(self, rows, d, pc):
+        self.registers[rows, d.rd] = (self.registers[rows, d.rt].view(np.uint32) >> np.uint32(d.shamt)).view(np.int32)
+
+    def _jr(self, rows, d, pc):
+        self.pc[rows] = self.registers[rows, d.rs].view(np.uint32)
+
+    def _lw(self, rows, d, pc):
+        self.registers[rows, d.rt] = self.load(rows, self.effective_address(rows, d.rs, d.imm), 4, True)
+
+    def _sw(self, rows, d, pc):
+        self.store(rows, self.effective_address(rows, d.rs, d.imm), self.registers[rows, d.rt], 4)
+
+    def _lh(self, rows, d, pc):
+        self.registers[rows, d.rt] = self.load(rows, self.effective_address(rows, d.rs, d.imm), 2, True)
+
+    def _lhu(self, rows, d, pc):
+        self.registers[rows, d.rt] = self.load(rows, self.effective_address(rows, d.rs, d.imm), 2, False)
+
+    def _sh(self, rows, d, pc):
+        self.store(rows, self.effective_address(rows, d.rs, d.imm), self.registers[rows, d.rt], 2)
+
+    def _lb(self, rows, d, pc):
+        self.registers[rows, d.rt] = self.load(rows, self.effective_address(rows, d.rs, d.imm), 1, True)
+
+    def _lbu(self, rows, d, pc):
+        self.registers[rows, d.rt] = self.load(rows, self.effective_address(rows, d.rs, d.imm), 1, False)
+
+    def _sb(self, rows, d, pc):
+        self.store(rows, self.effective_address(rows, d.rs, d.imm), self.registers[rows, d.rt], 1)
+
+    def _lui(self, rows, d, pc):
+        self.registers[rows, d.rt] = to_int32((d.imm & 0xFFFF) << 16)
+
+    def _addi(self, rows, d, pc):
+        self.registers[rows, d.rt] = self.registers[rows, d.rs] + np.int32(d.imm)
+
+    def _beq(self, rows, d, pc):
+        taken = rows[self.registers[rows, d.rs] == self.registers[rows, d.rt]]
+        self.pc[taken] += d.imm * 4
+
+    def _bne(self, rows, d, pc):
+        taken = rows[self.registers[rows, d.rs] != self.registers[rows, d.rt]]
+        self.pc[taken] += d.imm * 4
+
+    def _slti(self, rows, d, pc):
+        self.registers[rows, d.rt] = self.registers[rows, d.rs] < d.imm
+
+    def _andi(self, rows, d, pc):
+        self.registers[rows, d.rt] = self.registers[rows, d.rs] & np.int32(d.imm & 0xFFFF)
+
+    def _ori(self, rows, d, pc):
+        self.registers[rows, d.rt] = self.registers[rows, d.rs] | np.int32(d.imm & 0xFFFF)
+
+    def _xori(self, rows, d, pc):
+        self.registers[rows, d.rt] = self.registers[rows, d.rs] ^ np.int32(d.imm & 0xFFFF)
+
+    def _j(self, rows, d, pc):
+        self.pc[rows] = ((pc + 4) & 0xF0000000) | (d.imm << 2)
+
+    def _jal(self, rows, d, pc):
+        self.registers[rows, 31] = pc + 4
+        self.pc[rows] = ((pc + 4) & 0xF0000000) | (d.imm << 2)
+
+    def _syscall(self, rows, d, pc):
+        """Only the exit syscalls are supported: those lanes halt; there is no per-lane console."""
+        codes = self.registers[rows, 2]
+        if not np.isin(codes, (SYSCALL_EXIT, SYSCALL_EXIT2)).all():
+            raise ValueError(f"Unsupported syscall in lockstep execution at {hex(pc)}; only exit is available.")
+        self.pc[rows] = self.text_end
@@ -0,0 +1,52 @@
+"""Small MIPS programs and helpers shared by the tests."""
+
+import glob
+import io
+import os
+
+from Mips_Simulator import TRACE_OFF, Assembler, MIPSProcessor
+
+BENCHMARK_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks')
+BENCHMARKS = sorted(glob.glob(os.path.join(BENCHMARK_DIR, '*.s')))
+
+# Copies an instruction over another one with a register-based store, ending a
+# translated block early, then runs the patched code: the addi at 'patched' is
+# replaced by the one after it, so $t3 ends up 5 instead of 1.
+SELF_MODIFYING = """
+.text
+main:
+lui $t0, 64
+lw $t1, 40($t0)
+sw $t1, 36($t0)
+addi $t2, $zero, 3
+loop:
+addi $t2, $t2, -1
+bne $t2, $zero, loop
+addi $t4, $zero, 7
+sw $t4, 0($sp)
+lw $t5, 0($sp)
+patched:
+addi $t3, $zero, 1
+addi $t3, $zero, 5
+"""
+
+
+def assemble(source):
+    return Assembler().assemble(io.StringIO(source), '<test>')
+
+
+def assemble_file(path):
+    return Assembler().assemble_file(path)
+
+
+def run_image(image, execution_mode, max_steps=None):
+    """An untraced processor that has run an image for up to max_steps instructions."""
+    processor = MIPSProcessor.from_image(image, trace_level=TRACE_OFF, execution_mode=execution_mode)
+    processor.run(max_steps)
+    return processor
+
+
+def machine_state(processor):
+    """Everything a run can change: registers, PC, step count and nonzero memory words."""
+    return (list(processor.registers), processor.pc, processor.instruction_count,
+            list(processor.memory.nonzero_words()))
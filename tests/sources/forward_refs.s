@@ -0,0 +1,25 @@
+# Forward branches, jumps and calls, label-form loads/stores, la, and
+# immediates at the edges of their fields
+.data
+first: .word 1, 2, 3
+later: .word 77
+message: .asciiz "tab\there\n"
+.text
+main:
+    la $a0, later
+    lw $t0, later
+    sw $t0, first
+    lb $t4, message
+    beq $t0, $zero, end
+    jal func
+    bne $t1, $zero, end
+    j main
+func:
+    addi $t1, $t0, -1
+    li $t2, -32768
+    lui $t3, 4097
+    ori $t3, $t3, 65535
+    sll $t3, $t3, 4
+    jr $ra
+end:
+    nop
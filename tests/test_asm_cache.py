@@ -0,0 +1,75 @@
+import os
+
+import mips_asm_cache
+from Mips_Simulator import Assembler
+from mips_asm_cache import AssemblyCache
+from programs import BENCHMARKS
+
+SOURCE = b".data\nvalue: .word 5\n.text\nmain:\nlw $t0, value\naddi $t0, $t0, 1\n"
+
+
+def test_hits_return_the_assembled_image(tmp_path):
+    cache = AssemblyCache(str(tmp_path))
+    first = cache.assemble(SOURCE, 'program.s')
+    second = cache.assemble(SOURCE, 'program.s')
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert first == second
+    assert len(cache.entries()) == 1
+
+    other = AssemblyCache(str(tmp_path))  # Another process sharing the directory
+    assert other.assemble(SOURCE) == first and other.hits == 1
+
+
+def test_files_go_through_the_cache(tmp_path):
+    cache = AssemblyCache(str(tmp_path / 'cache'))
+    for path in BENCHMARKS:
+        assert cache.assemble_file(path) == Assembler().assemble_file(path)
+    for path in BENCHMARKS:
+        cache.assemble_file(path)
+    assert (cache.hits, cache.misses) == (len(BENCHMARKS), len(BENCHMARKS))
+
+
+def test_source_changes_miss(tmp_path):
+    cache = AssemblyCache(str(tmp_path))
+    cache.assemble(SOURCE)
+    edited = cache.assemble(SOURCE.replace(b'5', b'6'))
+    assert cache.misses == 2 and len(cache.entries()) == 2
+    assert edited.data != cache.assemble(SOURCE).data
+
+
+def test_assembler_version_and_byte_order_change_the_key(tmp_path, monkeypatch):
+    cache = AssemblyCache(str(tmp_path))
+    key = cache.key(SOURCE)
+    assert AssemblyCache(str(tmp_path), byteorder='little').key(SOURCE) != key
+    cache.assemble(SOURCE)
+    monkeypatch.setattr(mips_asm_cache, 'ASSEMBLER_VERSION', mips_asm_cache.ASSEMBLER_VERSION + 1)
+    assert cache.key(SOURCE) != key
+    cache.assemble(SOURCE)
+    assert (cache.hits, cache.misses) == (0, 2)
+
+
+def test_corrupt_entries_are_replaced(tmp_path):
+    cache = AssemblyCache(str(tmp_path))
+    image = cache.assemble(SOURCE)
+    path = cache.path(cache.key(SOURCE))
+    with open(path, 'r+b') as file:
+        file.truncate(20)
+    assert cache.assemble(SOURCE) == image
+    assert cache.misses == 2
+    assert cache.get(cache.key(SOURCE)) == image
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = AssemblyCache(str(tmp_path))
+    sources = [SOURCE.replace(b'5', str(value).encode()) for value in range(3)]
+    for age, source in enumerate(sources):
+        cache.assemble(source)
+        os.utime(cache.path(cache.key(source)), (1000 + age, 1000 + age))
+    cache.assemble(sources[0])  # A hit makes the oldest entry the most recently used
+    size = os.path.getsize(cache.path(cache.key(sources[0])))
+    cache.max_bytes = 2 * size
+    cache.evict()
+    assert sorted(path for _, _, path in cache.entries()) == sorted(cache.path(cache.key(source))
+                                                                    for source in (sources[0], sources[2]))
+    cache.clear()
+    assert cache.entries() == []
@@ -0,0 +1,77 @@
+"""The single-pass assembler against object files written by the earlier two-pass assembler.
+
+tests/golden holds, for every benchmark and tests/sources program, the
+text object and the big- and little-endian packed objects produced by
+translate_mips_to_binary before the assembler became single-pass (the
+Mips_Simulator.py of commit a9f08de).
+"""
+
+import glob
+import io
+import os
+
+import pytest
+
+from Mips_Simulator import AssemblyError, Assembler, translate_mips_to_binary, write_packed_object
+from programs import BENCHMARKS
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCES = BENCHMARKS + sorted(glob.glob(os.path.join(TEST_DIR, 'sources', '*.s')))
+
+
+def golden(source, suffix):
+    name = os.path.splitext(os.path.basename(source))[0]
+    with open(os.path.join(TEST_DIR, 'golden', f'{name}.{suffix}'), 'rb') as file:
+        return file.read()
+
+
+def read(path):
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+@pytest.mark.parametrize('source', SOURCES)
+@pytest.mark.parametrize('byteorder', ['big', 'little'])
+def test_packed_objects_match_the_two_pass_assembler(tmp_path, source, byteorder):
+    expected = golden(source, f'{byteorder}.bin')
+    streamed = str(tmp_path / 'streamed.bin')
+    assert translate_mips_to_binary(source, streamed, 'packed', byteorder, return_image=False) > 0
+    assert read(streamed) == expected
+
+    in_memory = str(tmp_path / 'in_memory.bin')
+    write_packed_object(in_memory, Assembler(byteorder).assemble_file(source))
+    assert read(in_memory) == expected
+
+
+@pytest.mark.parametrize('source', SOURCES)
+def test_text_objects_match_the_two_pass_assembler(tmp_path, source):
+    output = str(tmp_path / 'program.txt')
+    image = translate_mips_to_binary(source, output)
+    assert read(output) == golden(source, 'txt')
+    assert ''.join(line + '\n' for line in image.binary_instructions()).encode('ascii') == golden(source, 'txt')
+
+
+def test_data_defined_after_use_is_backpatched():
+    source = read(os.path.join(TEST_DIR, 'sources', 'forward_refs.s')).decode('utf-8')
+    data_first = Assembler().assemble(io.StringIO(source))
+    head, text = source.split('.text\n')
+    data_last = Assembler().assemble(io.StringIO('.text\n' + text + head))
+    assert data_last.text == data_first.text
+    assert data_last.data == data_first.data
+    assert dict(data_last.memory_map) == dict(data_first.memory_map)
+    assert dict(data_last.label_map) == dict(data_first.label_map)
+
+
+def test_undefined_label_reports_its_line(tmp_path):
+    source = ".text\nmain:\nbeq $t0, $t1, main\nj nowhere\n"
+    with pytest.raises(AssemblyError) as error:
+        Assembler().assemble(io.StringIO(source), 'undefined.s')
+    assert error.value.line_number == 4
+    assert 'nowhere' in str(error.value)
+
+    output = str(tmp_path / 'undefined.bin')
+    source_file = tmp_path / 'undefined.s'
+    source_file.write_text(source)
+    with pytest.raises(AssemblyError):
+        translate_mips_to_binary(str(source_file), output, 'packed', return_image=False)
+    assert not os.path.exists(output)
@@ -0,0 +1,124 @@
+import json
+import os
+
+import pytest
+
+import mips_batch
+from Mips_Simulator import Assembler, read_packed_object
+from mips_batch import SimulationJob, assemble_batch, assemble_one, build_parser, run_simulation
+from programs import BENCHMARKS, assemble
+
+PRINT_THEN_LOOP = """
+.text
+main:
+li $a0, 7
+li $v0, 1
+syscall
+loop:
+j loop
+"""
+
+
+@pytest.mark.parametrize('max_steps', [-1, 1.5, '10', True])
+def test_invalid_budgets_are_rejected(max_steps):
+    with pytest.raises(ValueError):
+        run_simulation(SimulationJob(assemble(PRINT_THEN_LOOP), max_steps=max_steps))
+
+
+def test_invalid_timeout_is_rejected():
+    with pytest.raises(ValueError):
+        run_simulation(SimulationJob(assemble(PRINT_THEN_LOOP), timeout=-1))
+
+
+def test_cli_rejects_negative_budget():
+    with pytest.raises(SystemExit):
+        build_parser().parse_args(['simulate', '--max-steps', '-5', 'program.s'])
+
+
+def test_budget_stops_an_endless_program():
+    result = run_simulation(SimulationJob(assemble(PRINT_THEN_LOOP), max_steps=100))
+    assert result.error is None
+    assert result.instruction_count == 100
+    assert not result.halted
+    assert result.output == '7'
+
+
+def test_output_is_flushed_when_the_job_fails():
+    result = run_simulation(SimulationJob(assemble(PRINT_THEN_LOOP), max_steps=10, memory_ranges=[('missing', 4)]))
+    assert result.error is not None
+    assert result.output == '7'
+
+
+def write_sources(directory):
+    """The benchmarks plus one source with an undefined label on line 3, all copied into directory."""
+    paths = []
+    for path in BENCHMARKS:
+        copy = directory / os.path.basename(path)
+        with open(path) as file:
+            copy.write_text(file.read())
+        paths.append(str(copy))
+    bad = directory / 'bad.s'
+    bad.write_text(".text\nmain:\nj nowhere\n")
+    return paths, str(bad)
+
+
+def test_batch_assembly_reports_each_file(tmp_path):
+    sources, bad = write_sources(tmp_path)
+    results = {result.input_file: result
+               for result in assemble_batch(sources + [bad], str(tmp_path / 'out'), 'packed', max_workers=2)}
+    assert set(results) == set(sources + [bad])
+    for source in sources:
+        result = results[source]
+        assert result.error is None
+        assert result.image == Assembler().assemble_file(source)
+        assert read_packed_object(result.output_file) == result.image
+    assert results[bad].image is None
+    assert results[bad].error == f"AssemblyError: {bad}:3: Undefined label 'nowhere' in the .text section."
+    assert not os.path.exists(results[bad].output_file)
+
+
+def test_assemble_one_reports_missing_files(tmp_path):
+    result = assemble_one(str(tmp_path / 'missing.s'))
+    assert result.image is None and result.error.startswith('FileNotFoundError')
+
+
+def test_assembler_state_is_per_instance():
+    first, second = BENCHMARKS[:2]
+    expected = Assembler().assemble_file(first)
+    Assembler().assemble_file(second)
+    assembler = Assembler()
+    assert assembler.assemble_file(first) == expected
+    assert Assembler().assemble_file(second) != expected
+
+
+def test_assemble_command_writes_a_report(tmp_path, capsys):
+    sources, bad = write_sources(tmp_path)
+    report = tmp_path / 'report.json'
+    args = build_parser().parse_args(['assemble', '-j', '1', '-o', str(tmp_path / 'out'), '--report', str(report),
+                                      *sources, bad])
+    assert args.handler(args) == 1
+    entries = {entry['input']: entry for entry in json.loads(report.read_text())}
+    assert [source for source, entry in entries.items() if entry['error']] == [bad]
+    assert all(os.path.exists(entries[source]['output']) for source in sources)
+    assert f"{len(sources)} assembled, 1 failed." in capsys.readouterr().out
+
+
+def test_failed_jobs_close_syscalls_once_and_keep_output(monkeypatch):
+    closes = []
+
+    class CountingSystemCalls(mips_batch.SystemCalls):
+        def close(self):
+            closes.append(self)
+            super().close()
+
+    monkeypatch.setattr(mips_batch, 'SystemCalls', CountingSystemCalls)
+    failing = assemble(".text\nli $a0, 7\nli $v0, 1\nsyscall\nli $v0, 99\nsyscall\n")
+    result = run_simulation(SimulationJob(failing))
+    assert result.error == "ValueError: Unsupported syscall 99 at 0x400010."
+    assert result.output == '7'  # Buffered output is flushed before it is captured
+    assert (result.halted, result.timed_out, result.memory) == (False, False, {})
+    assert len(closes) == 1
+
+    result = run_simulation(SimulationJob(assemble(PRINT_THEN_LOOP), max_steps=10))
+    assert result.error is None and result.output == '7'
+    assert len(closes) == 2
@@ -0,0 +1,76 @@
+import json
+
+from Mips_Simulator import Assembler
+from mips_bench import EXECUTION_MODES, compare, generate_source, main
+
+LOOP = """
+.text
+main:
+addi $t0, $zero, 50
+loop:
+addi $t0, $t0, -1
+bne $t0, $zero, loop
+"""
+
+RESULT_KEYS = {'name', 'unit', 'work', 'best_seconds', 'median_seconds', 'best_rate', 'median_rate',
+               'peak_memory_bytes'}
+
+
+def run_harness(tmp_path, capsys, *extra):
+    workloads = tmp_path / 'workloads'
+    workloads.mkdir(exist_ok=True)
+    (workloads / 'loop.s').write_text(LOOP)
+    output = tmp_path / 'results.json'
+    status = main(['-o', str(output), '--workloads', str(workloads), '--warmup', '0', '--repetitions', '2',
+                   '--assembler-lines', '200', *extra])
+    return status, json.loads(output.read_text()), capsys.readouterr().out
+
+
+def test_results_schema(tmp_path, capsys):
+    status, results, printed = run_harness(tmp_path, capsys)
+    assert status == 0
+    assert set(results) == {'python', 'platform', 'warmup', 'repetitions', 'results'}
+    assert (results['warmup'], results['repetitions']) == (0, 2)
+    entries = {entry['name']: entry for entry in results['results']}
+    assert list(entries) == [f"run/loop/{mode}" for mode in EXECUTION_MODES] + ['assemble/200-lines']
+    for name, entry in entries.items():
+        assert set(entry) == RESULT_KEYS
+        assert 0 < entry['best_seconds'] <= entry['median_seconds']
+        assert entry['best_rate'] >= entry['median_rate'] > 0
+        assert entry['peak_memory_bytes'] > 0
+        assert name in printed
+    for mode in EXECUTION_MODES:
+        assert entries[f"run/loop/{mode}"]['unit'] == 'instructions/s'
+        assert entries[f"run/loop/{mode}"]['work'] == 1 + 2 * 50
+    assert entries['assemble/200-lines']['unit'] == 'lines/s'
+    assert entries['assemble/200-lines']['work'] == len(generate_source(200))
+
+
+def test_filter_selects_benchmarks(tmp_path, capsys):
+    _, results, _ = run_harness(tmp_path, capsys, '--filter', 'block')
+    assert [entry['name'] for entry in results['results']] == ['run/loop/block']
+
+
+def test_baseline_regressions_fail_the_run(tmp_path, capsys):
+    _, results, _ = run_harness(tmp_path, capsys, '--filter', 'run/')
+    baseline = tmp_path / 'baseline.json'
+    for entry in results['results']:
+        entry['best_rate'] *= 1000
+    baseline.write_text(json.dumps(results))
+    status, _, printed = run_harness(tmp_path, capsys, '--filter', 'run/', '--baseline', str(baseline))
+    assert status == 1
+    assert printed.count('REGRESSION') == len(EXECUTION_MODES)
+
+
+def test_compare_uses_the_threshold():
+    baseline = {'results': [{'name': 'a', 'best_rate': 100.0}, {'name': 'b', 'best_rate': 100.0}]}
+    results = [{'name': 'a', 'best_rate': 85.0}, {'name': 'b', 'best_rate': 95.0}, {'name': 'c', 'best_rate': 1.0}]
+    regressions = compare(results, baseline, 0.10)
+    assert [name for name, _ in regressions] == ['a']
+    assert abs(regressions[0][1] + 0.15) < 1e-9
+
+
+def test_generated_source_assembles():
+    source = generate_source(400)
+    image = Assembler().assemble(iter(line + '\n' for line in source))
+    assert len(image.text) > 0 and image.memory_map
@@ -0,0 +1,28 @@
+from Mips_Simulator import TRACE_OFF, MIPSProcessor
+from mips_branch import BranchStatistics, StaticNotTaken
+from programs import assemble
+
+# Three branches taken to the very next instruction, then a loop taken 4 times and not taken once
+PROGRAM = """
+.text
+main:
+beq $zero, $zero, next
+next:
+addi $t0, $zero, 1
+bne $t0, $zero, after
+after:
+beq $t0, $t0, loop
+loop:
+addi $t1, $t1, 1
+slti $t2, $t1, 5
+bne $t2, $zero, loop
+"""
+
+
+def test_taken_branch_to_next_instruction_counts_as_taken():
+    processor = MIPSProcessor.from_image(assemble(PROGRAM), trace_level=TRACE_OFF)
+    statistics = BranchStatistics([StaticNotTaken()]).attach(processor)
+    processor.run()
+    assert statistics.branches == 8
+    assert statistics.taken == 7
+    assert statistics.correct[0] == 1  # Not-taken is right only for the loop exit
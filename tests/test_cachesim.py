@@ -0,0 +1,82 @@
+from Mips_Simulator import TRACE_OFF, MIPSProcessor
+from mips_cachesim import Cache, MemoryHierarchy, parse_cache_spec
+from programs import assemble
+
+# Reads eight consecutive words of 'values', then stores one word to 'total'
+SUM_WORDS = """
+.data
+values: .word 1, 2, 3, 4, 5, 6, 7, 8
+total: .word 0
+.text
+la $t0, values
+addi $t1, $zero, 8
+loop:
+lw $t2, 0($t0)
+add $t3, $t3, $t2
+addi $t0, $t0, 4
+addi $t1, $t1, -1
+bne $t1, $zero, loop
+sw $t3, total
+"""
+
+
+def run_accesses(cache, accesses):
+    """Whether each (address, is_write) access hit."""
+    return [cache.access(address, is_write) for address, is_write in accesses]
+
+
+def counts(cache):
+    return dict(zip(('accesses', 'hits', 'misses', 'evictions', 'writebacks'), cache.counters()))
+
+
+def test_direct_mapped_conflicts():
+    cache = Cache('L1', size=64, associativity=1, line_size=16)  # Four sets of one line
+    hits = run_accesses(cache, [(0, False), (64, False), (0, False), (4, False), (16, False)])
+    assert hits == [False, False, False, True, False]  # 0 and 64 share set 0
+    assert counts(cache) == {'accesses': 5, 'hits': 1, 'misses': 4, 'evictions': 2, 'writebacks': 0}
+
+
+def test_set_associative_lru_and_fifo():
+    pattern = [(0, False), (32, False), (0, False), (64, False), (0, False), (32, False)]  # All in set 0
+    lru = Cache('L1', size=64, associativity=2, line_size=16, replacement='lru')
+    # 64 replaces 32, the least recently used, then 32 replaces 64
+    assert run_accesses(lru, pattern) == [False, False, True, False, True, False]
+    assert counts(lru) == {'accesses': 6, 'hits': 2, 'misses': 4, 'evictions': 2, 'writebacks': 0}
+
+    fifo = Cache('L1', size=64, associativity=2, line_size=16, replacement='fifo')
+    assert run_accesses(fifo, pattern) == [False, False, True, False, False, False]  # 64 replaces 0, the oldest fill
+    assert counts(fifo) == {'accesses': 6, 'hits': 1, 'misses': 5, 'evictions': 3, 'writebacks': 0}
+
+
+def test_write_back_evicts_dirty_lines_to_the_next_level():
+    l2 = Cache('L2', size=1024, associativity=4, line_size=16)
+    l1 = Cache('L1', size=32, associativity=1, line_size=16, next_level=l2)  # Two sets of one line
+    assert run_accesses(l1, [(0, True), (4, True), (32, False), (0, False)]) == [False, True, False, False]
+    # Only the written line is written back; 32 is clean when 0 replaces it
+    assert counts(l1) == {'accesses': 4, 'hits': 1, 'misses': 3, 'evictions': 2, 'writebacks': 1}
+    # Fill 0, write back 0 (hit), fill 32, fill 0 again (hit)
+    assert counts(l2) == {'accesses': 4, 'hits': 2, 'misses': 2, 'evictions': 0, 'writebacks': 0}
+    assert l2.dirty.count(1) == 1
+
+
+def test_write_through_does_not_allocate_on_a_write_miss():
+    l2 = Cache('L2', size=1024, associativity=4, line_size=16)
+    l1 = Cache('L1', size=32, associativity=1, line_size=16, write_policy='write-through', next_level=l2)
+    assert run_accesses(l1, [(0, True), (0, False), (0, True), (32, False), (0, False)]) == \
+        [False, False, True, False, False]
+    assert counts(l1) == {'accesses': 5, 'hits': 1, 'misses': 4, 'evictions': 2, 'writebacks': 0}
+    assert l2.accesses == 5  # Two writes passed through and three line fills
+
+
+def test_hierarchy_counts_per_data_label():
+    processor = MIPSProcessor.from_image(assemble(SUM_WORDS), trace_level=TRACE_OFF)
+    hierarchy = MemoryHierarchy(parse_cache_spec('L1I', '256:1:16'), parse_cache_spec('L1D', '256:2:16'))
+    hierarchy.attach(processor)
+    processor.run()
+    report = hierarchy.report()
+    # Eight words over two 16-byte lines; total shares no line with them
+    assert report['per_label']['values']['L1D'] == {'accesses': 8, 'hits': 6, 'misses': 2, 'evictions': 0,
+                                                      'writebacks': 0}
+    assert report['per_label']['total']['L1D']['misses'] == 1
+    assert report['caches']['L1I']['accesses'] == processor.instruction_count
+    assert report['caches']['L1I']['misses'] == 3  # Nine instructions span three 16-byte lines
@@ -0,0 +1,98 @@
+import pytest
+
+from Mips_Simulator import TRACE_OFF, MIPSProcessor
+from mips_debugger import Debugger, DebuggerShell
+from programs import assemble
+
+# Increments counter three times, then reads and writes other once
+COUNTER = """
+.data
+counter: .word 0
+other: .word 0
+.text
+main:
+addi $t0, $zero, 3
+loop:
+lw $t1, counter
+addi $t1, $t1, 1
+sw $t1, counter
+addi $t0, $t0, -1
+bne $t0, $zero, loop
+done:
+lw $t2, other
+sw $t2, other
+"""
+
+
+def debugger(source=COUNTER, budget=1000000):
+    return Debugger(MIPSProcessor.from_image(assemble(source), trace_level=TRACE_OFF), budget)
+
+
+def test_breakpoints_stop_before_the_instruction():
+    session = debugger()
+    processor = session.processor
+    loop = session.add_breakpoint('loop')
+    assert session.cont() == 1
+    assert (processor.pc, processor.stop_reason) == (loop, ('breakpoint', loop))
+    assert session.cont() == 5  # Resumes past the breakpoint it stopped at
+    assert processor.pc == loop and processor.registers[8] == 2
+    session.remove_breakpoint('loop')
+    session.cont()
+    assert processor.halted and processor.stop_reason is None
+    assert processor.instruction_count == 1 + 3 * 5 + 2
+
+
+def test_watchpoints_stop_after_the_access():
+    session = debugger()
+    processor = session.processor
+    counter = processor.memory_map['counter']
+    assert session.watch('counter', kind='w') == (counter, 4)
+    session.cont()
+    store = processor.label_map['loop'] + 8
+    assert processor.stop_reason == ('watchpoint', counter, 'w', store)
+    assert processor.pc == store + 4 and processor.memory.read_word(counter) == 1
+    session.unwatch('counter')
+
+    session.watch('other', kind='r')
+    session.cont()
+    assert processor.stop_reason == ('watchpoint', processor.memory_map['other'], 'r', processor.label_map['done'])
+    assert processor.memory.read_word(counter) == 3
+    assert session.status(0).startswith("Read of other")
+
+
+def test_until_and_step():
+    session = debugger()
+    processor = session.processor
+    assert session.step(2) == 2 and processor.stop_reason is None
+    session.until('done')
+    assert processor.stop_reason == ('until', processor.label_map['done'])
+    assert processor.pc == processor.label_map['done']
+    assert session.current_instruction().startswith("lw $t2")
+
+
+def test_budget_returns_from_an_endless_loop():
+    session = debugger(".text\nmain:\nj main\n", budget=100)
+    assert session.cont() == 100
+    assert not session.processor.halted
+    assert session.status(100) == "Stopped after 100 instructions at main."
+
+
+def test_unknown_locations_and_kinds_are_rejected():
+    session = debugger()
+    with pytest.raises(ValueError):
+        session.add_breakpoint('nowhere')
+    with pytest.raises(ValueError):
+        session.watch('counter', kind='x')
+
+
+def test_shell_commands(capsys):
+    shell = DebuggerShell(debugger())
+    for line in ('break loop', 'continue', 'watch counter 4 w', 'info', 'c', 'break nowhere', 'delete loop', 'c'):
+        shell.onecmd(line)
+    output = capsys.readouterr().out.splitlines()
+    assert output[0] == "Breakpoint at loop."
+    assert output[1] == "Breakpoint at loop."
+    assert any(line.startswith("watch") and "4 bytes (w)" in line for line in output)
+    assert any(line.startswith("Write to counter") for line in output)
+    assert "Error: Unknown label or address 'nowhere'." in output
+    assert output[-2].startswith("Write to counter") and output[-1] == "  loop+12: addi $t0, $t0, -1"
@@ -0,0 +1,55 @@
+import pytest
+
+from Mips_Simulator import EXEC_BLOCK, EXEC_DECODED, EXEC_REFERENCE
+from mips_profiler import Profiler
+from programs import BENCHMARKS, SELF_MODIFYING, assemble, assemble_file, machine_state, run_image
+
+MODES = (EXEC_REFERENCE, EXEC_DECODED, EXEC_BLOCK)
+
+
+def images():
+    yield 'self_modifying', assemble(SELF_MODIFYING)
+    for path in BENCHMARKS:
+        yield path, assemble_file(path)
+
+
+@pytest.mark.parametrize('name, image', list(images()))
+def test_modes_agree(name, image):
+    states = [machine_state(run_image(image, mode)) for mode in MODES]
+    assert states[1] == states[0]
+    assert states[2] == states[0]
+
+
+def test_self_modifying_program_runs_patched_code():
+    for mode in MODES:
+        processor = run_image(assemble(SELF_MODIFYING), mode)
+        assert processor.halted
+        assert processor.registers[11] == 5  # $t3
+        assert processor.instruction_count == 15
+
+
+@pytest.mark.parametrize('max_steps', [0, 1, 2, 3, 4, 7, 9, 13, 14, 15, 100])
+def test_step_budgets_agree(max_steps):
+    image = assemble(SELF_MODIFYING)
+    states = [machine_state(run_image(image, mode, max_steps)) for mode in MODES]
+    assert states[0][2] == min(max_steps, 15)
+    assert states[1] == states[0]
+    assert states[2] == states[0]
+
+
+def test_resumed_block_runs_match_one_run():
+    image = assemble_file(BENCHMARKS[0])
+    whole = run_image(image, EXEC_BLOCK)
+    pieces = run_image(image, EXEC_BLOCK, 1000)
+    while not pieces.halted:
+        pieces.run(777)
+    assert machine_state(pieces) == machine_state(whole)
+
+
+def test_profiler_counts_blocks_left_early():
+    processor = run_image(assemble(SELF_MODIFYING), EXEC_BLOCK, 0)
+    profiler = Profiler().attach(processor)
+    processor.run()
+    assert processor.instruction_count == 15
+    assert sum(profiler.pc_counts().values()) == 15
+    assert sum(profiler.stack_counts.values()) == 15
@@ -0,0 +1,86 @@
+import pytest
+
+from Mips_Simulator import PAGE_SIZE, MemoryAlignmentError, PagedMemory
+
+STACK = 0x7FFFEFFC
+
+
+@pytest.mark.parametrize('byteorder', ['big', 'little'])
+def test_aligned_access_round_trips(byteorder):
+    memory = PagedMemory(byteorder)
+    memory.write_word(0x1000, -2)
+    memory.write_half(0x1004, 0x8001)
+    memory.write_byte(0x1006, 0xFF)
+    assert memory.read_word(0x1000) == -2
+    assert memory.read_word(0x1000, signed=False) == 0xFFFFFFFE
+    assert (memory.read_half(0x1004), memory.read_half(0x1004, signed=False)) == (-0x7FFF, 0x8001)
+    assert (memory.read_byte(0x1006), memory.read_byte(0x1006, signed=False)) == (-1, 0xFF)
+
+    memory.write_word(0x2000, 0x11223344)
+    expected = bytes.fromhex('11223344') if byteorder == 'big' else bytes.fromhex('44332211')
+    assert memory.read_bytes(0x2000, 4) == expected
+    assert memory.read_byte(0x2000) == expected[0]
+    assert memory.read_half(0x2002, signed=False) == (0x3344 if byteorder == 'big' else 0x1122)
+
+
+@pytest.mark.parametrize('address', [0x1001, 0x1002, 0x1003])
+def test_unaligned_word_access_raises(address):
+    memory = PagedMemory()
+    with pytest.raises(MemoryAlignmentError):
+        memory.write_word(address, 1)
+    with pytest.raises(MemoryAlignmentError):
+        memory.read_word(address)
+    if address & 1:
+        with pytest.raises(MemoryAlignmentError):
+            memory.read_half(address)
+        with pytest.raises(MemoryAlignmentError):
+            memory.write_half(address, 1)
+    else:
+        memory.write_half(address, 7)
+        assert memory.read_half(address) == 7
+    memory.write_byte(address, 9)  # Bytes have no alignment
+    assert memory.read_byte(address) == 9
+
+
+def test_reads_do_not_allocate_pages():
+    memory = PagedMemory()
+    assert memory.read_word(STACK) == 0 and memory.read_half(STACK) == 0 and memory.read_byte(STACK) == 0
+    assert memory.read_bytes(STACK, 2 * PAGE_SIZE) == bytes(2 * PAGE_SIZE)
+    assert memory.read_string(STACK) == b''
+    assert bytes(memory.view(STACK, 4)) == bytes(4)
+    assert memory.pages == {}
+    memory.write_word(STACK, 1)
+    assert len(memory.pages) == 1  # A sparse stack address costs one page
+
+
+def test_byte_ranges_cross_pages():
+    memory = PagedMemory()
+    start = 2 * PAGE_SIZE - 3
+    memory.write_bytes(start, b'abcdefg')
+    assert memory.read_bytes(start, 7) == b'abcdefg'
+    assert [bytes(view) for view in memory.iter_views(start, 7)] == [b'abc', b'defg']
+    assert memory.read_string(start) == b'abcdefg'
+    with pytest.raises(ValueError):
+        memory.view(start, 7)
+    view = memory.view(start, 3)
+    assert view.readonly
+    memory.writable_view(start, 3)[:] = b'xyz'
+    assert memory.read_bytes(start, 4) == b'xyzd'
+
+
+def test_snapshots_share_pages_copy_on_write():
+    memory = PagedMemory()
+    memory.write_word(0x1000, 1)
+    memory.write_word(0x5000, 2)
+    pages = memory.snapshot()
+    assert memory.read_bytes(0x1000, 4) and memory.pages[1] is pages[1]  # Reads keep sharing
+
+    memory.write_word(0x1000, 10)
+    assert memory.pages[1] is not pages[1] and memory.pages[5] is pages[5]
+    clone = PagedMemory()
+    clone.restore(pages)
+    assert (clone.read_word(0x1000), clone.read_word(0x5000)) == (1, 2)
+
+    clone.write_word(0x5000, 20)
+    assert memory.read_word(0x5000) == 2 and clone.read_word(0x5000) == 20
+    assert pages[5] is memory.pages[5] and bytes(pages[5][:4]) == bytes.fromhex('00000002')
@@ -0,0 +1,143 @@
+import mmap
+from itertools import islice
+
+import pytest
+
+import Mips_Simulator
+from Mips_Simulator import (DATA_SEGMENT_START, TEXT_SEGMENT_START, TRACE_OFF, MIPSProcessor, PagedMemory,
+                            parse_packed_object, read_packed_object, translate_mips_to_binary, write_packed_object,
+                            write_text_object)
+from mips_disasm import Disassembler
+from programs import BENCHMARKS, assemble_file, machine_state
+
+
+@pytest.mark.parametrize('path', BENCHMARKS)
+@pytest.mark.parametrize('byteorder', ['big', 'little'])
+def test_packed_object_round_trip(tmp_path, path, byteorder):
+    image = assemble_file(path)._replace(byteorder=byteorder)
+    object_file = str(tmp_path / 'program.bin')
+    write_packed_object(object_file, image)
+    assert read_packed_object(object_file) == image
+
+    loaded = MIPSProcessor({}, PagedMemory(), {}, DATA_SEGMENT_START, TEXT_SEGMENT_START, trace_level=TRACE_OFF)
+    loaded.load_object(object_file)
+    direct = MIPSProcessor.from_image(image, trace_level=TRACE_OFF)
+    assert loaded.memory.byteorder == byteorder
+    assert (loaded.memory_map, loaded.label_map) == (direct.memory_map, direct.label_map)
+    loaded.run()
+    direct.run()
+    assert machine_state(loaded) == machine_state(direct)
+
+
+@pytest.mark.parametrize('path', BENCHMARKS)
+@pytest.mark.parametrize('byteorder', ['big', 'little'])
+def test_load_object_maps_the_file(tmp_path, monkeypatch, path, byteorder):
+    object_file = str(tmp_path / 'program.bin')
+    image = translate_mips_to_binary(path, object_file, 'packed', byteorder)
+    mappings = []
+    real_mmap = mmap.mmap
+
+    def spy(*args, **kwargs):
+        mappings.append(real_mmap(*args, **kwargs))
+        return mappings[-1]
+
+    monkeypatch.setattr(Mips_Simulator.mmap, 'mmap', spy)
+    loaded = MIPSProcessor({}, PagedMemory(), {}, DATA_SEGMENT_START, TEXT_SEGMENT_START, trace_level=TRACE_OFF)
+    loaded.load_object(object_file)
+    assert len(mappings) == 1 and mappings[0].closed
+
+    direct = MIPSProcessor({}, PagedMemory(byteorder), {}, DATA_SEGMENT_START, TEXT_SEGMENT_START,
+                           trace_level=TRACE_OFF)
+    direct.load_image(image)
+    assert machine_state(loaded) == machine_state(direct)
+    assert (loaded.text_end, loaded.current_data_address) == (direct.text_end, direct.current_data_address)
+    assert ({address: decoded[:-1] for address, decoded in loaded.decoded_cache.items()}
+            == {address: decoded[:-1] for address, decoded in direct.decoded_cache.items()})  # Without handlers
+    loaded.run()
+    direct.run()
+    assert machine_state(loaded) == machine_state(direct)
+
+
+@pytest.mark.parametrize('path', BENCHMARKS)
+def test_disassembler_reads_both_object_formats(tmp_path, path):
+    image = assemble_file(path)
+    packed, text = str(tmp_path / 'program.bin'), str(tmp_path / 'program.txt')
+    write_packed_object(packed, image)
+    write_text_object(text, image)
+    from_packed = list(Disassembler().disassemble_file(packed))
+    from_text = list(Disassembler(dict(image.label_map)).disassemble_file(text))
+    assert from_packed == from_text
+    assert sum(not line.endswith(':\n') for line in from_packed) == len(image.text)
+
+
+@pytest.mark.parametrize('byteorder', ['big', 'little'])
+def test_packed_disassembly_streams_from_the_mapping(tmp_path, byteorder):
+    image = assemble_file(BENCHMARKS[0])._replace(byteorder=byteorder)
+    packed = str(tmp_path / 'program.bin')
+    write_packed_object(packed, image)
+    full = list(Disassembler().disassemble_file(packed))
+    lines = Disassembler().disassemble_file(packed)
+    assert list(islice(lines, 3)) == full[:3]
+    lines.close()  # Releases the mapping part way through
+    write_packed_object(packed, image)
+    assert list(Disassembler().disassemble_file(packed)) == full
+
+
+def test_disassembler_line_cache_is_bounded(tmp_path):
+    image = assemble_file(BENCHMARKS[0])
+    packed = str(tmp_path / 'program.bin')
+    write_packed_object(packed, image)
+    bounded = Disassembler(cache_size=4)
+    assert list(bounded.disassemble_file(packed)) == list(Disassembler().disassemble_file(packed))
+    last = image.text_start + 4 * (len(image.text) - 1)
+    assert list(bounded.cache) == [last - 12, last - 8, last - 4, last]
+    bounded.line(last - 12, image.text[-4])  # A hit becomes the most recently used line
+    bounded.line(last + 4, 0)
+    assert list(bounded.cache) == [last - 4, last, last - 12, last + 4]
+
+
+def test_disassembly_labels_follow_label_map_changes():
+    image = assemble_file(BENCHMARKS[0])
+    processor = MIPSProcessor.from_image(image, trace_level=TRACE_OFF)
+    jump = 0x08000000 | (TEXT_SEGMENT_START >> 2)  # j to the first instruction
+    first = min(image.label_map, key=lambda item: item[1])[0]
+    assert processor.decode_instruction(jump, TEXT_SEGMENT_START) == f"j {first}"
+
+    renamed = tuple(('start' if name == first else name, address) for name, address in image.label_map)
+    processor.label_map.clear()
+    processor.load_image(image._replace(label_map=renamed))  # Same number of labels
+    assert processor.decode_instruction(jump, TEXT_SEGMENT_START) == "j start"
+
+    processor.label_map = {'entry': TEXT_SEGMENT_START}
+    assert processor.decode_instruction(jump, TEXT_SEGMENT_START) == "j entry"
+
+
+@pytest.mark.parametrize('path', BENCHMARKS)
+def test_text_object_loads_like_the_image(tmp_path, path):
+    image = assemble_file(path)
+    text = str(tmp_path / 'program.txt')
+    write_text_object(text, image)
+    processor = MIPSProcessor({}, image_memory(image), dict(image.label_map), image.data_end, image.text_start,
+                              trace_level=TRACE_OFF)
+    processor.load_instructions(text)
+    assert [processor.memory.read_word(processor.text_start + 4 * index, signed=False)
+            for index in range(len(image.text))] == list(image.text)
+
+
+def image_memory(image):
+    memory = PagedMemory(image.byteorder)
+    memory.write_bytes(image.data_start, image.data)
+    return memory
+
+
+@pytest.mark.parametrize('byteorder', ['big', 'little'])
+def test_truncated_packed_objects_are_rejected(tmp_path, byteorder):
+    object_file = tmp_path / 'program.bin'
+    write_packed_object(str(object_file), assemble_file(BENCHMARKS[0])._replace(byteorder=byteorder))
+    data = object_file.read_bytes()
+    for length in range(len(data)):
+        with pytest.raises(ValueError):
+            parse_packed_object(data[:length])
+    object_file.write_bytes(data[:len(data) // 2])
+    with pytest.raises(ValueError, match='truncated'):
+        read_packed_object(str(object_file))
@@ -0,0 +1,141 @@
+import pytest
+
+from Mips_Simulator import EXEC_BLOCK, EXEC_DECODED
+from mips_optimizer import compare_runs, format_report, optimize_image
+from programs import BENCHMARKS, assemble, assemble_file
+
+# Redundant li, a move to itself, nops, addi 0, a branch chain, a dead block and a call
+NAIVE = """
+.data
+n: .word 10
+msg: .asciiz "sum="
+nl: .asciiz "\\n"
+.text
+main:
+li $t0, 0
+li $t0, 0
+li $t1, 1
+addi $t1, $t1, 0
+move $t2, $t2
+nop
+li $t3, 5
+addi $t3, $t3, 5
+lw $t4, n
+loop:
+beq $t1, $t4, skip
+j body
+skip:
+j done
+body:
+add $t0, $t0, $t1
+addi $t1, $t1, 1
+nop
+j loop2
+loop2:
+j loop
+dead:
+li $t5, 7
+addi $t5, $t5, 1
+j dead
+done:
+add $t0, $t0, $t3
+la $a0, msg
+li $v0, 4
+syscall
+move $a0, $t0
+li $v0, 1
+syscall
+la $a0, nl
+li $v0, 4
+syscall
+jal func
+li $v0, 10
+syscall
+func:
+li $v1, 3
+jr $ra
+"""
+
+# Returns through a register other than $ra, so every label stays an entry point
+INDIRECT = """
+.text
+main:
+li $t0, 1
+jal f
+li $a0, 7
+li $v0, 1
+syscall
+li $v0, 10
+syscall
+f:
+addi $t1, $ra, 0
+nop
+jr $t1
+orphan:
+li $a0, 99
+"""
+
+# Stores a value to x and then clears the register, so only memory keeps it
+STORE = """
+.data
+x: .word 0
+.text
+li $t0, {value}
+sw $t0, x
+li $t0, 0
+"""
+
+
+def word_at(image, address):
+    return image.text[(address - image.text_start) // 4]
+
+
+@pytest.mark.parametrize('image', [assemble_file(path) for path in BENCHMARKS] + [assemble(NAIVE), assemble(INDIRECT)],
+                         ids=[path.rsplit('/', 1)[-1] for path in BENCHMARKS] + ['naive', 'indirect'])
+@pytest.mark.parametrize('mode', [EXEC_DECODED, EXEC_BLOCK])
+def test_optimized_programs_behave_the_same(image, mode):
+    optimized, report = optimize_image(image)
+    comparison = compare_runs(image, optimized, execution_mode=mode)
+    assert comparison.same_output and comparison.same_registers and comparison.same_memory
+    assert report.static_after == len(optimized.text) <= report.static_before == len(image.text)
+    assert comparison.after <= comparison.before
+    assert 'Warning' not in format_report(report, comparison)
+
+
+def test_naive_program_gets_smaller_and_faster():
+    image = assemble(NAIVE)
+    optimized, report = optimize_image(image)
+    comparison = compare_runs(image, optimized)
+    assert report.static_after < report.static_before
+    assert report.unreachable and report.redundant and report.folded and report.dead and report.retargeted
+    assert comparison.after < comparison.before
+
+
+def test_label_map_is_relocated():
+    image = assemble(NAIVE)
+    optimized, _ = optimize_image(image)
+    before, after = dict(image.label_map), dict(optimized.label_map)
+    assert after['func'] < before['func'] and after['done'] < before['done']
+    for label in ('func', 'done'):
+        assert word_at(optimized, after[label]) == word_at(image, before[label])
+
+
+def test_indirect_jump_keeps_labels():
+    image = assemble(INDIRECT)
+    optimized, report = optimize_image(image)
+    assert report.unreachable == 0
+    assert word_at(optimized, dict(optimized.label_map)['orphan']) == word_at(image, dict(image.label_map)['orphan'])
+
+
+def test_differences_are_reported():
+    image = assemble(NAIVE)
+    address = dict(image.label_map)['func']
+    changed = list(image.text)
+    changed[(address - image.text_start) // 4] += 1  # li $v1, 3 -> li $v1, 4
+    comparison = compare_runs(image, image._replace(text=tuple(changed)))
+    assert comparison.same_output and comparison.same_memory and not comparison.same_registers
+
+    comparison = compare_runs(assemble(STORE.format(value=5)), assemble(STORE.format(value=6)))
+    assert comparison.same_output and comparison.same_registers and not comparison.same_memory
+    report = format_report(optimize_image(image)[1], comparison)
+    assert 'different data or stack memory' in report and 'different registers' not in report
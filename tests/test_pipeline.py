@@ -0,0 +1,46 @@
+import pytest
+
+from Mips_Simulator import TRACE_OFF, MIPSProcessor
+from mips_pipeline import PipelineModel
+from programs import assemble
+
+# Counts $t0 down from 3; the bne reads $t0 in ID one cycle after the addi computes it
+LOOP = """
+.text
+addi $t0, $zero, 3
+loop:
+addi $t0, $t0, -1
+bne $t0, $zero, loop
+"""
+
+
+def run_model(source, **options):
+    processor = MIPSProcessor.from_image(assemble(source), trace_level=TRACE_OFF)
+    model = PipelineModel(**options).attach(processor)
+    processor.run()
+    return model
+
+
+@pytest.mark.parametrize('branch, taken', [('beq $zero, $zero, next', True), ('bne $t0, $zero, next', True),
+                                           ('bne $zero, $zero, next', False), ('j next', True)])
+def test_control_transfers_to_the_next_instruction(branch, taken):
+    model = run_model(f".text\naddi $t0, $zero, 1\nnop\n{branch}\nnext:\naddi $t1, $zero, 2\n", branch_penalty=2)
+    penalty = (2 if branch.startswith('b') else 1) if taken else 0
+    assert model.instructions == 4
+    assert model.cycles == 4 + 4 + penalty
+    cause = 'branch' if branch.startswith('b') else 'jump'
+    assert model.stalls == {'data': 0, 'load-use': 0, 'branch': 0, 'jump': 0, cause: penalty}
+
+
+def test_loop_cycles_and_cpi():
+    model = run_model(LOOP)
+    assert model.instructions == 7
+    # One data stall per bne and one penalty cycle per taken bne
+    assert model.stalls == {'data': 3, 'load-use': 0, 'branch': 2, 'jump': 0}
+    assert model.cycles == 7 + 4 + 3 + 2
+    assert model.cpi == pytest.approx(16 / 7)
+    assert model.per_label['loop']['cycles'] + model.per_label[None]['cycles'] == model.cycles - 4
+
+    # Without forwarding every result is read after WB
+    slow = run_model(LOOP, forwarding=False)
+    assert slow.cycles > model.cycles
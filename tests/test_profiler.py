@@ -0,0 +1,77 @@
+import pytest
+
+from Mips_Simulator import TRACE_OFF, MIPSProcessor
+from mips_profiler import Profiler
+from programs import BENCHMARKS, assemble, assemble_file
+
+# main calls helper three times from a loop, then jumps to end
+CALLS = """
+.text
+main:
+addi $s0, $zero, 3
+loop:
+jal helper
+addi $s0, $s0, -1
+bne $s0, $zero, loop
+j end
+helper:
+addi $t0, $t0, 1
+jr $ra
+end:
+addi $t1, $zero, 1
+"""
+
+
+class PcCounter:
+    def __init__(self):
+        self.counts = {}
+
+    def on_step(self, pc, decoded, next_pc):
+        self.counts[pc] = self.counts.get(pc, 0) + 1
+
+
+def stepped_counts(image):
+    """Executions per PC, counted one instruction at a time."""
+    processor = MIPSProcessor.from_image(image, trace_level=TRACE_OFF)
+    counter = PcCounter()
+    processor.step_observers.append(counter)
+    processor.run()
+    return counter.counts
+
+
+def test_counts_per_label_and_call_stack(tmp_path):
+    image = assemble(CALLS)
+    processor = MIPSProcessor.from_image(image, trace_level=TRACE_OFF)
+    profiler = Profiler().attach(processor)
+    assert processor.run() == 18
+    assert profiler.label_counts() == {'main': 1, 'loop': 10, 'helper': 6, 'end': 1}
+    assert profiler.pc_counts() == stepped_counts(image)
+    assert profiler.collapsed_stacks() == ["main 12", "main;helper 6"]
+
+    report = profiler.report(top=2)
+    assert report['instructions'] == 18
+    assert list(report['labels']) == ['loop', 'helper', 'main', 'end']
+    assert [entry['count'] for entry in report['pcs']] == [3, 3]
+    output = tmp_path / 'stacks.txt'
+    profiler.write_collapsed(str(output))
+    assert output.read_text() == "main 12\nmain;helper 6\n"
+
+
+@pytest.mark.parametrize('path', BENCHMARKS)
+@pytest.mark.parametrize('budget', [None, 7, 1000])
+def test_budgeted_runs_count_every_instruction(path, budget):
+    image = assemble_file(path)
+    processor = MIPSProcessor.from_image(image, trace_level=TRACE_OFF)
+    profiler = Profiler().attach(processor)
+    while not processor.halted:
+        processor.run(budget)
+    assert profiler.pc_counts() == stepped_counts(image)
+    assert sum(profiler.stack_counts.values()) == processor.instruction_count
+
+
+def test_reset_clears_counts():
+    processor = MIPSProcessor.from_image(assemble(CALLS), trace_level=TRACE_OFF)
+    profiler = Profiler().attach(processor)
+    processor.run()
+    profiler.reset()
+    assert profiler.pc_counts() == {} and profiler.collapsed_stacks() == []
@@ -0,0 +1,72 @@
+import asyncio
+import json
+
+import pytest
+
+from mips_server import SimulationServer, WorkerPool
+
+LOOP = """
+.text
+main:
+li $t0, 1
+loop:
+j loop
+"""
+
+
+@pytest.mark.parametrize('field, value', [('max_steps', -1), ('max_steps', 'many'), ('max_steps', 2.5),
+                                          ('timeout', -1), ('timeout', 'soon'), ('timeout', [])])
+def test_limited_rejects_bad_limits(field, value):
+    server = SimulationServer(pool=None)
+    with pytest.raises(ValueError):
+        server.limited({'source': LOOP, field: value})
+
+
+def test_limited_clamps_to_server_limits():
+    server = SimulationServer(pool=None, max_steps=1000, timeout=2.0)
+    request = server.limited({'source': LOOP, 'max_steps': 10 ** 9, 'timeout': 0})
+    assert (request['max_steps'], request['timeout']) == (1000, 0)
+
+
+def test_replaced_worker_connection_is_closed():
+    async def check():
+        pool = WorkerPool(1)
+        await pool.start()
+        try:
+            worker = await pool.idle.get()
+            replacement = pool.replace(worker)
+            assert worker.connection.closed
+            assert not replacement.connection.closed
+        finally:
+            pool.close()
+    asyncio.run(check())
+
+
+def test_duplicate_in_flight_id_is_rejected(tmp_path):
+    async def check():
+        pool = WorkerPool(1)
+        await pool.start()
+        server = SimulationServer(pool, timeout=5.0)
+        path = str(tmp_path / 'sim.sock')
+        listener = await asyncio.start_unix_server(server.handle_connection, path=path)
+        try:
+            reader, writer = await asyncio.open_unix_connection(path)
+            for request in ({'id': 1, 'source': LOOP, 'max_steps': 3000000},
+                            {'id': 1, 'source': LOOP, 'max_steps': 10},
+                            {'id': 2, 'source': LOOP, 'max_steps': -1},
+                            {'cancel': 1}):
+                writer.write(json.dumps(request).encode('utf-8') + b'\n')
+            await writer.drain()
+            responses = [json.loads(await reader.readline()) for _ in range(3)]
+            writer.close()
+        finally:
+            listener.close()
+            pool.close()
+        return responses
+    responses = asyncio.run(check())
+    by_id = {}
+    for response in responses:
+        by_id.setdefault(response['id'], []).append(response)
+    assert any('already in flight' in (response.get('error') or '') for response in by_id[1])
+    assert any(response.get('cancelled') for response in by_id[1])
+    assert 'max_steps' in by_id[2][0]['error']
@@ -0,0 +1,80 @@
+import pytest
+
+from Mips_Simulator import TRACE_OFF, MIPSProcessor
+from mips_simt import STACK_WINDOW_END, SIMTProcessor, to_int32
+from programs import assemble
+
+pytest.importorskip('numpy')
+
+# Odd inputs call a subroutine, push the result and exit; even inputs run a
+# loop whose trip count depends on the input and fall off the end of the text
+DIVERGENT = """
+.data
+x: .word 0
+out: .word 0
+.text
+main:
+lw $t0, x
+addi $t1, $zero, 0
+andi $t2, $t0, 1
+bne $t2, $zero, odd
+loop:
+beq $t0, $zero, done
+add $t1, $t1, $t0
+addi $t0, $t0, -1
+j loop
+odd:
+jal triple
+sw $v0, out
+addi $sp, $sp, -4
+sw $v0, 0($sp)
+addi $v0, $zero, 10
+syscall
+triple:
+add $v0, $t0, $t0
+add $v0, $v0, $t0
+jr $ra
+done:
+sw $t1, out
+sh $t1, -2($sp)
+"""
+
+INPUTS = [0, 1, 2, 5, 6, 7, 10, 3]
+STACK_BYTES = 64
+
+
+def test_divergent_lanes_match_the_scalar_processor():
+    image = assemble(DIVERGENT)
+    simt = SIMTProcessor(image, len(INPUTS))
+    simt.write_words('x', INPUTS)
+    steps = simt.run()
+
+    assert simt.halted.all()
+    assert len(set(simt.instruction_count.tolist())) > 2  # The lanes really diverged
+    assert steps < simt.instruction_count.sum()  # Lanes on the same path share steps
+    out = simt.read_words('out')[:, 0]
+    stack = simt.read_bytes(STACK_WINDOW_END - STACK_BYTES, STACK_BYTES)
+    for lane, value in enumerate(INPUTS):
+        scalar = MIPSProcessor.from_image(image, trace_level=TRACE_OFF)
+        scalar.memory.write_word(scalar.memory_map['x'], value)
+        scalar.run()
+        assert simt.registers[lane].tolist() == [to_int32(register) for register in scalar.registers]
+        assert int(simt.instruction_count[lane]) == scalar.instruction_count
+        assert int(out[lane]) == scalar.memory.read_word(scalar.memory_map['out'])
+        assert bytes(stack[lane]) == scalar.memory.read_bytes(STACK_WINDOW_END - STACK_BYTES, STACK_BYTES)
+    assert out.tolist() == [3 * value if value % 2 else value * (value + 1) // 2 for value in INPUTS]
+
+
+def test_step_budget_is_per_lane():
+    image = assemble(DIVERGENT)
+    simt = SIMTProcessor(image, len(INPUTS))
+    simt.write_words('x', INPUTS)
+    simt.run(max_steps=10)
+    assert simt.instruction_count.max() == 10
+    for lane, value in enumerate(INPUTS):
+        scalar = MIPSProcessor.from_image(image, trace_level=TRACE_OFF)
+        scalar.memory.write_word(scalar.memory_map['x'], value)
+        scalar.run(10)
+        assert int(simt.instruction_count[lane]) == scalar.instruction_count
+        assert int(simt.pc[lane]) == scalar.pc
+        assert simt.registers[lane].tolist() == [to_int32(register) for register in scalar.registers]
@@ -0,0 +1,100 @@
+import io
+
+from Mips_Simulator import TRACE_OFF, MIPSProcessor, PagedMemory, SystemCalls, read_snapshot
+from programs import assemble, machine_state
+
+# Allocates heap with sbrk, stores to the data section, then exits with code 3
+PROGRAM = """
+.data
+buf: .word 0, 0
+.text
+main:
+li $a0, 16
+li $v0, 9
+syscall
+move $s0, $v0
+la $t0, buf
+li $t1, 42
+sw $t1, 0($t0)
+li $a0, 3
+li $v0, 17
+syscall
+"""
+
+
+def processor():
+    return MIPSProcessor.from_image(assemble(PROGRAM), trace_level=TRACE_OFF, syscalls=SystemCalls('', io.StringIO()))
+
+
+def test_restore_rewinds_registers_memory_and_exit_status():
+    cpu = processor()
+    cpu.run(4)
+    snapshot = cpu.snapshot()
+    before = machine_state(cpu)
+    heap_break = cpu.syscalls.heap_break
+    buf = cpu.memory_map['buf']
+
+    cpu.run()
+    assert cpu.exit_code == 3
+    assert cpu.memory.read_word(buf) == 42
+    finished = machine_state(cpu)
+
+    cpu.restore(snapshot)
+    assert machine_state(cpu) == before
+    assert cpu.exit_code is None
+    assert cpu.stop_reason is None
+    assert cpu.syscalls.heap_break == heap_break
+    assert cpu.memory.read_word(buf) == 0
+
+    cpu.run()
+    assert machine_state(cpu) == finished
+    assert cpu.exit_code == 3
+
+
+def test_forks_do_not_share_writes():
+    cpu = processor()
+    cpu.run(4)
+    snapshot = cpu.snapshot()
+    buf = cpu.memory_map['buf']
+    first = MIPSProcessor.from_snapshot(snapshot, trace_level=TRACE_OFF, syscalls=SystemCalls('', io.StringIO()))
+    second = MIPSProcessor.from_snapshot(snapshot, trace_level=TRACE_OFF, syscalls=SystemCalls('', io.StringIO()))
+
+    first.run()
+    first.memory.write_word(buf + 4, 7)
+    assert first.memory.read_word(buf) == 42
+    assert second.memory.read_word(buf) == 0
+    assert second.memory.read_word(buf + 4) == 0
+    assert cpu.memory.read_word(buf) == 0
+    assert snapshot.pages[buf >> 12][buf & 0xFFF:(buf & 0xFFF) + 8] == bytes(8)
+
+    second.run()
+    assert (second.registers, second.pc, second.instruction_count) == (first.registers, first.pc,
+                                                                       first.instruction_count)
+    assert second.exit_code == 3
+
+
+def test_reads_neither_allocate_nor_unshare_pages():
+    memory = PagedMemory()
+    assert memory.read_bytes(0x20000000, 8192) == bytes(8192)
+    assert memory.pages == {}
+
+    memory.write_bytes(0x10010000, b'shared')
+    pages = memory.snapshot()
+    assert memory.read_bytes(0x10010000, 6) == b'shared'
+    assert memory.pages[0x10010] is pages[0x10010]
+    memory.write_byte(0x10010000, ord('S'))
+    assert memory.pages[0x10010] is not pages[0x10010]
+    assert bytes(pages[0x10010][:6]) == b'shared'
+
+
+def test_snapshot_file_round_trip(tmp_path):
+    cpu = processor()
+    cpu.run()
+    path = str(tmp_path / 'state.snap')
+    cpu.save_snapshot(path)
+    snapshot = read_snapshot(path)
+    assert snapshot.exit_code == 3
+    assert snapshot.heap_break == cpu.syscalls.heap_break
+    restored = MIPSProcessor.from_snapshot(snapshot, trace_level=TRACE_OFF)
+    assert machine_state(restored) == machine_state(cpu)
+    assert restored.exit_code == 3
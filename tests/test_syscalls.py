@@ -0,0 +1,165 @@
+import io
+
+from Mips_Simulator import TRACE_OFF, MIPSProcessor, SystemCalls
+from programs import assemble
+
+
+def run_program(source, stdin=''):
+    """A processor that has run source with stdin preloaded, and its console output."""
+    console = io.StringIO()
+    processor = MIPSProcessor.from_image(assemble(source), trace_level=TRACE_OFF,
+                                         syscalls=SystemCalls(stdin, console))
+    processor.run()
+    return processor, console.getvalue()
+
+
+def test_print_int_string_and_char():
+    _, output = run_program("""
+.data
+greeting: .asciiz "hi there\\n"
+.text
+addi $a0, $zero, -5
+addi $v0, $zero, 1
+syscall
+la $a0, greeting
+addi $v0, $zero, 4
+syscall
+addi $a0, $zero, 33
+addi $v0, $zero, 11
+syscall
+""")
+    assert output == "-5hi there\n!"
+
+
+def test_read_int_and_string_from_preloaded_input():
+    processor, output = run_program("""
+.data
+buffer: .word 0, 0, 0, 0
+.text
+addi $v0, $zero, 5
+syscall
+add $s0, $v0, $zero
+la $a0, buffer
+addi $a1, $zero, 6
+addi $v0, $zero, 8
+syscall
+addi $v0, $zero, 4
+syscall
+""", "42\nhello world\n")
+    assert processor.registers[16] == 42
+    assert output == "hello"
+    buffer = processor.memory_map['buffer']
+    assert processor.memory.read_bytes(buffer, 6) == b"hello\0"
+
+
+def test_sbrk_grows_the_heap_in_aligned_steps():
+    processor, _ = run_program("""
+.data
+value: .word 7
+tail: .asciiz "x"
+.text
+addi $a0, $zero, 5
+addi $v0, $zero, 9
+syscall
+add $s0, $v0, $zero
+sw $a0, 0($s0)
+addi $a0, $zero, 16
+addi $v0, $zero, 9
+syscall
+add $s1, $v0, $zero
+""")
+    first, second = processor.registers[16], processor.registers[17]
+    assert first == (processor.current_data_address + 7) & ~7
+    assert second == first + 8
+    assert processor.syscalls.heap_break == second + 16
+    assert processor.memory.read_word(first) == 5
+
+
+def test_file_open_write_read_close(tmp_path):
+    path = tmp_path / 'data.bin'
+    processor, _ = run_program(f"""
+.data
+name: .asciiz "{path}"
+message: .asciiz "abc"
+buffer: .word 0, 0
+.text
+la $a0, name
+addi $a1, $zero, 1
+addi $v0, $zero, 13
+syscall
+add $s0, $v0, $zero
+add $a0, $s0, $zero
+la $a1, message
+addi $a2, $zero, 3
+addi $v0, $zero, 15
+syscall
+add $s1, $v0, $zero
+add $a0, $s0, $zero
+addi $v0, $zero, 16
+syscall
+la $a0, name
+addi $a1, $zero, 0
+addi $v0, $zero, 13
+syscall
+add $s2, $v0, $zero
+add $a0, $s2, $zero
+la $a1, buffer
+addi $a2, $zero, 8
+addi $v0, $zero, 14
+syscall
+add $s3, $v0, $zero
+add $a0, $s2, $zero
+addi $v0, $zero, 16
+syscall
+add $a0, $s0, $zero
+addi $v0, $zero, 14
+syscall
+add $s4, $v0, $zero
+""")
+    assert path.read_bytes() == b"abc"
+    descriptor, written, reopened, read, closed = processor.registers[16:21]
+    assert (descriptor, written, reopened, read, closed) == (3, 3, 4, 3, -1)  # Reading a closed descriptor fails
+    assert processor.memory.read_bytes(processor.memory_map['buffer'], 4) == b"abc\0"
+    assert processor.syscalls.files == {}
+
+
+def test_negative_read_length_is_rejected():
+    processor, output = run_program("""
+.data
+buffer: .word 0, 0
+.text
+addi $a0, $zero, 0
+la $a1, buffer
+addi $a2, $zero, -1
+addi $v0, $zero, 14
+syscall
+add $s0, $v0, $zero
+addi $v0, $zero, 5
+syscall
+add $s1, $v0, $zero
+addi $a0, $zero, 1
+addi $a2, $zero, -1
+addi $v0, $zero, 15
+syscall
+add $s2, $v0, $zero
+""", "17\n")
+    assert processor.registers[16:19] == [-1, 17, -1]  # The input is still there for read_int
+    assert output == ""
+
+
+def test_exit2_records_the_code_and_flushes_output():
+    processor, output = run_program("""
+.text
+addi $a0, $zero, 9
+addi $v0, $zero, 1
+syscall
+addi $a0, $zero, 3
+addi $v0, $zero, 17
+syscall
+addi $t0, $zero, 1
+""")
+    assert processor.exit_code == 3
+    assert processor.halted
+    assert processor.registers[8] == 0
+    assert processor.instruction_count == 6
+    assert output == "9"
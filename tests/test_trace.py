@@ -0,0 +1,117 @@
+import io
+import json
+
+import pytest
+
+from Mips_Simulator import (EXEC_BLOCK, EXEC_DECODED, EXEC_REFERENCE, TEXT_SEGMENT_START, TRACE_CHANGED, TRACE_FULL,
+                            TRACE_OFF, TRACE_PC, BinaryTraceSink, ConsoleTraceSink, JsonlTraceSink, MIPSProcessor)
+from programs import assemble
+
+PROGRAM = """
+.text
+addi $t0, $zero, 5
+addi $t1, $t0, 2
+add $t0, $t0, $t1
+sll $zero, $zero, 0
+"""
+
+
+class RecordingSink:
+    wants_disassembly = True
+
+    def __init__(self):
+        self.records = []
+
+    def emit(self, level, step, pc, text, changes):
+        self.records.append((level, step, pc, text, changes))
+
+    def flush(self):
+        pass
+
+
+class Observer:
+    def on_step(self, pc, decoded, next_pc):
+        pass
+
+
+def run_traced(level, sink, **options):
+    processor = MIPSProcessor.from_image(assemble(PROGRAM), trace_level=level, trace_sink=sink, **options)
+    processor.run()
+    return processor
+
+
+@pytest.mark.parametrize('mode', [EXEC_REFERENCE, EXEC_DECODED, EXEC_BLOCK])
+def test_trace_off_emits_nothing(capsys, mode):
+    sink = RecordingSink()
+    processor = run_traced(TRACE_OFF, sink, execution_mode=mode)
+    processor.step_observers.append(Observer())  # Forces the instrumented loop
+    processor.pc = processor.text_start
+    processor.run()
+    assert sink.records == []
+    run_traced(TRACE_OFF, None)  # The default console sink
+    assert capsys.readouterr().out == ""
+
+
+def test_console_sink_formats_levels():
+    stream = io.StringIO()
+    run_traced(TRACE_PC, ConsoleTraceSink(stream))
+    assert stream.getvalue().splitlines() == [f"Executing at {hex(TEXT_SEGMENT_START + 4 * step)}"
+                                              for step in range(4)]
+
+    stream = io.StringIO()
+    run_traced(TRACE_CHANGED, ConsoleTraceSink(stream))
+    assert stream.getvalue().splitlines()[:3] == [f"Executing at {hex(TEXT_SEGMENT_START)}: addi $t0, $zero, 5",
+                                                 "Changed registers:", "$t0: 5"]
+
+
+def test_jsonl_sink_records(tmp_path):
+    path = tmp_path / 'trace.jsonl'
+    sink = JsonlTraceSink(str(path), batch_size=2, disassemble=True)
+    run_traced(TRACE_CHANGED, sink)
+    sink.close()
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert records == [
+        {'step': 0, 'pc': TEXT_SEGMENT_START, 'asm': 'addi $t0, $zero, 5', 'regs': {'$t0': 5}},
+        {'step': 1, 'pc': TEXT_SEGMENT_START + 4, 'asm': 'addi $t1, $t0, 2', 'regs': {'$t1': 7}},
+        {'step': 2, 'pc': TEXT_SEGMENT_START + 8, 'asm': 'add $t0, $t0, $t1', 'regs': {'$t0': 12}},
+        {'step': 3, 'pc': TEXT_SEGMENT_START + 12, 'asm': 'nop', 'regs': {}},
+    ]
+
+    sink = JsonlTraceSink(str(path))
+    run_traced(TRACE_PC, sink, trace_interval=2)
+    sink.close()
+    assert [json.loads(line) for line in path.read_text().splitlines()] == [
+        {'step': 0, 'pc': TEXT_SEGMENT_START}, {'step': 2, 'pc': TEXT_SEGMENT_START + 8}]
+
+
+def read_binary_trace(data):
+    records, offset = [], 0
+    while offset < len(data):
+        step, pc, count = BinaryTraceSink.record_header.unpack_from(data, offset)
+        offset += BinaryTraceSink.record_header.size
+        changes = []
+        for _ in range(count):
+            changes.append(BinaryTraceSink.register_entry.unpack_from(data, offset))
+            offset += BinaryTraceSink.register_entry.size
+        records.append((step, pc, changes))
+    return records
+
+
+def test_binary_sink_records(tmp_path):
+    path = tmp_path / 'trace.bin'
+    sink = BinaryTraceSink(str(path), batch_size=3)
+    run_traced(TRACE_CHANGED, sink)
+    sink.close()
+    assert read_binary_trace(path.read_bytes()) == [
+        (0, TEXT_SEGMENT_START, [(8, 5)]),
+        (1, TEXT_SEGMENT_START + 4, [(9, 7)]),
+        (2, TEXT_SEGMENT_START + 8, [(8, 12)]),
+        (3, TEXT_SEGMENT_START + 12, []),
+    ]
+
+    sink = BinaryTraceSink(str(path))
+    processor = run_traced(TRACE_FULL, sink, trace_interval=3)
+    sink.close()
+    records = read_binary_trace(path.read_bytes())
+    assert [(step, pc) for step, pc, _ in records] == [(0, TEXT_SEGMENT_START), (3, TEXT_SEGMENT_START + 12)]
+    assert records[1][2] == list(enumerate(processor.registers))